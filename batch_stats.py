@@ -0,0 +1,88 @@
+import argparse
+import io
+import multiprocessing
+import os
+import sys
+
+from compression import detect, open_reader
+from text_stats import count_chunks, read_chunks
+
+CHUNK_SIZE = 1 << 20
+
+def text_files(paths):
+    """Yield the files of the given paths, walking the directories (hidden entries of a tree are skipped)"""
+
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories[:] = sorted(name for name in subdirectories if not name.startswith("."))
+            for name in sorted(files):
+                if not name.startswith("."):
+                    yield os.path.join(directory, name)
+
+def file_stats(file_path):
+    """Return (path, characters, words, error) of a file, counted like the status bar does (worker process)
+
+    The file is read a chunk at a time, decompressed first if it's compressed. Binary files are an error.
+    """
+
+    try:
+        with open(file_path, "rb") as raw:
+            compression = detect(file_path)
+            stream = open_reader(compression[0], raw) if compression else raw
+            if b"\0" in stream.peek(8192)[:8192]:
+                return file_path, 0, 0, "binary file"
+            # same decoding and newlines as a file opened in the editor
+            file = io.TextIOWrapper(stream)
+            chars, words = count_chunks(read_chunks(file, CHUNK_SIZE))
+    except (OSError, EOFError, ValueError) as error:
+        # UnicodeDecodeError is a ValueError, like the errors of corrupted compressed files
+        return file_path, 0, 0, str(error) or type(error).__name__
+    return file_path, chars, words, None
+
+def collect_stats(paths, jobs=None):
+    """Yield the (path, characters, words, error) of every file of the paths, in no particular order
+
+    The files are counted by a pool of `jobs` processes (one per core by default), in this process for jobs=1.
+    """
+
+    files = list(text_files(paths))
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(files) < 2:
+        yield from map(file_stats, files)
+        return
+
+    # the biggest files first, so one of them isn't left alone at the end
+    files.sort(key=lambda path: os.path.getsize(path) if os.path.isfile(path) else 0, reverse=True)
+    # forked workers don't import the main module again (main.py would import customtkinter)
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    with context.Pool(min(jobs, len(files))) as pool:
+        yield from pool.imap_unordered(file_stats, files)
+
+def main(argv=None):
+    """Print the counts of the given files and trees (main.py --stats, without the window), return the exit status"""
+
+    parser = argparse.ArgumentParser(prog="main.py --stats", description="Count the characters and words of text files, like the status bar.")
+    parser.add_argument("--stats", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the total")
+    parser.add_argument("paths", nargs="+", help="files and directories")
+    args = parser.parse_args(argv)
+
+    results = sorted(collect_stats(args.paths, args.jobs))
+    total_chars = total_words = failed = 0
+
+    for file_path, chars, words, error in results:
+        if error:
+            failed += 1
+            print(f"{file_path}: {error}", file=sys.stderr)
+            continue
+        total_chars += chars
+        total_words += words
+        if not args.quiet:
+            print(f"{chars:>14,} chars {words:>12,} words  {file_path}")
+
+    print(f"{total_chars:>14,} chars {total_words:>12,} words  total ({len(results) - failed} files)")
+    return 1 if failed else 0
@@ -0,0 +1,103 @@
+"""Compare streaming compressed files in chunks with going through a decompressed copy on disk, for every format"""
+
+import argparse
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import FORMATS, decompress, open_reader, open_writer
+
+CHUNK_SIZE = 1 << 20
+
+def make_text(size):
+    """Return about `size` characters of lines of words (log-like, so it compresses like the real thing)"""
+
+    words = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+    lines = [f"{i:08d} " + " ".join(words[(i + j) % len(words)] for j in range(8 + i % 7)) for i in range(1000)]
+    block = "\n".join(lines) + "\n"
+    return (block * (size // len(block) + 1))[:size]
+
+def read_streaming(path, name):
+    """Decompress and decode a chunk at a time, like the editor loads a compressed file"""
+
+    chars = 0
+    with open(path, "rb") as raw:
+        file = io.TextIOWrapper(open_reader(name, raw), encoding="utf-8")
+        while chunk := file.read(CHUNK_SIZE):
+            chars += len(chunk)
+    return chars
+
+def read_through_disk(path, name, directory):
+    """Decompress to a plain file first, then read that one a chunk at a time"""
+
+    plain = os.path.join(directory, "plain.txt")
+    with open(path, "rb") as raw, open(plain, "wb") as out:
+        shutil.copyfileobj(open_reader(name, raw), out, CHUNK_SIZE)
+
+    chars = 0
+    with open(plain, "r", encoding="utf-8") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            chars += len(chunk)
+    os.unlink(plain)
+    return chars
+
+def write_streaming(path, name, level, text):
+    """Encode and compress a chunk at a time, like the editor saves a compressed file"""
+
+    with open(path, "wb") as raw:
+        with open_writer(name, level, raw) as stream:
+            for start in range(0, len(text), CHUNK_SIZE):
+                stream.write(text[start:start + CHUNK_SIZE].encode("utf-8"))
+
+def write_through_disk(path, name, level, text, directory):
+    """Write a plain file first, then compress it"""
+
+    plain = os.path.join(directory, "plain.txt")
+    with open(plain, "w", encoding="utf-8") as file:
+        file.write(text)
+
+    with open(plain, "rb") as source, open(path, "wb") as raw:
+        with open_writer(name, level, raw) as stream:
+            shutil.copyfileobj(source, stream, CHUNK_SIZE)
+    os.unlink(plain)
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=64 * 1024 * 1024, help="characters of the uncompressed text")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="comma separated formats")
+    args = parser.parse_args()
+
+    text = make_text(args.size)
+    megabytes = len(text.encode("utf-8")) / (1 << 20)
+    directory = tempfile.mkdtemp(prefix="compression_bench_")
+
+    try:
+        for name in args.formats.split(","):
+            level = FORMATS[name][2]
+            path = os.path.join(directory, "text" + FORMATS[name][0])
+
+            write_stream, _ = timed(write_streaming, path, name, level, text)
+            write_disk, _ = timed(write_through_disk, path, name, level, text, directory)
+            read_stream, streamed = timed(read_streaming, path, name)
+            read_disk, read = timed(read_through_disk, path, name, directory)
+            assert streamed == read == len(text), f"{name}: read back a different text"
+            assert decompress(name, open(path, "rb").read()).decode("utf-8") == text, f"{name}: wrote a different text"
+
+            print(f"{name} (level {level}, {os.path.getsize(path) / (1 << 20):.1f} MB compressed)")
+            print(f"    open   streaming: {megabytes / read_stream:8.1f} MB/s   through disk: {megabytes / read_disk:8.1f} MB/s")
+            print(f"    save   streaming: {megabytes / write_stream:8.1f} MB/s   through disk: {megabytes / write_disk:8.1f} MB/s")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Benchmark the editor's hot paths, driving MainApp with synthetic events under a virtual X display
+
+Every document size runs in its own process, so the peak memory is the one of that size alone.
+The results are written as JSON, to be compared between runs:
+
+    python benchmarks/editor_bench.py --sizes 10K,1M,100M,500M --output results.json
+
+--max-first-keystroke-ms makes it a regression check of the startup (time until the first key is handled).
+
+Xvfb is started on a free display unless --use-display is given (then $DISPLAY is used as it is).
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UNITS = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+def parse_size(text):
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+def make_file(path, size):
+    """Write a text file of about `size` bytes, made of lines of words"""
+
+    words = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+    lines = [" ".join(words[(i + j) % len(words)] for j in range(8 + i % 7)) for i in range(1000)]
+    block = ("\n".join(lines) + "\n").encode()
+
+    with open(path, "wb") as file:
+        written = 0
+        while written + len(block) <= size:
+            file.write(block)
+            written += len(block)
+        file.write(block[:size - written])
+
+# DISPLAY
+
+def start_display():
+    """Start Xvfb on a free display number, return the process"""
+
+    xvfb = shutil.which("Xvfb")
+    if not xvfb:
+        sys.exit("Xvfb was not found (install it, or run with --use-display)")
+
+    number = next(n for n in range(99, 300) if not os.path.exists(f"/tmp/.X{n}-lock"))
+    process = subprocess.Popen(
+        [xvfb, f":{number}", "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    # wait for the server to accept connections
+    for _ in range(200):
+        if os.path.exists(f"/tmp/.X11-unix/X{number}"):
+            break
+        time.sleep(0.05)
+    else:
+        process.kill()
+        sys.exit("Xvfb didn't start")
+
+    os.environ["DISPLAY"] = f":{number}"
+    return process
+
+# WORKER (one document size, in its own process)
+
+def settle(app):
+    """Let the app handle everything pending: events, idle callbacks and its coalesced refreshes"""
+
+    app.update()
+    app.status_updates.flush()
+    # font and margin changes wait for the keys to stop repeating, apply them now so they're measured
+    app.view_updates.flush()
+    app.update_idletasks()
+
+def wait(app, done, timeout=600):
+    """Run the event loop until done() (background tasks are polled by the loop)"""
+
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise TimeoutError
+        app.update()
+        time.sleep(0.001)
+    settle(app)
+
+def summary(times):
+    """Median, p99 and extremes of a list of durations (seconds), in ms"""
+
+    times = sorted(t * 1000 for t in times)
+    p99 = statistics.quantiles(times, n=100)[98] if len(times) > 1 else times[0]
+    return {"runs": len(times), "p50_ms": statistics.median(times), "p99_ms": p99, "min_ms": times[0], "max_ms": times[-1]}
+
+def measure(app, action, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        action()
+        settle(app)
+        times.append(time.perf_counter() - start)
+    return summary(times)
+
+def peak_memory():
+    """Peak resident memory of this process, in MB"""
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+def run_worker(size, keystrokes, repeat):
+    sys.path.insert(0, ROOT)
+    results = {"size": size}
+
+    start = time.perf_counter()
+    import main
+    results["import_ms"] = (time.perf_counter() - start) * 1000
+
+    directory = tempfile.mkdtemp(prefix="txt-bench-")
+    path = os.path.join(directory, "document.txt")
+    saved_path = os.path.join(directory, "saved.txt")
+    make_file(path, size)
+
+    # the file dialogs would wait for a user
+    main.filedialog.askopenfilename = lambda **options: path
+    main.filedialog.asksaveasfilename = lambda **options: saved_path
+
+    start = time.perf_counter()
+    app = main.app = main.MainApp()
+    # the same marks as --profile-startup: first paint, then the first idle moment, when keys are handled
+    app.text_editor._textbox.bind("<Expose>", main.first_paint, add="+")
+    settle(app)
+    results["startup_ms"] = (time.perf_counter() - start) * 1000
+    wait(app, lambda: "first keystroke ready" in dict(main.STARTUP_TIMES))
+    results["first_keystroke_ms"] = (dict(main.STARTUP_TIMES)["first keystroke ready"] - start) * 1000
+    # let the deferred startup steps run
+    wait(app, lambda: main.STARTUP_TIMES[-1][0] == "deferred startup")
+
+    # opening, until the whole file is in the editor (or indexed in large file mode)
+    start = time.perf_counter()
+    app.open_file()
+    wait(app, lambda: not app.loading and not (app.large_file and app.large_file.indexing))
+    elapsed = time.perf_counter() - start
+    results["open"] = {"seconds": elapsed, "mb_per_s": size / (1 << 20) / elapsed, "large_file_mode": bool(app.large_file)}
+    results["memory_after_open_mb"] = peak_memory()
+
+    # typing, through the Tk bindings, the edit hook and the bottom bar refresh
+    if not app.large_file:
+        textbox = app.text_editor._textbox
+        textbox.focus_force()
+        textbox.mark_set("insert", "1.0")
+        settle(app)
+        times = []
+        for _ in range(keystrokes):
+            start = time.perf_counter()
+            # without "when", the event is handled right away
+            textbox.event_generate("<KeyPress>", keysym="x")
+            app.status_updates.flush()
+            app.update_idletasks()
+            times.append(time.perf_counter() - start)
+        results["keystroke"] = summary(times)
+
+        # saving, until the worker thread is done
+        start = time.perf_counter()
+        app.save_as_file()
+        wait(app, lambda: not app.saving)
+        elapsed = time.perf_counter() - start
+        results["save"] = {"seconds": elapsed, "mb_per_s": size / (1 << 20) / elapsed}
+
+        # switching between two open documents: hibernating one and waking the other up
+        other_path = os.path.join(directory, "other.txt")
+        shutil.copyfile(path, other_path)
+        app.open_path(other_path)
+        wait(app, lambda: not app.loading)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            app.next_buffer()
+            wait(app, lambda: not app.loading)
+            times.append(time.perf_counter() - start)
+        results["switch_document"] = summary(times)
+        results["memory_two_documents_mb"] = peak_memory()
+
+    results["toggle_theme"] = measure(app, app.toggle_theme, repeat)
+    app.show_preferences()
+    settle(app)
+    results["toggle_theme_preferences_open"] = measure(app, app.toggle_theme, repeat)
+    app.preferences_window.close_preferences()
+    settle(app)
+
+    results["increase_font"] = measure(app, app.increase_font, repeat)
+    results["decrease_font"] = measure(app, app.decrease_font, repeat)
+    results["next_font"] = measure(app, app.next_font, repeat)
+    results["update_preferences"] = measure(app, app.update_preferences, repeat)
+    results["toggle_word_count"] = measure(app, lambda: app.preferences.set("show word count", not main.PREFERENCES["show word count"]), repeat)
+
+    results["peak_memory_mb"] = peak_memory()
+
+    app.close_app()
+    shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+# DRIVER
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10K,1M,10M,100M,500M", help="comma separated document sizes (K, M, G suffixes)")
+    parser.add_argument("--keystrokes", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=6, help="runs of every other measured action")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--use-display", action="store_true", help="use $DISPLAY instead of starting Xvfb")
+    parser.add_argument("--max-first-keystroke-ms", type=float, help="fail (exit status 1) if a run takes longer to handle its first key")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        print(json.dumps(run_worker(args.worker, args.keystrokes, args.repeat)))
+        return
+
+    display = None if args.use_display else start_display()
+    # the crash recovery journals and the settings of the runs must not mix with the user's
+    cache = tempfile.mkdtemp(prefix="txt-bench-cache-")
+    environment = dict(os.environ, XDG_CACHE_HOME=os.path.join(cache, "cache"), XDG_CONFIG_HOME=os.path.join(cache, "config"))
+
+    runs = []
+    try:
+        for size in map(parse_size, args.sizes.split(",")):
+            print(f"benchmarking {size / (1 << 20):.2f} MB...", flush=True)
+            worker = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--worker", str(size), "--keystrokes", str(args.keystrokes), "--repeat", str(args.repeat)],
+                env=environment, capture_output=True, text=True
+            )
+            if worker.returncode:
+                print(worker.stderr, file=sys.stderr)
+                runs.append({"size": size, "error": worker.stderr.strip().splitlines()[-1:]})
+                continue
+            # the editor prints a few things of its own, the results are the last line
+            runs.append(json.loads(worker.stdout.strip().splitlines()[-1]))
+    finally:
+        if display:
+            display.terminate()
+        shutil.rmtree(cache, ignore_errors=True)
+
+    report = {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": runs
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"results written to {args.output}")
+
+    for run in runs:
+        if "first_keystroke_ms" in run:
+            print(f"{run['size'] / (1 << 20):10.2f} MB  startup {run['startup_ms']:8.1f} ms  first keystroke {run['first_keystroke_ms']:8.1f} ms")
+
+    # the regression check of the time to the first keystroke
+    slow = [run for run in runs if args.max_first_keystroke_ms and run.get("first_keystroke_ms", 0) > args.max_first_keystroke_ms]
+    if slow:
+        sys.exit(f"first keystroke slower than {args.max_first_keystroke_ms} ms in {len(slow)} run(s)")
+
+if __name__ == "__main__":
+    main()
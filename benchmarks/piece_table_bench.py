@@ -0,0 +1,70 @@
+"""Compare the piece table with rebuilding a plain string, on an edit-heavy workload"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from piece_table import PieceTable
+
+def make_edits(length, count, seed):
+    """Return random (offset, deleted, inserted) edits, mostly typing near a moving cursor"""
+
+    rng = random.Random(seed)
+    edits = []
+    cursor = length // 2
+
+    for _ in range(count):
+        # jump somewhere else now and then, like clicking in the text
+        if rng.random() < 0.05:
+            cursor = rng.randint(0, length)
+        if rng.random() < 0.8:
+            text = rng.choice("abcdefgh \n")
+            edits.append((cursor, 0, text))
+            cursor += 1
+            length += 1
+        else:
+            deleted = min(rng.randint(1, 20), length - cursor)
+            edits.append((cursor, deleted, ""))
+            length -= deleted
+
+    return edits
+
+def run_string(text, edits):
+    for offset, deleted, inserted in edits:
+        text = text[:offset] + inserted + text[offset + deleted:]
+    return text
+
+def run_piece_table(text, edits):
+    table = PieceTable(text)
+    for offset, deleted, inserted in edits:
+        if deleted:
+            table.delete(offset, deleted)
+        if inserted:
+            table.insert(offset, inserted)
+    return table.text()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=8 * 1024 * 1024, help="characters of the initial text")
+    parser.add_argument("--edits", type=int, default=20000, help="number of edits")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    text = ("lorem ipsum dolor sit amet " * (args.size // 27 + 1))[:args.size]
+    edits = make_edits(len(text), args.edits, args.seed)
+
+    results = {}
+    for name, run in (("string rebuild", run_string), ("piece table", run_piece_table)):
+        start = time.perf_counter()
+        results[name] = run(text, edits)
+        elapsed = time.perf_counter() - start
+        print(f"{name:>15}: {elapsed:8.3f} s  ({elapsed * 1e6 / len(edits):8.1f} us/edit)")
+
+    assert results["string rebuild"] == results["piece table"], "the piece table gave a different text"
+
+if __name__ == "__main__":
+    main()
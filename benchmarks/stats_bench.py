@@ -0,0 +1,53 @@
+"""Compare the batch statistics (main.py --stats) of a directory tree counted by a process pool and by a single process"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_stats import collect_stats
+
+def make_tree(directory, files, size):
+    """Write `files` text files of about `size` bytes, spread over a few subdirectories"""
+
+    words = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+    lines = [" ".join(words[(i + j) % len(words)] for j in range(8 + i % 7)) for i in range(1000)]
+    block = "\n".join(lines) + "\n"
+    text = (block * (size // len(block) + 1))[:size]
+
+    for number in range(files):
+        subdirectory = os.path.join(directory, f"part{number % 16:02d}")
+        os.makedirs(subdirectory, exist_ok=True)
+        with open(os.path.join(subdirectory, f"file{number:05d}.txt"), "w") as file:
+            file.write(text)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=2000, help="number of files in the tree")
+    parser.add_argument("--size", type=int, default=1024 * 1024, help="bytes per file")
+    parser.add_argument("--jobs", type=int, default=None, help="processes of the pool (default: one per core)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="stats_bench_")
+    try:
+        make_tree(directory, args.files, args.size)
+        megabytes = args.files * args.size / (1 << 20)
+
+        results = {}
+        for name, jobs in (("single process", 1), (f"pool of {args.jobs or os.cpu_count()}", args.jobs)):
+            start = time.perf_counter()
+            results[name] = sorted(collect_stats([directory], jobs))
+            elapsed = time.perf_counter() - start
+            print(f"{name:>16}: {elapsed:8.3f} s  ({megabytes / elapsed:8.1f} MB/s)")
+
+        first, second = results.values()
+        assert first == second, "the pool gave different counts"
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
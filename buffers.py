@@ -0,0 +1,145 @@
+from itertools import count
+import mmap
+import zlib
+
+from piece_table import MappedChunk, PieceTable, piece_text
+
+class Buffer:
+    """An open document, kept in a compact (hibernated) form while another one is in the editor"""
+
+    # hibernated documents holding more than this many characters of their own (not mapped) are compressed
+    COMPRESS_THRESHOLD = 1 << 20
+    # their text is compressed by blocks of about this many characters, so it can be streamed back
+    BLOCK_SIZE = 1 << 20
+
+    # numbers the buffers, so untitled ones get journals of their own
+    numbers = count()
+
+    def __init__(self, file_path=None):
+        self.file_path = file_path
+        # its (format, level) if the file is compressed
+        self.compression = None
+        self.number = next(self.numbers)
+        # saved state, undo history and journal, as they were when the document was hibernated
+        self.dirty = False
+        self.saved_digest = None
+        self.saved_chars = 0
+        self.history = None
+        self.journal = None
+        # what's known of its file on disk (a paused FileWatcher)
+        self.watcher = None
+        # cursor offset and first visible line (as a fraction of the text)
+        self.cursor = 0
+        self.view = 0.0
+        # in large file mode, the first line shown (None otherwise)
+        self.large_file_line = None
+        # a file of the last session, not read yet (it is when it's first shown)
+        self.unloaded = False
+
+        # the hibernated text: the document itself, or its segments once compressed
+        self.document = None
+        self.segments = None
+        self.chars = 0
+        # the background compression of the document (if any)
+        self.compressing = None
+
+    @property
+    def hibernated(self):
+        return self.unloaded or self.document is not None or self.segments is not None or self.large_file_line is not None
+
+    def hibernate(self, document):
+        """Keep the document of the editor (it isn't copied)"""
+
+        self.document = document
+        self.segments = None
+        self.chars = len(document)
+
+        # the mapped file pages leave the process memory, they are read again (from the page cache) on wake
+        for file_map in {id(piece[0].map): piece[0].map for piece in document.snapshot() if isinstance(piece[0], MappedChunk)}.values():
+            try:
+                file_map.madvise(mmap.MADV_DONTNEED)
+            except (AttributeError, OSError, ValueError):
+                pass
+
+    def needs_compression(self):
+        """Return whether the document holds a lot of text of its own (typed, pasted, or a copy of the file)"""
+
+        sources = {id(source): source for source, _, _ in self.document.snapshot() if isinstance(source, str)}
+        return sum(map(len, sources.values())) > self.COMPRESS_THRESHOLD
+
+    @classmethod
+    def compress(cls, pieces, task=None):
+        """Return the segments of the pieces: mapped pieces as they are, text as compressed blocks (worker thread)"""
+
+        segments, parts = [], []
+        size = 0
+
+        def flush():
+            nonlocal size
+            if parts:
+                segments.append(zlib.compress("".join(parts).encode("utf-8", "surrogatepass"), 1))
+                parts.clear()
+                size = 0
+
+        for piece in pieces:
+            if task and task.cancelled.is_set():
+                return None
+            if isinstance(piece[0], MappedChunk):
+                flush()
+                segments.append(piece)
+            else:
+                parts.append(piece_text(piece))
+                size += piece[2] - piece[1]
+                if size >= cls.BLOCK_SIZE:
+                    flush()
+        flush()
+
+        return segments
+
+    def compressed(self, segments):
+        """Replace the hibernated document by its compressed segments"""
+
+        self.segments = segments
+        self.document = None
+
+    def source(self):
+        """Return what wake_chunks reads, to grab on the UI thread before starting the worker"""
+
+        return self.segments if self.segments is not None else self.document.snapshot()
+
+    @staticmethod
+    def wake_chunks(task, source, chunk_size):
+        """Send the text back to the Tk loop chunk by chunk, return its new document (worker thread)"""
+
+        pieces = []
+        chunk, size = [], 0
+
+        for segment in source:
+            if task.cancelled.is_set():
+                return None
+            if isinstance(segment, bytes):
+                text = zlib.decompress(segment).decode("utf-8", "surrogatepass")
+                pieces.append((text, 0, len(text)))
+            else:
+                text = piece_text(segment)
+                pieces.append(segment)
+
+            chunk.append(text)
+            size += len(text)
+            if size >= chunk_size:
+                task.send("".join(chunk))
+                chunk, size = [], 0
+
+        if chunk:
+            task.send("".join(chunk))
+
+        document = PieceTable()
+        document.set_pieces(pieces)
+        return document
+
+    def forget(self):
+        """Drop the hibernated text (the document is in the editor again)"""
+
+        self.document = None
+        self.segments = None
+        self.large_file_line = None
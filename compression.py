@@ -0,0 +1,87 @@
+import bz2
+import gzip
+import lzma
+import os
+
+# format: (extension, magic bytes, default level)
+FORMATS = {
+    "gzip": (".gz", b"\x1f\x8b", 6),
+    "bz2": (".bz2", b"BZh", 9),
+    "xz": (".xz", b"\xfd7zXZ\x00", 6)
+}
+
+def detect(file_path):
+    """Return the (format, level) of a compressed file, None for a plain one
+
+    The magic bytes decide, the extension only counts for a file that is empty or doesn't exist yet.
+    """
+
+    try:
+        with open(file_path, "rb") as file:
+            head = file.read(10)
+    except OSError:
+        head = b""
+
+    if not head:
+        return format_for_path(file_path)
+
+    for name, (_, magic, default) in FORMATS.items():
+        if head.startswith(magic):
+            return name, level_of(name, head, default)
+    return None
+
+def format_for_path(file_path, current=None):
+    """Return the (format, level) the extension of a path asks for (keeping the level of the current one if it's the same format)"""
+
+    extension = os.path.splitext(file_path)[1].lower()
+    for name, (format_extension, _, default) in FORMATS.items():
+        if extension == format_extension:
+            return (name, current[1]) if current and current[0] == name else (name, default)
+    return None
+
+def level_of(name, head, default):
+    """Guess the compression level from a file header (xz doesn't record it)"""
+
+    # gzip: the XFL byte tells the slowest / fastest levels apart
+    if name == "gzip" and len(head) > 8:
+        return {2: 9, 4: 1}.get(head[8], default)
+    # bz2: the block size digit is the level
+    if name == "bz2" and len(head) > 3 and head[3:4] in b"123456789":
+        return int(head[3:4])
+    return default
+
+def open_reader(name, raw):
+    """Return a binary stream of the decompressed content of a binary file object"""
+
+    if name == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if name == "bz2":
+        return bz2.BZ2File(raw, "rb")
+    return lzma.LZMAFile(raw, "rb")
+
+def open_text(file_path):
+    """Open a file as text like open(file_path) does, decompressing it when it's compressed"""
+
+    compression = detect(file_path)
+    if not compression:
+        return open(file_path, "r")
+    return {"gzip": gzip, "bz2": bz2, "xz": lzma}[compression[0]].open(file_path, "rt")
+
+def open_writer(name, level, raw, file_name=""):
+    """Return a binary stream compressing into a binary file object (closing it doesn't close the file)"""
+
+    if name == "gzip":
+        # the header keeps the original name, not the temporary one
+        return gzip.GzipFile(filename=file_name, fileobj=raw, mode="wb", compresslevel=level)
+    if name == "bz2":
+        return bz2.BZ2File(raw, "wb", compresslevel=level)
+    return lzma.LZMAFile(raw, "wb", preset=level)
+
+def decompress(name, data):
+    """Decompress a whole content at once"""
+
+    if name == "gzip":
+        return gzip.decompress(data)
+    if name == "bz2":
+        return bz2.decompress(data)
+    return lzma.decompress(data)
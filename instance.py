@@ -0,0 +1,126 @@
+import json
+import os
+import socket
+import tempfile
+
+def socket_path():
+    """Return the path of the socket of the running editor (one per user)"""
+
+    base = os.environ.get("XDG_RUNTIME_DIR")
+    if base:
+        return os.path.join(base, "txt", "instance.sock")
+    # the temporary directory is shared: the directory of the socket is named after the user
+    return os.path.join(tempfile.gettempdir(), f"txt-{os.getuid()}", "instance.sock")
+
+def socket_directory(path):
+    """Create the directory of the socket, return whether only the user can use it"""
+
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        stat = os.stat(directory)
+    except OSError:
+        return False
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o077
+
+def hand_off(paths, path=None, timeout=2.0):
+    """Ask the running editor to open files (absolute paths), return whether it did (False if there's none)"""
+
+    if not hasattr(socket, "AF_UNIX"):
+        return False
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            client.connect(path or socket_path())
+            client.sendall(json.dumps({"paths": paths}).encode("utf-8") + b"\n")
+            return client.recv(16).startswith(b"ok")
+    # no socket, a stale one, or an editor too busy to answer: this launch opens its own window
+    except OSError:
+        return False
+
+def is_listening(path, timeout):
+    """Return whether an editor listens on a socket file (else it's stale)"""
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(timeout)
+            # connecting without sending anything, the editor ignores it
+            client.connect(path)
+            return True
+    except OSError:
+        return False
+
+class InstanceServer:
+    """The socket later launches of the editor hand their files to, instead of opening windows of their own"""
+
+    # longest wait for the message of a connected launch (it's sent right after connecting)
+    TIMEOUT = 1.0
+    # longest message read
+    MAX_SIZE = 1 << 20
+
+    def __init__(self, listener, path):
+        self.socket = listener
+        self.path = path
+        # the socket file may be replaced by another instance's after this one is gone, only ours is removed
+        self.inode = os.stat(path).st_ino
+
+    @classmethod
+    def start(cls, path=None):
+        """Listen on the socket, return the server, None if another editor is listening (or sockets aren't available)"""
+
+        path = path or socket_path()
+        if not hasattr(socket, "AF_UNIX") or not socket_directory(path):
+            return None
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            try:
+                listener.bind(path)
+            except OSError:
+                # the socket file exists: another editor listens on it, or it was left by one that crashed
+                if is_listening(path, cls.TIMEOUT) or not os.path.exists(path):
+                    listener.close()
+                    return None
+                os.unlink(path)
+                listener.bind(path)
+            listener.listen()
+            listener.setblocking(False)
+            return cls(listener, path)
+        except OSError:
+            listener.close()
+            return None
+
+    def accept(self):
+        """Return the files a later launch asks to open (maybe none, it's then only shown), None if there's nothing valid to read"""
+
+        try:
+            connection, _ = self.socket.accept()
+        except OSError:
+            return None
+
+        with connection:
+            connection.settimeout(self.TIMEOUT)
+            data = b""
+            try:
+                while not data.endswith(b"\n") and len(data) < self.MAX_SIZE:
+                    part = connection.recv(1 << 16)
+                    if not part:
+                        break
+                    data += part
+                paths = [path for path in json.loads(data)["paths"] if isinstance(path, str)]
+                connection.sendall(b"ok\n")
+            except (OSError, ValueError, KeyError, TypeError):
+                return None
+
+        return paths
+
+    def close(self):
+        """Stop listening and remove the socket file (if it's still this server's)"""
+
+        self.socket.close()
+        try:
+            if os.stat(self.path).st_ino == self.inode:
+                os.unlink(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,67 @@
+import functools
+import json
+import os
+import time
+from collections import deque
+
+class Instrumentation:
+    """Rolling timings of the editor's handlers (only created when enabled, so it costs nothing otherwise)"""
+
+    def __init__(self, window=1000):
+        # the last `window` durations (seconds) of every timed name, and how many there were in total
+        self.window = window
+        self.samples = {}
+        self.counts = {}
+
+    def record(self, name, seconds):
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.window)
+            self.counts[name] = 0
+        samples.append(seconds)
+        self.counts[name] += 1
+
+    def wrap(self, name, function):
+        """Return the function, timed under this name"""
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, time.perf_counter() - start)
+
+        return timed
+
+    def instrument(self, target, names):
+        """Time these methods of an object (must be done before they're bound to events)"""
+
+        for name in names:
+            setattr(target, name, self.wrap(name, getattr(target, name)))
+
+    def stats(self, name):
+        """Return the (count, p50, p99, max) of a name, in ms over the rolling window"""
+
+        samples = sorted(self.samples[name])
+        percentile = lambda p: samples[min(int(len(samples) * p), len(samples) - 1)] * 1000
+        return self.counts[name], percentile(0.5), percentile(0.99), samples[-1] * 1000
+
+    def report(self):
+        return {
+            name: dict(zip(("count", "p50_ms", "p99_ms", "max_ms"), self.stats(name)))
+            for name in sorted(self.samples)
+        }
+
+    def slowest(self, count=3):
+        """Return the names with the highest p99"""
+
+        return sorted(self.samples, key=lambda name: self.stats(name)[2], reverse=True)[:count]
+
+    def dump(self, path):
+        """Write the report to a JSON file"""
+
+        temp_path = path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"date": time.strftime("%Y-%m-%dT%H:%M:%S"), "timings": self.report()}, file, indent=2)
+        os.replace(temp_path, path)
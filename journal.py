@@ -0,0 +1,228 @@
+import glob
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+
+from compression import open_text
+from piece_table import piece_text
+
+def cache_directory():
+    """Return (creating it if needed) the directory where the edit journals are kept"""
+
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+
+    directory = os.path.join(base, "txt", "journal")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+def process_alive(pid):
+    """Return whether another process with this pid is running"""
+
+    if not isinstance(pid, int) or pid == os.getpid():
+        return False
+
+    if sys.platform == "win32":
+        # os.kill would terminate it, ask for a handle instead
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        kernel32.CloseHandle(handle)
+        return True
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # it exists, it's just someone else's
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+class EditJournal:
+    """Append-only journal of the edits made to a document, for crash recovery"""
+
+    # the first line of a journal is a header describing the base text the edits apply to:
+    # the file on disk (if it still has the same size and mtime) or, after a compaction, a snapshot,
+    # and the pid of the editor writing it, so a running one doesn't get its journals recovered.
+    # every following line is one edit, with its indexes already resolved to Tk "line.column" ones
+
+    # every file operation of every journal runs, in order, on a single worker thread
+    jobs = queue.Queue()
+    worker = None
+
+    def __init__(self, directory, file_path=None, key=None):
+        self.file_path = file_path
+        # several untitled documents need a key of their own
+        if key is None:
+            key = hashlib.blake2b(os.path.abspath(file_path).encode(), digest_size=8).hexdigest() if file_path else "untitled"
+        self.journal_path = os.path.join(directory, key + ".journal")
+        self.snapshot_path = os.path.join(directory, key + ".snapshot")
+
+        # edits not written yet, and characters written since the last compaction
+        self.pending = []
+        self.written = 0
+
+    @classmethod
+    def queue_job(cls, job):
+        if cls.worker is None:
+            cls.worker = threading.Thread(target=cls.run_jobs, daemon=True)
+            cls.worker.start()
+        cls.jobs.put(job)
+
+    @classmethod
+    def run_jobs(cls):
+        while True:
+            job = cls.jobs.get()
+            try:
+                job()
+            except OSError:
+                # the journal is only a safety net, never bother the user with it
+                pass
+            finally:
+                cls.jobs.task_done()
+
+    @classmethod
+    def wait(cls):
+        """Block until every queued file operation is done"""
+
+        if cls.worker is not None:
+            cls.jobs.join()
+
+    # UI THREAD SIDE (all of these only queue work, in O(edit) at most)
+
+    def start(self):
+        """Start a new journal, based on the file as it is on disk"""
+
+        self.queue_job(lambda: self.write_header(snapshot=False))
+
+    def record(self, operation, *args):
+        """Remember an edit (the arguments of the Tk text command, indexes resolved)"""
+
+        self.pending.append(json.dumps([operation, *args]) + "\n")
+
+    def flush(self):
+        """Write the pending edits in one batch"""
+
+        if self.pending:
+            lines, self.pending = self.pending, []
+            self.written += sum(map(len, lines))
+            self.queue_job(lambda: self.append(lines))
+
+    def needs_compaction(self, threshold):
+        return self.written > threshold
+
+    def compact(self, pieces):
+        """Replace the journal by a snapshot of the (actual) document pieces"""
+
+        self.flush()
+        self.written = 0
+        self.queue_job(lambda: self.write_snapshot(pieces))
+
+    def discard(self):
+        """Forget the journal (the document was saved or closed)"""
+
+        self.pending = []
+        self.queue_job(self.remove_files)
+
+    # WORKER THREAD SIDE
+
+    def header(self, snapshot):
+        header = {"file": self.file_path, "snapshot": snapshot, "size": None, "mtime": None, "pid": os.getpid()}
+        if self.file_path and os.path.exists(self.file_path):
+            stat = os.stat(self.file_path)
+            header.update(size=stat.st_size, mtime=stat.st_mtime)
+        return json.dumps(header) + "\n"
+
+    def write_header(self, snapshot):
+        with open(self.journal_path, "w", encoding="utf-8") as file:
+            file.write(self.header(snapshot))
+            file.flush()
+            os.fsync(file.fileno())
+        if not snapshot and os.path.exists(self.snapshot_path):
+            os.remove(self.snapshot_path)
+
+    def append(self, lines):
+        with open(self.journal_path, "a", encoding="utf-8") as file:
+            file.writelines(lines)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def write_snapshot(self, pieces):
+        temp_path = self.snapshot_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8", newline="") as file:
+            file.writelines(map(piece_text, pieces))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        self.write_header(snapshot=True)
+
+    def remove_files(self):
+        for path in (self.journal_path, self.snapshot_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # RECOVERY
+
+    @classmethod
+    def recoverable(cls, directory):
+        """Return the journals left by a crash (with edits to replay), newest first, leaving those of running editors"""
+
+        journals = []
+
+        for journal_path in sorted(glob.glob(os.path.join(directory, "*.journal")), key=os.path.getmtime, reverse=True):
+            try:
+                with open(journal_path, encoding="utf-8") as file:
+                    header = json.loads(file.readline())
+                    has_edits = bool(file.readline())
+            except (OSError, ValueError):
+                continue
+
+            # still being written by another editor
+            if process_alive(header.get("pid")):
+                continue
+
+            journal = cls(directory, header["file"], os.path.basename(journal_path)[:-len(".journal")])
+            if has_edits or header["snapshot"]:
+                journals.append(journal)
+            else:
+                # nothing to recover
+                journal.discard()
+
+        return journals
+
+    def load(self):
+        """Return the (base text, edits) to replay, or None if the base text changed (worker thread)"""
+
+        with open(self.journal_path, encoding="utf-8") as file:
+            header = json.loads(file.readline())
+            edits = []
+            for line in file:
+                try:
+                    edits.append(json.loads(line))
+                except ValueError:
+                    # the last line may have been cut by the crash
+                    break
+
+        if header["snapshot"]:
+            with open(self.snapshot_path, encoding="utf-8", newline="") as file:
+                return file.read(), edits
+
+        if not header["file"]:
+            return "", edits
+
+        # the edits only make sense on top of the exact same file
+        stat = os.stat(header["file"])
+        if (stat.st_size, stat.st_mtime) != (header["size"], header["mtime"]):
+            return None
+        with open_text(header["file"]) as file:
+            return file.read(), edits
@@ -0,0 +1,169 @@
+import codecs
+import os
+import threading
+from array import array
+
+class LargeFile:
+    """A read-only text file with a sparse index of its lines, read by windows (never mapped: another program may cut it)"""
+
+    # the index keeps the offset of one line out of INDEX_STEP, so it stays small
+    INDEX_STEP = 64
+    # the file is scanned by blocks of this many bytes (each one decoded and split holding the GIL, so they stay small)
+    BLOCK_SIZE = 1 << 20
+    # and walked line by line by reads of this many bytes
+    READ_SIZE = 1 << 16
+    # bytes kept from the end of the indexed part, to recognize a file that was only appended to
+    TAIL_SIZE = 4096
+
+    def __init__(self, file_path):
+        self.path = file_path
+        self.file = open(file_path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        # the view reads on the UI thread while the index is built on a worker
+        self.lock = threading.Lock()
+
+        # byte offset of the lines 0, INDEX_STEP, 2 * INDEX_STEP...
+        self.checkpoints = array("Q", [0])
+        # number of newlines found so far and bytes scanned
+        self.newlines = 0
+        self.scanned = 0
+        self.indexed = False
+        self.tail = b""
+
+    @property
+    def line_count(self):
+        """Number of lines known so far (all of them once the index is built)"""
+
+        return self.newlines + 1 if self.indexed else max(self.newlines, 1)
+
+    @property
+    def estimated_lines(self):
+        """Guess the total number of lines while the index is still being built"""
+
+        if self.indexed or not self.scanned:
+            return self.line_count
+        return max(int(self.newlines * self.size / self.scanned), self.line_count)
+
+    def read(self, offset, size):
+        """Return `size` bytes from the byte offset `offset` (fewer past the end, if the file was cut meanwhile)"""
+
+        with self.lock:
+            self.file.seek(offset)
+            return self.file.read(size)
+
+    def build_index(self, task=None):
+        """Scan the file for newlines, from where the last scan stopped (meant to run on a worker thread)"""
+
+        step = self.INDEX_STEP
+        pos = self.scanned
+
+        while pos < self.size:
+            if task and task.cancelled.is_set():
+                return
+            block = self.read(pos, min(self.BLOCK_SIZE, self.size - pos))
+            if not block:
+                # cut meanwhile, the watcher opens it again
+                self.size = pos
+                break
+            newlines = self.newlines
+
+            found = block.find(b"\n")
+            while found != -1:
+                newlines += 1
+                # the line after this newline starts a new group of lines
+                if newlines % step == 0:
+                    self.checkpoints.append(pos + found + 1)
+                found = block.find(b"\n", found + 1)
+
+            self.newlines = newlines
+            self.scanned = pos = pos + len(block)
+            if task:
+                task.send(self.scanned)
+
+        self.tail = self.read(max(0, self.size - self.TAIL_SIZE), min(self.size, self.TAIL_SIZE))
+        self.indexed = True
+
+    def extend(self):
+        """Take in what was appended to the file, keeping the index of what was scanned (False if it was rewritten instead)"""
+
+        if not self.indexed:
+            return False
+
+        try:
+            stat, known = os.stat(self.path), os.fstat(self.file.fileno())
+        except OSError:
+            return False
+        # replaced by another file, or cut: the old offsets mean nothing
+        if (stat.st_dev, stat.st_ino) != (known.st_dev, known.st_ino) or stat.st_size <= self.size:
+            return False
+        # rewritten with more text, the end of what was indexed isn't there anymore
+        if self.read(self.size - len(self.tail), len(self.tail)) != self.tail:
+            return False
+
+        self.size = stat.st_size
+        self.indexed = False
+        return True
+
+    def text_chunks(self, start=0, cancelled=None):
+        """Yield the text from the byte offset `start` to the end by chunks, decoded like lines() does"""
+
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        pending = ""
+
+        for pos in range(start, self.size, self.BLOCK_SIZE):
+            if cancelled and cancelled.is_set():
+                return
+            block = self.read(pos, min(self.BLOCK_SIZE, self.size - pos))
+            if not block:
+                break
+            text = pending + decoder.decode(block)
+            # a "\r" at the end may be the first half of a "\r\n"
+            text, pending = (text[:-1], "\r") if text.endswith("\r") else (text, "")
+            yield text.replace("\r\n", "\n")
+
+        yield pending + decoder.decode(b"", True)
+
+    def char_before(self, offset):
+        """Return the character ending at the byte offset `offset` ("" at the start of the file)"""
+
+        return self.read(max(0, offset - 4), min(offset, 4)).decode("utf-8", "ignore")[-1:]
+
+    def skip_lines(self, pos, count):
+        """Return the byte offset after the `count` next newlines from `pos`, None if the file ends before"""
+
+        while count:
+            block = self.read(pos, self.READ_SIZE)
+            if not block:
+                return None
+            found = block.find(b"\n")
+            while found != -1 and count > 1:
+                count -= 1
+                found = block.find(b"\n", found + 1)
+            if found != -1:
+                return pos + found + 1
+            pos += len(block)
+
+        return pos
+
+    def line_offset(self, line):
+        """Return the byte offset where the 0-based `line` starts"""
+
+        checkpoint = min(line // self.INDEX_STEP, len(self.checkpoints) - 1)
+        # walk the few lines between the checkpoint and the wanted line
+        pos = self.skip_lines(self.checkpoints[checkpoint], line - checkpoint * self.INDEX_STEP)
+        return self.size if pos is None else pos
+
+    def lines(self, first, count):
+        """Return `count` lines starting at the 0-based line `first`, without the last newline"""
+
+        start = self.line_offset(first)
+        end = self.skip_lines(start, count)
+        # the newline ending the last line isn't part of the text (nor what was appended since the index was built)
+        end = self.size if end is None or end > self.size else end - 1
+
+        text = self.read(start, max(end - start, 0)).decode("utf-8", "replace")
+        return text.replace("\r\n", "\n").removesuffix("\r")
+
+    def close(self):
+        with self.lock:
+            self.file.close()
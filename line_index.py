@@ -0,0 +1,154 @@
+class Fenwick:
+    """Prefix sums of a list of numbers, with O(log n) updates and searches"""
+
+    def __init__(self, values):
+        self.size = len(values)
+        self.tree = [0] + list(values)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+        # highest power of two not above the size, where searches start
+        self.top = 1 << (self.size.bit_length() - 1) if self.size else 0
+
+    def add(self, index, delta):
+        """Add delta to the value at index"""
+
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index):
+        """Return the sum of the values before index"""
+
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def search(self, target):
+        """Return the index of the value where the running sum passes target, and the rest of target"""
+
+        pos, step = 0, self.top
+        while step:
+            if pos + step <= self.size and self.tree[pos + step] <= target:
+                pos += step
+                target -= self.tree[pos]
+            step >>= 1
+        return pos, target
+
+class LineIndex:
+    """Start offsets of the lines of a text, kept up to date edit by edit"""
+
+    # lines are grouped in blocks, a block is split once it gets twice this size
+    BLOCK_SIZE = 512
+
+    def __init__(self, text="", long_line=10000):
+        # lines longer than this are counted as they're indexed
+        self.long_line = long_line
+        self.reset(text)
+
+    def reset(self, text):
+        """Index a whole text"""
+
+        # the size of each line, its newline included
+        sizes = [len(line) + 1 for line in text.split("\n")]
+        self.blocks = [sizes[i:i + self.BLOCK_SIZE] for i in range(0, len(sizes), self.BLOCK_SIZE)]
+        self.long_lines = self.count_long(sizes)
+        self.rebuild()
+
+    def count_long(self, sizes):
+        """Return how many of these line sizes are of long lines"""
+
+        return sum(size > self.long_line + 1 for size in sizes)
+
+    def rebuild(self):
+        """Recompute the block sums after blocks were added or removed"""
+
+        self.chars = Fenwick([sum(block) for block in self.blocks])
+        self.lines = Fenwick([len(block) for block in self.blocks])
+
+    @property
+    def line_count(self):
+        return self.lines.prefix(self.lines.size)
+
+    def replace_lines(self, first, count, new_lines):
+        """Replace `count` lines starting at the 0-based line `first` with `new_lines`"""
+
+        sizes = [len(line) + 1 for line in new_lines]
+        index, start = self.lines.search(first)
+        block = self.blocks[index]
+        self.long_lines += self.count_long(sizes)
+
+        # the common case: the edit stays inside one block, only its sums change
+        if start + count <= len(block):
+            self.long_lines -= self.count_long(block[start:start + count])
+            chars = sum(sizes) - sum(block[start:start + count])
+            block[start:start + count] = sizes
+            if 0 < len(block) <= 2 * self.BLOCK_SIZE:
+                self.chars.add(index, chars)
+                self.lines.add(index, len(sizes) - count)
+                return
+        else:
+            # remove the rest of the replaced lines from the next blocks
+            remaining = count - (len(block) - start)
+            self.long_lines -= self.count_long(block[start:])
+            del block[start:]
+            block.extend(sizes)
+            following = index + 1
+            while remaining > 0:
+                removed = min(remaining, len(self.blocks[following]))
+                self.long_lines -= self.count_long(self.blocks[following][:removed])
+                del self.blocks[following][:removed]
+                remaining -= removed
+                if not self.blocks[following]:
+                    del self.blocks[following]
+
+        if len(block) > 2 * self.BLOCK_SIZE:
+            self.blocks[index:index + 1] = [block[i:i + self.BLOCK_SIZE] for i in range(0, len(block), self.BLOCK_SIZE)]
+        elif not block:
+            del self.blocks[index]
+        self.rebuild()
+
+    def resize_line(self, line, delta):
+        """Add `delta` characters to a 0-based line (an edit inside it, no line added or removed)"""
+
+        index, start = self.lines.search(line)
+        block = self.blocks[index]
+        self.long_lines -= self.count_long(block[start:start + 1])
+        block[start] += delta
+        self.long_lines += self.count_long(block[start:start + 1])
+        self.chars.add(index, delta)
+
+    def line_length(self, line):
+        """Return the number of characters of a 0-based line, its newline excluded"""
+
+        index, start = self.lines.search(line)
+        return self.blocks[index][start] - 1
+
+    def offset(self, line, column=0):
+        """Return the character offset of a 0-based (line, column) position"""
+
+        index, start = self.lines.search(line)
+        if index == len(self.blocks):
+            return self.chars.prefix(index) - 1
+
+        return self.chars.prefix(index) + sum(self.blocks[index][:start]) + column
+
+    def position(self, offset):
+        """Return the 0-based (line, column) position of a character offset"""
+
+        index, rest = self.chars.search(offset)
+        # past the end, return the end of the last line
+        if index == len(self.blocks):
+            last = self.line_count - 1
+            return last, self.blocks[-1][-1] - 1
+
+        line = self.lines.prefix(index)
+        for size in self.blocks[index]:
+            if rest < size:
+                return line, rest
+            rest -= size
+            line += 1
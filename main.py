@@ -1,6 +1,59 @@
+import time
+
+# (step, time) of every startup step, printed by --profile-startup
+STARTUP_TIMES = [("start", time.perf_counter())]
+
+import hashlib
+import io
+import locale
 import os
+from bisect import bisect_right
+from itertools import chain
+import queue
+import re
+import sys
+import tempfile
+import threading
+
+# the headless statistics of files and trees (main.py --stats path...) don't need the window, nor customtkinter
+if __name__ == "__main__" and "--stats" in sys.argv[1:]:
+    from batch_stats import main as batch_stats
+    sys.exit(batch_stats(sys.argv[1:]))
+
+# main.py [--instrument] [--profile-startup] [--new-instance] path...: the files to open instead of the last session
+PATHS = []
+if __name__ == "__main__":
+    for argument in sys.argv[1:]:
+        if os.path.isfile(argument):
+            PATHS.append(os.path.abspath(argument))
+        elif not argument.startswith("--"):
+            print(f"{argument}: not a file", file=sys.stderr)
+    # the editor already running opens them (see instance.py), this launch ends before even importing customtkinter
+    if not {"--new-instance", "--instrument", "--profile-startup"} & set(sys.argv[1:]):
+        from instance import hand_off
+        if hand_off(PATHS):
+            sys.exit()
 
 from customtkinter import *
+from tkinter import READABLE, TclError
+
+STARTUP_TIMES.append(("import customtkinter", time.perf_counter()))
+
+from buffers import Buffer
+from instance import InstanceServer
+from compression import decompress, detect, format_for_path, open_reader, open_text, open_writer
+from journal import EditJournal, cache_directory
+from instrumentation import Instrumentation
+from large_file import LargeFile
+from line_index import LineIndex
+from piece_table import PieceTable, encode_pieces, private_copy, text_of
+from preferences import PreferenceStore
+from search import find_matches, iter_matches, replace_all
+from settings import apply_settings, changed_settings, load_settings, write_settings
+from text_stats import TextStats, count_chunks
+from theme import ThemeRegistry
+from undo import UndoHistory, removed_length
+from watcher import FileWatcher, file_signature, read_changes
 
 PREFERENCES = {
     "wrap text": True,
@@ -17,24 +70,381 @@ CONFIG = {
     "font": "Consolas",
     "default_font": "Consolas",
     "font_size": 16,
-    "margin": 10
+    "margin": 10,
+    # max time (ms) a bottom bar refresh may wait for more edits to merge with (0 = next idle moment)
+    "refresh_latency": 30,
+    # after an undo/redo, compare a digest of the text with the saved one to clear the "*"
+    "verify_dirty_digest": True,
+    # files are read on a worker thread and inserted by chunks of this many characters
+    "load_chunk_size": 1 << 18,
+    # how often (ms) the Tk loop checks background tasks, and for how long (ms) it may handle their results
+    "poll_interval": 15,
+    "poll_budget": 12,
+    # files bigger than this (bytes) are opened read-only in "large file mode",
+    # with only this many lines held by the editor at once
+    "large_file_threshold": 64 * 1024 * 1024,
+    "large_file_window": 600,
+    # the crash recovery journal is written every this many ms, and compacted past this many characters
+    "journal_flush_interval": 1000,
+    "journal_compact_size": 4 * 1024 * 1024,
+    # max memory (bytes) held by the undo history, the oldest steps are forgotten past it
+    "undo_memory_limit": 32 * 1024 * 1024,
+    # time the hot paths (also turned on by --instrument): F12 shows the slowest ones in the bottom bar,
+    # and every timing is written to timings.json (next to the journals) on exit
+    "instrumentation": False,
+    # the settings file is written once CONFIG / PREFERENCES / the open files stop changing for this many ms
+    "settings_write_delay": 500,
+    # how often (ms) the actual file is checked for changes made by other programs
+    # (with inotify, only a read of its events unless there are some)
+    "watch_interval": 500,
+    # lines longer than this many characters put the editor in the long line mode, where nothing wraps
+    # (Tk's word wrapping of lines of several MB stalls scrolling and typing)
+    "long_line_threshold": 10000,
+    # font and margin changes re-layout the whole text, they're applied once the keys stop repeating for this many ms
+    "view_settle_delay": 150
+}
+
+# the fonts next_font cycles through
+FONTS = ["Consolas", "Inconsolata", "Garamond", "Arial", "Times"]
+
+# the defaults, the settings file only keeps what differs from them
+DEFAULTS = {"config": dict(CONFIG), "preferences": dict(PREFERENCES)}
+# the settings of the last session (and its open files), applied before anything reads them
+SETTINGS = load_settings()
+apply_settings(CONFIG, SETTINGS.get("config"))
+apply_settings(PREFERENCES, SETTINGS.get("preferences"))
+# CONFIG keys set from the command line for this run only, never saved
+OVERRIDDEN = set()
+
+# the MainApp methods timed when the instrumentation is on
+INSTRUMENTED = (
+    "text_changed", "refresh_status", "open_file", "load_file", "file_loaded", "save_file",
+    "toggle_theme", "update_widgets_color", "update_preferences", "preference_changed", "increase_font",
+    "decrease_font", "next_font", "increase_margin", "decrease_margin", "show_preferences", "undo", "redo",
+    "switch_buffer", "buffer_woken", "apply_view"
+)
+
+# every theme toggle_theme cycles through: the customtkinter appearance mode and the palette
+THEMES = {
+    "light": {
+        "appearance": "light",
+        "colors": {
+            "main_color": "white",
+            "text_color": "black",
+            "secondary_text_color": "gray",
+            "button_color": "#d1d1d1",
+            "button_hover": "#e3e2e1",
+            "button_text": "#424242",
+            "highlight_color": "#fff0a0"
+        }
+    },
+    "dark": {
+        "appearance": "dark",
+        "colors": {
+            "main_color": "black",
+            "text_color": "#bdbdbd",
+            "secondary_text_color": "gray",
+            "button_color": "gray",
+            "button_hover": "light gray",
+            "button_text": "black",
+            "highlight_color": "#5a5320"
+        }
+    }
 }
 
-COLOR_CONFIG = {
-    "main_color": "white",
-    "text_color": "black",
-    "secondary_text_color": "gray",
-    "button_color": "#d1d1d1",
-    "button_hover": "#e3e2e1",
-    "button_text": "#424242" 
+if CONFIG["theme"] not in THEMES:
+    CONFIG["theme"] = DEFAULTS["config"]["theme"]
+COLOR_CONFIG = dict(THEMES[CONFIG["theme"]]["colors"])
+
+# the bottom bar label each display preference shows / hides, and the status part that refreshes it
+STATUS_LABELS = {
+    "display actual file": ("title_label", "title"),
+    "display actual font": ("actual_font_label", "font"),
+    "show character count": ("chars_label", "counts"),
+    "show word count": ("word_count_label", "counts"),
+    "view font size": ("font_size_label", "font_size"),
+    "view margin size": ("margin_label", "margin")
 }
 
+class UpdateScheduler:
+    """Merge bursts of update requests into a single call of the callback"""
+
+    def __init__(self, widget, callback, latency=0, settle=False):
+        self.widget = widget
+        self.callback = callback
+        self.latency = latency
+        # wait for the requests to stop for `latency` ms, instead of at most `latency` ms after the first one
+        self.settle = settle
+        # parts requested since the last flush and the scheduled job
+        self.pending = set()
+        self.job = None
+
+    def request(self, *parts):
+        """Ask for the given parts to be updated, at most one flush is ever queued"""
+
+        self.pending.update(parts)
+
+        if self.job is not None and self.settle:
+            self.widget.after_cancel(self.job)
+            self.job = None
+
+        if self.job is None:
+            if self.latency:
+                self.job = self.widget.after(self.latency, self.flush)
+            else:
+                self.job = self.widget.after_idle(self.flush)
+
+    def flush(self):
+        """Run the callback with every part requested so far"""
+
+        if self.job is not None:
+            self.widget.after_cancel(self.job)
+            self.job = None
+
+        parts, self.pending = self.pending, set()
+        if parts:
+            self.callback(parts)
+
+class BackgroundTask:
+    """Run `work(task)` on a worker thread and hand what it sends to the Tk loop"""
+
+    def __init__(self, widget, work, on_message=None, on_done=None, max_pending=8):
+        self.widget = widget
+        self.work = work
+        self.on_message = on_message
+        self.on_done = on_done
+        # bounded, so a fast worker waits for the Tk loop instead of filling the memory
+        self.queue = queue.Queue(max_pending)
+        self.cancelled = threading.Event()
+        # the part of the work done (0 to 1), when the worker knows it
+        self.progress = None
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.job = self.widget.after(CONFIG["poll_interval"], self.poll)
+
+    def run(self):
+        """Worker thread body"""
+
+        try:
+            result = (self.work(self), None)
+        except Exception as error:
+            result = (None, error)
+
+        self.put(("done", result))
+
+    def put(self, item):
+        # wait for room in the queue, giving up if the task is cancelled
+        while not self.cancelled.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def send(self, message):
+        """Send a message to on_message (called from the worker thread)"""
+
+        self.put(("message", message))
+
+    def poll(self):
+        """Handle the worker's messages for at most CONFIG["poll_budget"] ms"""
+
+        self.job = None
+        deadline = time.perf_counter() + CONFIG["poll_budget"] / 1000
+
+        while not self.cancelled.is_set():
+            try:
+                kind, value = self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if kind == "done":
+                if self.on_done:
+                    self.on_done(*value)
+                return
+
+            if self.on_message:
+                self.on_message(value)
+            if time.perf_counter() >= deadline:
+                break
+
+        if not self.cancelled.is_set():
+            # come back right away if there's more waiting, letting Tk handle the user's events first
+            self.job = self.widget.after(1 if not self.queue.empty() else CONFIG["poll_interval"], self.poll)
+
+    def cancel(self):
+        """Stop handling results and ask the worker to stop"""
+
+        self.cancelled.set()
+        if self.job is not None:
+            self.widget.after_cancel(self.job)
+            self.job = None
+
+class LargeFileView:
+    """Read-only view of a big file, the text editor only holds the lines around the viewport"""
+
+    def __init__(self, app, file_path, line=0):
+        self.app = app
+        self.textbox = app.text_editor._textbox
+        self.scrollbar = app.text_editor._y_scrollbar
+        self.file = LargeFile(file_path)
+
+        # the file lines held by the editor
+        self.first = 0
+        self.count = 0
+        self.shift_pending = False
+        # held lines longer than CONFIG["long_line_threshold"]
+        self.long_lines = 0
+        # the 0-based line to show once the file is indexed (a document woken up shows where it was left)
+        self.start_line = line
+        # whole file counts, known once the background scan is over
+        self.chars = None
+        self.words = None
+
+        # take over the scrolling, the scrollbar must show the position in the whole file
+        self.textbox.configure(yscrollcommand=self.on_scroll, state="disabled")
+        self.scrollbar.configure(command=self.yview)
+
+        # index the lines (and count chars and words) in the background
+        self.indexing = BackgroundTask(app, self.scan, self.on_progress, self.on_scanned)
+
+    def scan(self, task):
+        """Index the lines not indexed yet, then count the characters and words (worker thread)"""
+
+        # after the file grew, only the appended text is new
+        counted = self.file.scanned if self.chars is not None else 0
+        self.file.build_index(task)
+        if task.cancelled.is_set():
+            return None
+
+        chunks = self.file.text_chunks(counted, task.cancelled)
+        if not counted:
+            return count_chunks(chunks)
+        # the character before the appended text tells whether its first word goes on from the last one
+        last = self.file.char_before(counted)
+        chars, words = count_chunks(chain([last], chunks))
+        return self.chars + chars - len(last), self.words + words - count_chunks([last])[1]
+
+    def on_progress(self, scanned):
+        # show the first lines as soon as they're known
+        if self.count < CONFIG["large_file_window"] and self.file.line_count > self.count:
+            self.show(self.first)
+        self.app.status_updates.request("mode")
+
+    def on_scanned(self, counts, error):
+        self.indexing = None
+        if counts:
+            self.chars, self.words = counts
+        if self.app.following:
+            self.goto_line(self.file.line_count)
+        # the last lines of the file may still be missing
+        elif self.count < CONFIG["large_file_window"] or self.start_line:
+            self.show(self.start_line or self.first)
+        self.start_line = 0
+        self.app.status_updates.request("counts", "mode")
+
+    @property
+    def progress(self):
+        """Percentage of the file already indexed"""
+
+        return 100 if self.file.indexed else int(self.file.scanned * 100 / max(self.file.size, 1))
+
+    def call(self, *args):
+        # bypass the edit hook, the held lines are not the document
+        return self.app.tk.call((self.app.tk_text,) + args)
+
+    def show(self, line, top=None):
+        """Load the lines around the 0-based `line` into the editor and scroll to it"""
+
+        total = self.file.line_count
+        window = CONFIG["large_file_window"]
+        line = max(0, min(line, total - 1))
+        first = max(0, min(line - window // 2, total - window))
+        text = self.file.lines(first, window)
+
+        self.call("configure", "-state", "normal")
+        self.call("delete", "1.0", "end")
+        self.call("insert", "end", text)
+        self.call("configure", "-state", "disabled")
+        self.first = first
+        self.count = text.count("\n") + 1
+        self.long_lines = sum(len(held) > CONFIG["long_line_threshold"] for held in text.split("\n"))
+        self.app.check_long_lines()
+
+        # keep the line at the top of the view (or at the given fraction)
+        if top is None:
+            self.call("yview", f"{line - first + 1}.0")
+        else:
+            self.call("yview", "moveto", top)
+
+    def extend(self):
+        """Index and count only the text appended to the file, return False if it was rewritten instead"""
+
+        if not self.file.extend():
+            return False
+        self.indexing = BackgroundTask(self.app, self.scan, self.on_progress, self.on_scanned)
+        return True
+
+    def goto_line(self, line):
+        """Jump to the 1-based `line` of the file"""
+
+        self.show(line - 1)
+        self.call("mark", "set", "insert", f"{line - self.first}.0")
+
+    def on_scroll(self, top, bottom):
+        """Called by Tk when the view of the held lines moves"""
+
+        top, bottom = float(top), float(bottom)
+        total = max(self.file.estimated_lines, 1)
+        # where the viewport is in the whole file
+        view_top = self.first + top * self.count
+        view_bottom = self.first + bottom * self.count
+        self.scrollbar.set(view_top / total, view_bottom / total)
+
+        # close to an edge of the held lines, load the next ones
+        near_start = top < 0.2 and self.first > 0
+        near_end = bottom > 0.8 and self.first + self.count < self.file.line_count
+        if (near_start or near_end) and not self.shift_pending:
+            self.shift_pending = True
+            self.app.after_idle(self.shift, int(view_top))
+
+    def shift(self, line):
+        self.shift_pending = False
+        # the view may have been closed in the meantime
+        if self.app.large_file is self:
+            self.show(line)
+
+    def yview(self, *args):
+        """Scrollbar command"""
+
+        if args[0] == "moveto":
+            self.show(int(float(args[1]) * self.file.estimated_lines))
+        else:
+            self.call("yview", *args)
+
+    def close(self):
+        """Give the text editor back to the normal editing mode"""
+
+        if self.indexing:
+            self.indexing.cancel()
+        self.call("configure", "-state", "normal")
+        self.call("delete", "1.0", "end")
+        self.textbox.configure(yscrollcommand=self.scrollbar.set)
+        self.scrollbar.configure(command=self.textbox.yview)
+        self.file.close()
+
 class MainApp(CTk):
     """Main application class"""
 
     def __init__(self):
         super().__init__()
 
+        # opt-in timing of the hot paths, before anything is bound to them (when off, nothing is wrapped)
+        self.metrics = Instrumentation() if CONFIG["instrumentation"] else None
+        if self.metrics:
+            self.metrics.instrument(self, INSTRUMENTED)
+
         # configure main window
         self.window_height = 450
         self.window_width = 800
@@ -44,15 +454,78 @@ class MainApp(CTk):
         #self.geometry("800x450")
         self.geometry(f"{self.window_width}x{self.window_height}+{self.spawn_x}+{self.spawn_y}")
         self.minsize(200, 80)
-        self.configure(fg_color="white")
-        set_appearance_mode(CONFIG["theme"])
+        self.configure(fg_color=COLOR_CONFIG["main_color"])
+        set_appearance_mode(THEMES[CONFIG["theme"]]["appearance"])
+        # every widget color follows a palette key, so switching themes only touches what changes
+        self.theme = ThemeRegistry(COLOR_CONFIG)
+        self.theme.register(self, fg_color="main_color")
 
         # bind "ESC" to quit 
         #self.bind("<Escape>", lambda event: self.quit())
         
         # FILE MANAGEMENT VARIABLES
         self.actual_file = None
-        self.last_saved_text = ""
+        # dirty tracking: number of edits made so far and when the text was last saved
+        self.edit_seq = 0
+        self.saved_seq = 0
+        self.saved_chars = 0
+        self.saved_digest = self.text_digest("")
+        # set by undo/redo, which may bring the text back to its saved state
+        self.check_digest = False
+        # the file being loaded in the background (if any) and its progress
+        self.loading = None
+        self.load_seq = 0
+        self.load_chunks = 0
+        self.load_chars = 0
+        self.load_size = 0
+        # the read-only view of a file too big to be held by the editor (if any)
+        self.large_file = None
+        # the file being written in the background (if any)
+        self.saving = None
+        # the (format, level) of the actual file when it's compressed (see compression.py), None for plain files
+        self.compression = None
+        # crash recovery journal of the actual document (off until the recovery question is answered)
+        self.journal = None
+        self.journal_enabled = False
+        # the watcher of the actual file's changes on disk, the background reading of them (if any),
+        # and whether the view follows the end of a growing file
+        self.watcher = None
+        self.reloading = None
+        self.following = False
+        # the socket later launches hand their files to (main.py only, see listen_for_launches)
+        self.instance = None
+
+        # the PREFERENCES, applied key by key when they change
+        self.preferences = PreferenceStore(PREFERENCES)
+        self.preferences.subscribe(self.preference_changed)
+        # the settings file is written once the changes settle
+        self.settings_job = None
+        self.preferences.subscribe(self.settings_changed)
+
+        # character and word counts, updated on every edit of the text editor
+        self.stats = TextStats()
+        # start offset of every line, to convert between character offsets and Tk indexes
+        self.line_index = LineIndex(long_line=CONFIG["long_line_threshold"])
+        # whether Tcl counts a character outside the BMP as two in the indexes (Tcl 8.6 does, see char_column)
+        self.wide_chars = int(self.tk.call("string", "length", "\U0001F600")) == 2
+        # on while the document has long lines (see check_long_lines)
+        self.long_line_mode = False
+        # the document itself, mirroring every edit of the text editor (save, search... read its snapshots)
+        self.document = PieceTable()
+        # replaces Tk's own (unbounded) undo stack, set while an undo/redo is being applied
+        self.history = UndoHistory(CONFIG["undo_memory_limit"])
+        self.applying_history = False
+        # the open documents: the active one is in the editor, the others are hibernated
+        self.buffers = [Buffer()]
+        self.buffer_index = 0
+        # the buffer whose document is being put back in the editor (if any)
+        self.waking = None
+        # every bottom bar refresh goes through this scheduler
+        self.status_updates = UpdateScheduler(self, self.refresh_status, CONFIG["refresh_latency"])
+        # the text editor's font and margin, applied once their changes settle
+        self.view_updates = UpdateScheduler(self, self.apply_view, CONFIG["view_settle_delay"], settle=True)
+        # one font per (family, size), resolved once
+        self.fonts = {}
 
         # create the widgets and shortcuts
         self.create_text_editor()
@@ -62,69 +535,326 @@ class MainApp(CTk):
         # active popup var
         self.active_popup = None
 
-        # manage the preferences window
+        # the preferences window is built once, in idle time, and then only hidden and shown
         self.preferences_window = None
+        # when F1 was pressed, and how long (ms) the window took to show up the last time
+        self.preferences_requested = None
+        self.preferences_open_time = None
+
+        # find / replace bar, created the first time it's needed
+        self.find_bar = None
+
+        # the window goes on screen first, the rest is built in idle time, one step at a time: the status labels,
+        # the files of the last session, the recovery of a crashed one (then the edits are journaled) and the preferences
+        self.run_deferred([self.create_status_labels, self.restore_session, self.offer_recovery, self.build_preferences, self.preload_fonts])
+        self.after(CONFIG["journal_flush_interval"], self.flush_journal)
+        self.after(CONFIG["watch_interval"], self.check_file)
+        self.protocol("WM_DELETE_WINDOW", self.close_app)
+
+    def run_deferred(self, steps):
+        """Run startup steps in idle time, letting the pending events (keys...) through between two steps"""
+
+        def run():
+            steps[0]()
+            self.run_deferred(steps[1:])
+
+        if steps:
+            self.after(1, lambda: self.after_idle(run))
+        else:
+            STARTUP_TIMES.append(("deferred startup", time.perf_counter()))
 
     def create_text_editor(self):
         """Create the text editor"""
 
         # create the text editor frame
-        self.text_frame = CTkFrame(self, corner_radius=0, fg_color="white")
+        self.text_frame = CTkFrame(self, corner_radius=0, fg_color=COLOR_CONFIG["main_color"])
         self.text_frame.pack(expand=True, fill="both")
+        self.theme.register(self.text_frame, fg_color="main_color")
         # create the text editor
         self.text_editor = CTkTextbox(
-            self.text_frame, font=(CONFIG["font"], CONFIG["font_size"]), 
-            corner_radius=0, fg_color="white", text_color="#4a4a4a", 
-            undo=True, wrap="word", scrollbar_button_color=COLOR_CONFIG["button_color"],
+            self.text_frame, font=self.font_for(CONFIG["font"], CONFIG["font_size"]),
+            corner_radius=0, fg_color=COLOR_CONFIG["main_color"], text_color="#4a4a4a", 
+            undo=False, wrap="word" if PREFERENCES["wrap text"] else "none", scrollbar_button_color=COLOR_CONFIG["button_color"],
         )
 
         self.text_editor.pack(expand=True, fill="both", padx=CONFIG["margin"], pady=25)
+        self.theme.register(self.text_editor, fg_color="main_color", text_color="text_color", scrollbar_button_color="button_color")
+
+        # watch every insertion and deletion made in the text editor (this also verifies text changes)
+        self.hook_text_edits()
+
+    def hook_text_edits(self):
+        """Route the edits of the inner Tk text widget through text_command"""
+
+        textbox = self.text_editor._textbox
+        # rename the original Tk command and put a Python command in its place
+        self.tk_text = textbox._w + "_orig"
+        self.tk.call("rename", textbox._w, self.tk_text)
+        self.tk.createcommand(textbox._w, self.text_command)
+
+    def text_command(self, operation, *args):
+        """Forward a command to the Tk text widget, keeping the counts in sync"""
+
+        # in large file mode the editor is read-only and doesn't hold the document
+        if operation not in ("insert", "delete", "replace") or self.large_file:
+            # the undo history is kept here, Tk's own is off (so the default bindings keep working)
+            if operation == "edit" and args and not self.large_file:
+                if args[0] in ("undo", "redo"):
+                    # undoing or redoing may return to the saved text
+                    self.check_digest = True
+                    self.undo() if args[0] == "undo" else self.redo()
+                    return ""
+                if args[0] == "separator":
+                    self.history.separator()
+                elif args[0] == "reset":
+                    self.history.reset()
+            return self.tk.call((self.tk_text, operation) + args)
+
+        # only the edits are timed, every other call (index, get, yview... of each redraw) would drown them
+        started = time.perf_counter() if self.metrics else None
+
+        # find the lines touched by the edit BEFORE it happens
+        try:
+            first, count = self.edit_lines(operation, args)
+        except TclError:
+            first = None
+        # resolve the indexes now too, the journal must be able to replay the exact same edit
+        try:
+            resolved_args = self.resolved_args(operation, args)
+        except TclError:
+            # bad indexes, the edit itself will fail
+            resolved_args = None
+
+        # the character offsets of the edit, while the line index and the text are still those it applies to
+        # (a file being loaded is only put in the document once it's fully read)
+        span = None
+        if first is not None and resolved_args and not self.loading:
+            span = self.edit_span(operation, resolved_args)
+
+        result = self.tk.call((self.tk_text, operation) + args)
+        self.edit_seq += 1
+        if self.journal and resolved_args:
+            self.journal.record(operation, *resolved_args)
+
+        if first is None:
+            # unusual command form, recount everything
+            text = str(self.tk.call(self.tk_text, "get", "1.0", "end-1c"))
+            self.stats.reset(text)
+            self.line_index.reset(text)
+            self.document.reset(text)
+            edited = None
+        elif span and count == 1 and "\n" not in span[2] and self.stats.line_chars[first - 1] > CONFIG["long_line_threshold"]:
+            # inside a long line: counted from the edit and the characters around it, the line isn't read back
+            start, end, text = span
+            before, removed, after = self.document.text(max(start - 1, 0), start), self.document.text(start, end), self.document.text(end, end + 1)
+            self.edit_document(*span)
+            self.stats.edit_line(first - 1, before, removed, text, after)
+            self.line_index.resize_line(first - 1, len(text) - len(removed))
+            edited = (first, 1, 1)
+        else:
+            if span:
+                self.edit_document(*span)
+            # the edit changed the total number of lines by this much
+            new_total = self.line_of(self.tk.call(self.tk_text, "index", "end-1c"))
+            new_count = count + new_total - self.stats.line_count
+            # read only the touched lines back and recount them
+            lines = str(self.tk.call(self.tk_text, "get", f"{first}.0", f"{first + new_count - 1}.end")).split("\n")
+            self.stats.replace_lines(first - 1, count, lines)
+            self.line_index.replace_lines(first - 1, count, lines)
+            edited = (first, count, new_count)
+        # an open find bar only searches the edited lines again
+        if self.find_bar and self.find_bar.winfo_ismapped():
+            self.find_bar.lines_changed(*(edited or (None, 0, 0)))
+        self.check_long_lines()
 
-        # bind key pressing to verify text changes
-        self.text_editor.bind("<KeyRelease>", self.text_changed)
+        # refresh the labels once the burst of edits is over
+        self.text_changed()
 
-    def create_bottom_bar(self, which_widgets="all"):
-        """Create the bottom bar widgets"""
-        
-        if which_widgets == "all":
-            self.bottom_frame = CTkFrame(self, height=40, corner_radius=0, bg_color=COLOR_CONFIG["main_color"], fg_color=COLOR_CONFIG["main_color"])
-            self.bottom_frame.pack(fill="x", padx=20)
+        if self.metrics:
+            self.metrics.record("text_command (edits)", time.perf_counter() - started)
+        return result
+
+    def edit_lines(self, operation, args):
+        """Return the first line and number of lines an edit will touch"""
+
+        # Tk never touches the last (implicit) newline, so indexes past the end are clamped
+        last_line = self.stats.line_count
+        first = min(self.line_of(self.tk.call(self.tk_text, "index", args[0])), last_line)
+
+        if operation == "insert":
+            return first, 1
+
+        # "delete" may receive several ranges at once, let the caller recount those
+        if operation == "delete" and len(args) > 2:
+            raise TclError("multiple ranges")
+
+        end = args[1] if len(args) > 1 else f"{args[0]}+1c"
+        last = min(self.line_of(self.tk.call(self.tk_text, "index", end)), last_line)
+
+        return first, max(last - first + 1, 1)
+
+    def resolved_args(self, operation, args):
+        """Return the arguments of an edit with its indexes resolved and without its tags"""
+
+        index = lambda i: str(self.tk.call(self.tk_text, "index", i))
+
+        if operation == "insert":
+            return [index(args[0]), "".join(map(str, args[1::2]))]
+        if operation == "delete":
+            # a single index deletes one character
+            if len(args) == 1:
+                return [index(args[0]), index(f"{args[0]}+1c")]
+            return [index(i) for i in args]
+        return [index(args[0]), index(args[1]), "".join(map(str, args[2::2]))]
+
+    def edit_span(self, operation, resolved_args):
+        """Return the (start, end, text) of an edit in characters (before it's made: the line index gives the offsets)"""
+
+        def offset(index):
+            line, column = self.position_of(index)
+            return self.line_index.offset(line, self.char_column(line + 1, column))
+
+        start = offset(resolved_args[0])
+        end = start if operation == "insert" else offset(resolved_args[1])
+        text = "" if operation == "delete" else resolved_args[-1]
+        return start, end, text
+
+    def edit_document(self, start, end, text):
+        """Apply an edit to the document, given in characters by edit_span"""
+
+        # the deleted pieces go to the undo history as they are (no copy of mapped text)
+        if not self.applying_history:
+            self.history.record(start, self.document.pieces(start, end), text)
+
+        self.document.delete(start, end - start)
+        self.document.insert(start, text)
+
+    @staticmethod
+    def position_of(index):
+        """Split a Tk "line.column" index into a 0-based (line, column)"""
+
+        line, column = str(index).split(".")
+        return int(line) - 1, int(column)
 
-            self.bottom_frame.columnconfigure((1, 2, 3, 4, 5), weight=0)
-            self.bottom_frame.columnconfigure(0, weight=13)
+    def offset_of(self, index):
+        """Convert a Tk index to an absolute character offset, in O(log n)"""
 
-        ### REFACTOR THIS !!! ###
+        line, column = str(self.text_editor.index(index)).split(".")
+        return self.line_index.offset(int(line) - 1, self.char_column(int(line), int(column)))
 
-        if which_widgets == "title" or which_widgets == "all":
+    def index_of(self, offset):
+        """Convert an absolute character offset to a Tk "line.column" index, in O(log n)"""
 
-            if self.actual_file:
-                text = self.text_editor.get("1.0", "end-1c")
-                self.title_label = CTkLabel(self.bottom_frame, font=(CONFIG["default_font"], 13), text_color=COLOR_CONFIG["secondary_text_color"], text=os.path.basename(self.actual_file) + (" *" if text != self.last_saved_text else "") if self.actual_file else "Untitled")
-                #self.title_label.configure(text=os.path.basename(self.actual_file) + (" *" if text != self.last_saved_text else ""))
+        line, column = self.line_index.position(offset)
+        return f"{line + 1}.{self.tk_column(line + 1, column)}"
+
+    # Tcl 8.6 counts a character outside the BMP (an emoji) as two in the indexes, Python as one:
+    # the columns of the lines holding such characters are converted
+
+    def line_end(self, line):
+        """Return the Tk column of the end of a 1-based line"""
+
+        return int(str(self.tk.call(self.tk_text, "index", f"{line}.end")).split(".")[1])
+
+    def char_column(self, line, column):
+        """Convert the Tk column of a 1-based line to a number of characters"""
+
+        if not self.wide_chars or not column:
+            return column
+        # (in large file mode, the line index doesn't hold the lines of the editor)
+        if not self.large_file and self.line_end(line) == self.line_index.line_length(line - 1):
+            return column
+        return len(str(self.tk.call(self.tk_text, "get", f"{line}.0", f"{line}.{column}")))
+
+    def tk_column(self, line, column, length=None):
+        """Convert a number of characters from the start of a 1-based line to a Tk column (length: of the line, if known)"""
+
+        if not self.wide_chars or not column:
+            return column
+        if length is None and not self.large_file:
+            length = self.line_index.line_length(line - 1)
+        if self.line_end(line) == length:
+            return column
+        text = str(self.tk.call(self.tk_text, "get", f"{line}.0", f"{line}.end"))
+        return column + sum(ord(char) > 0xFFFF for char in text[:column])
+
+    def tk_end(self, start, length):
+        """Return the Tk index `length` characters after a Tk index"""
+
+        if not self.wide_chars:
+            return f"{start}+{length}c"
+        # at most twice as many Tk characters
+        text = str(self.tk.call(self.tk_text, "get", start, f"{start}+{2 * length}c"))[:length]
+        return f"{start}+{length + sum(ord(char) > 0xFFFF for char in text)}c"
+
+    @staticmethod
+    def line_of(index):
+        """Grab the line number of a Tk "line.column" index"""
+
+        return int(str(index).split(".")[0])
+
+    def create_bottom_bar(self):
+        """Create the bottom bar (its labels come later, see create_status_labels)"""
+        
+        self.bottom_frame = CTkFrame(self, height=40, corner_radius=0, bg_color=COLOR_CONFIG["main_color"], fg_color=COLOR_CONFIG["main_color"])
+        self.bottom_frame.pack(fill="x", padx=20)
+        self.theme.register(self.bottom_frame, fg_color="main_color", bg_color="main_color")
+
+        self.bottom_frame.columnconfigure((1, 2, 3, 4, 5), weight=0)
+        self.bottom_frame.columnconfigure(0, weight=13)
+        # the labels don't exist until then
+        self.status_ready = False
+
+    def create_status_labels(self):
+        """Create the bottom bar labels (all of them, the preferences only show or hide them)"""
+
+        # (attribute, column, text) of every label
+        labels = (
+            ("title_label", 0, self.title_text()),
+            ("margin_label", 1, f"M: {CONFIG['margin']}"),
+            ("font_size_label", 2, f"FS: {CONFIG['font_size']}"),
+            ("actual_font_label", 3, CONFIG["font"]),
+            ("word_count_label", 4, f"W: {self.stats.words}"),
+            ("chars_label", 5, f"C: {self.stats.chars}"),
+            # shows the special modes the editor is in (hidden when there's none)
+            ("mode_label", 6, ""),
+            ("position_label", 7, "Ln 1, Col 1"),
+            # the slowest timed handlers (F12, when the instrumentation is on)
+            ("performance_label", 8, "")
+        )
+
+        for attribute, column, text in labels:
+            label = CTkLabel(self.bottom_frame, font=(CONFIG["default_font"], 13), text_color=COLOR_CONFIG["secondary_text_color"], text=text)
+            if column:
+                label.grid(row=0, column=column, sticky="e", ipadx=20)
             else:
-                self.title_label = CTkLabel(self.bottom_frame, font=(CONFIG["default_font"], 13), text_color=COLOR_CONFIG["secondary_text_color"], text="Untitled")
-            self.title_label.grid(row=0, column=0, sticky="w")
-        if which_widgets == "chars" or which_widgets == "all":
-            self.chars_label = CTkLabel(self.bottom_frame, font=(CONFIG["default_font"], 13), text_color=COLOR_CONFIG["secondary_text_color"], text=f"C: {len(self.text_editor.get("1.0", "end-1c"))}")
-            self.chars_label.grid(row=0, column=5, sticky="e", ipadx=20)
-        if which_widgets == "word_count" or which_widgets == "all":
-            self.word_count_label = CTkLabel(self.bottom_frame, font=(CONFIG["default_font"], 13), text_color=COLOR_CONFIG["secondary_text_color"], text=f"W: {len(self.text_editor.get("1.0", "end-1c").split())}")
-            self.word_count_label.grid(row=0, column=4, sticky="e", ipadx=20)
-        if which_widgets == "margin":
-            self.margin_label = CTkLabel(self.bottom_frame, font=(CONFIG["default_font"], 13), text_color=COLOR_CONFIG["secondary_text_color"], text=f"M: {CONFIG["margin"]}")
-            self.margin_label.grid(row=0, column=1, sticky="e", ipadx=20)
-        if which_widgets == "font_size":
-            self.font_size_label = CTkLabel(self.bottom_frame, font=(CONFIG["default_font"], 13), text_color=COLOR_CONFIG["secondary_text_color"], text=f"FS: {CONFIG["font_size"]}")
-            self.font_size_label.grid(row=0, column=2, sticky="e", ipadx=20)
-        if which_widgets == "actual_font" or which_widgets == "all":
-            self.actual_font_label = CTkLabel(self.bottom_frame, font=(CONFIG["default_font"], 13), text_color=COLOR_CONFIG["secondary_text_color"], text=CONFIG["font"])
-            self.actual_font_label.grid(row=0, column=3, sticky="e", ipadx=20)
+                label.grid(row=0, column=column, sticky="w")
+            self.theme.register(label, text_color="secondary_text_color")
+            setattr(self, attribute, label)
+
+        self.mode_label.grid_remove()
+        self.performance_label.grid_remove()
+        self.status_ready = True
+        # the preferences (the saved ones included) hide the labels they don't show
+        self.update_preferences()
+
+        # fill in everything requested so far
+        self.status_updates.request("counts", "title", "font", "font_size", "margin", "position", "mode")
+
+    @staticmethod
+    def is_shown(label):
+        return label.winfo_manager() != ""
         
     def bind_shortcuts(self):
         """Bind keyboard shortcuts to corresponding functions"""
 
         shortcuts = {
-            "<Control-n>": self.new_file,
+            "<Control-n>": self.new_buffer,
+            "<Control-w>": self.close_buffer,
+            "<Control-Tab>": self.next_buffer,
+            # Shift+Tab is ISO_Left_Tab on X11
+            "<Control-Shift-Tab>": self.previous_buffer,
+            "<Control-ISO_Left_Tab>": self.previous_buffer,
             "<Control-o>": self.open_file,
             "<Control-s>": self.save_file,
             "<Control-Shift-S>": self.save_as_file,
@@ -133,331 +863,1512 @@ class MainApp(CTk):
             "<Control-=>": self.increase_margin,
             "<Control-minus>": self.decrease_margin,
             "<Control-d>": self.toggle_theme,
-            "<Control-f>": self.next_font,
-            "<F1>": self.show_preferences
+            "<Control-f>": self.show_find_bar,
+            "<Control-Shift-F>": self.next_font,
+            "<F1>": self.show_preferences,
+            "<Escape>": self.cancel_loading,
+            "<Control-g>": self.go_to_line,
+            "<Control-l>": self.toggle_follow,
+            "<F12>": self.toggle_performance_overlay
         }
 
         # bind each key and fucntion in the dictionary
         for key, func in shortcuts.items():
             self.text_editor.bind(key, func)
 
+        # keep the line:column readout up to date when the cursor moves
+        for sequence in ("<KeyRelease>", "<ButtonRelease>"):
+            self.text_editor.bind(sequence, lambda event: self.status_updates.request("position"))
+
     def text_changed(self, event=None):
-        """Updates the character count"""
+        """Schedule an update of the character count and file name"""
+
+        self.status_updates.request("counts", "title", "position")
+
+        # the matches of an open find bar are now outdated
+        if self.find_bar and self.find_bar.winfo_ismapped():
+            self.find_bar.search_updates.request("refresh")
 
-        # grab the actual text
-        text = self.text_editor.get("1.0", "end-1c")
-        # get the chars and word count and updates the labels
-        if self.chars_label:
-            self.chars_label.configure(text=f"C: {len(text)}")
-        if self.word_count_label:
-            self.word_count_label.configure(text=f"W: {len(text.split())}")
+    def refresh_status(self, parts):
+        """Refresh the requested parts of the bottom bar (called by the status scheduler)"""
+
+        # the labels are built in idle time after startup, which refreshes them all
+        if not self.status_ready:
+            return
+
+        # hidden labels are refreshed when they're shown again
+        shown = self.is_shown
+
+        # get the chars and word count (already kept up to date by text_command) and updates the labels
+        if "counts" in parts:
+            chars, words = self.counts()
+            if shown(self.chars_label):
+                self.chars_label.configure(text=f"C: {chars}")
+            if shown(self.word_count_label):
+                self.word_count_label.configure(text=f"W: {words}")
 
         # if the text is NOT equal to the last saved one, adds the * in the file name
-        if self.title_label:
-            if self.actual_file:
-                self.title_label.configure(text=os.path.basename(self.actual_file) + (" *" if text != self.last_saved_text else ""))
+        if "title" in parts and shown(self.title_label):
+            self.title_label.configure(text=self.title_text())
+
+        if "font" in parts and shown(self.actual_font_label):
+            self.actual_font_label.configure(text=CONFIG["font"])
+        if "font_size" in parts and shown(self.font_size_label):
+            self.font_size_label.configure(text=f"FS: {CONFIG['font_size']}")
+        if "margin" in parts and shown(self.margin_label):
+            self.margin_label.configure(text=f"M: {CONFIG['margin']}")
+
+        if "position" in parts:
+            line, column = str(self.text_editor.index("insert")).split(".")
+            # in large file mode, the editor only holds some of the lines
+            line = int(line) + (self.large_file.first if self.large_file else 0)
+            self.position_label.configure(text=f"Ln {line}, Col {int(column) + 1}")
+
+        if "mode" in parts:
+            modes = self.active_modes()
+            self.mode_label.configure(text="  ".join(modes))
+            if modes:
+                self.mode_label.grid()
             else:
-                self.title_label.configure(text="Untitled")
+                self.mode_label.grid_remove()
+
+    def counts(self):
+        """Return the (characters, words) of the document, "..." while unknown"""
+
+        if self.large_file:
+            if self.large_file.chars is None:
+                return "...", "..."
+            return self.large_file.chars, self.large_file.words
+
+        return self.stats.chars, self.stats.words
+
+    def active_modes(self):
+        """Return the descriptions of the special modes the editor is in"""
+
+        modes = []
+        if self.large_file:
+            indexing = f" indexing {self.large_file.progress}%" if self.large_file.indexing else ""
+            modes.append(f"[large file, read-only{indexing}]")
+        if self.following:
+            modes.append("[follow]")
+        if self.long_line_mode:
+            modes.append("[long lines, no wrap]")
+        return modes
+
+    def title_text(self):
+        """Return the file name, with a * if there are unsaved changes (and which document it is)"""
+
+        count = len(self.buffers)
+        return self.file_text() + (f"  [{self.buffer_index + 1}/{count}]" if count > 1 else "")
+
+    def file_text(self):
+        if not self.actual_file:
+            return "Untitled"
+
+        if self.loading:
+            done = self.loading.progress if self.loading.progress is not None else self.load_chars / max(self.load_size, 1)
+            progress = min(int(done * 100), 99)
+            # a hibernated document can't be cancelled
+            return f"{os.path.basename(self.actual_file)}  loading {progress}%" + ("" if self.waking else " (esc to cancel)")
+        if self.saving:
+            progress = f" {min(int(self.saving.progress * 100), 99)}%" if self.saving.progress is not None else "..."
+            return f"{os.path.basename(self.actual_file)}  saving{progress}"
+
+        return os.path.basename(self.actual_file) + (" *" if self.is_dirty() else "")
+
+    def check_long_lines(self):
+        """Turn the long line mode on / off as long lines appear / disappear (the text itself never changes)"""
+
+        long_lines = self.large_file.long_lines if self.large_file else self.line_index.long_lines
+        if bool(long_lines) != self.long_line_mode:
+            self.long_line_mode = bool(long_lines)
+            self.apply_wrap()
+            self.status_updates.request("mode")
+
+    def apply_wrap(self):
+        """Wrap the text as PREFERENCES says, unless the editor is in the long line mode"""
+
+        self.text_editor.configure(wrap="word" if PREFERENCES["wrap text"] and not self.long_line_mode else "none")
+
+    # DIRTY TRACKING
+
+    @staticmethod
+    def new_digest():
+        """Return an empty hash object, fed with the UTF-8 encoded text"""
+
+        return hashlib.blake2b(digest_size=16)
+
+    @staticmethod
+    def text_digest(text):
+        """Return a short digest of a text"""
+
+        digest = MainApp.new_digest()
+        digest.update(text.encode("utf-8", "surrogatepass"))
+        return digest.digest()
+
+    @staticmethod
+    def pieces_digest(pieces):
+        """Return the digest of a document snapshot, same as text_digest of its text"""
+
+        return MainApp.pieces_hasher(pieces).digest()
+
+    @staticmethod
+    def pieces_hasher(pieces):
+        """Return the hash object fed with the text of a document snapshot"""
+
+        digest = MainApp.new_digest()
+        for data in encode_pieces(pieces, errors="surrogatepass"):
+            digest.update(data)
+        return digest
+
+    def is_dirty(self):
+        """Return whether the text differs from the last saved one"""
+
+        # large files can't be edited
+        if self.large_file:
+            return False
+
+        # nothing was edited since the last save
+        if self.edit_seq == self.saved_seq:
+            return False
+        # Tk's modified flag is only cleared on save (or by the digest check below)
+        if not self.text_editor.edit_modified():
+            return False
+
+        # after an undo/redo, the text may still be the saved one, so compare digests
+        # (the cheap length check avoids hashing whenever possible)
+        if self.check_digest and CONFIG["verify_dirty_digest"]:
+            self.check_digest = False
+            if self.stats.chars == self.saved_chars and self.pieces_digest(self.document.snapshot()) == self.saved_digest:
+                self.text_editor.edit_modified(False)
+                return False
+
+        return True
+
+    def mark_saved(self, digest, seq=None, chars=None):
+        """Set the text whose digest is given as the saved state (by default, it's the actual text)"""
+
+        self.saved_seq = self.edit_seq if seq is None else seq
+        self.saved_chars = self.stats.chars if chars is None else chars
+        self.saved_digest = digest
+        self.check_digest = False
+        # if the text was edited since, it's still modified
+        if self.saved_seq == self.edit_seq:
+            self.text_editor.edit_modified(False)
 
     # FILE MANAGEMENT
 
     def new_file(self, event=None):
         """Clear the editor to create a new file"""
 
+        self.stop_loading()
+        self.close_large_file()
         self.actual_file = None
+        self.compression = None
+        self.stop_journal()
+        self.unwatch_file()
         self.text_editor.delete("1.0", END)
-        self.last_saved_text = ""
-        self.title_label.configure(text="Untitled")
+        self.mark_saved(self.text_digest(""))
+        self.start_journal()
+        self.status_updates.request("title")
     
     def open_file(self, event=None):
         """Open a file"""
 
         # show open file dialog
-        file_path = filedialog.askopenfilename(title="Open File", filetypes=(("All Files", "*.*"), ("Text Files", "*.txt")))
+        file_path = filedialog.askopenfilename(title="Open File", filetypes=(("All Files", "*.*"), ("Text Files", "*.txt"), ("Compressed Files", "*.gz *.bz2 *.xz")))
         # if a file was selected, sets it as the actual
         if file_path:
-            try:
-                # open the selected file, read the content and paste it on the editor
-                with open(file_path, "r") as file:
-                    content = file.read()
-                    # erase previous text
-                    self.text_editor.delete("1.0", END)
-                    # inserts the opened file's text
-                    self.text_editor.insert(END, content)
-                    # set the opened text as saved
-                    self.last_saved_text = content
-                # set the file path as the actual file
-                self.actual_file = file_path
-                # update labels
-                self.text_changed()
-            # if not able to open the file, shows a popup
-            except Exception as e:
-                 self.create_popup("Error: Unable to open the file.", True)
+            self.open_path(file_path)
 
         # prevents other default methods bound to the ctrl+o shortcut from being executed
         return "break"
 
+    def open_path(self, file_path):
+        """Show a file: its buffer if it's already open, else a new buffer (or the actual one if it's blank)"""
+
+        if self.waking or self.saving:
+            return
+
+        index = self.buffer_of(file_path)
+        if index is not None and index != self.buffer_index:
+            self.switch_buffer(index - self.buffer_index)
+            return
+
+        # a file being loaded is replaced, as before
+        if not self.loading and not self.is_blank():
+            self.new_buffer()
+        self.load_file(file_path)
+
+    def open_paths(self, file_paths):
+        """Open files after the actual one, each in a buffer: the first one now, the others once they're shown"""
+
+        # a file being loaded or saved belongs to the actual buffer
+        if self.loading or self.saving:
+            self.after(100, self.open_paths, file_paths)
+            return
+
+        buffers = []
+        for file_path in dict.fromkeys(os.path.abspath(file_path) for file_path in file_paths):
+            index = self.buffer_of(file_path)
+            if index is None:
+                buffer = Buffer(file_path)
+                buffer.unloaded = True
+                buffers.append(buffer)
+            elif not buffers and index != self.buffer_index:
+                # already open: shown if it's the first one
+                self.switch_buffer(index - self.buffer_index)
+                return
+
+        if not buffers:
+            return
+
+        # an untouched untitled document is replaced
+        if self.is_blank():
+            del self.buffers[self.buffer_index]
+        else:
+            self.hibernate()
+            self.buffer_index += 1
+        self.buffers[self.buffer_index:self.buffer_index] = buffers
+        self.wake()
+        self.settings_changed()
+
+    def load_file(self, file_path, position=None):
+        """Read a file on a worker thread and stream it into the editor (then at the (cursor, view, line) position)"""
+
+        try:
+            size = os.path.getsize(file_path)
+        # if not able to open the file, shows a popup
+        except OSError:
+            self.create_popup("Error: Unable to open the file.", True)
+            return
+
+        self.stop_loading()
+        self.close_large_file()
+        self.stop_journal()
+        self.unwatch_file()
+        # erase previous text
+        self.text_editor.delete("1.0", END)
+
+        # compressed files are decompressed as they're read (and compressed the same way on save)
+        compression = detect(file_path)
+
+        # big files are mapped in memory and shown a few lines at a time
+        if size > CONFIG["large_file_threshold"] and not compression:
+            self.open_large_file(file_path, position[2] if position else 0)
+            return
+
+        # set the file path as the actual file
+        self.actual_file = file_path
+        self.compression = compression
+        self.load_seq = self.edit_seq
+        self.load_chunks = 0
+        self.load_chars = 0
+        self.load_size = size
+        self.load_started = time.perf_counter()
+        self.load_position = position
+        self.loading = BackgroundTask(self, lambda task: self.read_chunks(task, file_path, compression), self.insert_chunk, self.file_loaded)
+        self.status_updates.request("title")
+
+    @staticmethod
+    def read_chunks(task, file_path, compression=None):
+        """Send the file to the Tk loop chunk by chunk, return its document and what the watcher knows of it (worker thread)"""
+
+        digest = MainApp.new_digest()
+        copy = None
+
+        with open(file_path, "rb") as original:
+            # the watcher knows the file as it was before it was read: a change made meanwhile is noticed
+            stat = os.fstat(original.fileno())
+            # a plain UTF-8 file is read from a private copy, which the document then maps (see PieceTable.from_file)
+            if not compression and MainApp.utf8_locale() and sys.platform != "win32":
+                try:
+                    copy = private_copy(original, cache_directory())
+                except OSError:
+                    pass
+            raw = copy or original
+            size = max(os.fstat(raw.fileno()).st_size, 1)
+            # a compressed file is decompressed a chunk at a time, like a plain one is decoded
+            file = io.TextIOWrapper(open_reader(compression[0], raw) if compression else raw)
+            while not task.cancelled.is_set():
+                chunk = file.read(CONFIG["load_chunk_size"])
+                if not chunk:
+                    break
+                digest.update(chunk.encode("utf-8", "surrogatepass"))
+                task.progress = raw.tell() / size
+                task.send(chunk)
+
+            if compression:
+                # only the signature helps with a compressed file, its changes are always read whole
+                known = ((stat.st_mtime_ns, stat.st_size, stat.st_ino), 0, b"", digest)
+            else:
+                # the bytes read, and the last of them (to recognize appends)
+                offset = raw.tell()
+                raw.seek(max(offset - FileWatcher.TAIL_SIZE, 0))
+                tail = raw.read(offset - raw.tell())
+                # the file grew while being copied: the signature mustn't match, so the rest is read too
+                known = ((stat.st_mtime_ns if stat.st_size == offset else None, offset, stat.st_ino), offset, tail, digest)
+
+        # the document maps the copy instead of holding the text a second time (the copy is gone once it's unmapped)
+        document = None
+        if copy:
+            with copy:
+                if not task.cancelled.is_set():
+                    try:
+                        document = PieceTable.from_file(copy)
+                    except (OSError, ValueError):
+                        pass
+
+        return document, known
+
+    @staticmethod
+    def utf8_locale():
+        """Return whether files are read and written as UTF-8"""
+
+        return locale.getpreferredencoding(False).lower().replace("-", "") == "utf8"
+
+    def insert_chunk(self, chunk):
+        """Paste a chunk of the file being loaded at the end of the editor"""
+
+        self.text_editor.insert(END, chunk)
+        self.load_chunks += 1
+        self.load_chars += len(chunk)
+        self.status_updates.request("title")
+
+    def file_loaded(self, result, error):
+        """Called once the whole file was read (or reading it failed)"""
+
+        self.loading = None
+        self.text_editor.edit_reset()
+
+        if error:
+            self.new_file()
+            self.create_popup("Error: Unable to open the file.", True)
+            return
+
+        if self.metrics:
+            self.metrics.record("open (whole file)", time.perf_counter() - self.load_started)
+
+        # set the opened text as saved, unless the user already typed something while it was loading
+        document, known = result
+        digest = known[3].digest()
+        if self.edit_seq - self.load_seq == self.load_chunks:
+            self.mark_saved(digest)
+        else:
+            self.mark_saved(digest, self.load_seq, self.load_chars)
+            document = None
+        # without a mapped file (or with edits made while loading), the document is a copy of the text
+        if document is None or len(document) != self.stats.chars:
+            document = PieceTable(self.text_editor.get("1.0", "end-1c"))
+        self.document = document
+        self.start_journal()
+        self.watch_file(known)
+
+        # a file of the last session goes back where it was left
+        if self.load_position:
+            cursor, view, _ = self.load_position
+            self.text_editor.mark_set("insert", self.index_of(min(cursor, self.stats.chars)))
+            self.text_editor.yview_moveto(view)
+
+        # update labels
+        self.text_changed()
+        self.settings_changed()
+
+    def open_large_file(self, file_path, line=0):
+        """Open a file in the read-only large file mode"""
+
+        try:
+            self.large_file = LargeFileView(self, file_path, line)
+        except (OSError, ValueError):
+            self.create_popup("Error: Unable to open the file.", True)
+            return
+
+        self.actual_file = file_path
+        self.compression = None
+        self.document.reset()
+        self.history.reset()
+        # only its signature matters, a change opens the file again
+        self.watch_file((file_signature(file_path), 0, b"", None))
+        self.status_updates.request("title", "counts", "mode")
+        self.settings_changed()
+
+    def close_large_file(self):
+        """Leave the large file mode, if the editor is in it"""
+
+        if self.large_file:
+            self.large_file.close()
+            self.large_file = None
+            self.check_long_lines()
+            self.status_updates.request("counts", "mode")
+
+    def stop_loading(self):
+        """Stop the background loading of a file, if there's one"""
+
+        if self.loading:
+            self.loading.cancel()
+            self.loading = None
+            self.document.reset(self.text_editor.get("1.0", "end-1c"))
+            # the partly loaded text was never recorded, the history doesn't apply to it
+            self.history.reset()
+
+    def cancel_loading(self, event=None):
+        """Cancel the file being loaded, leaving an empty untitled document"""
+
+        if not self.loading or self.waking:
+            return
+
+        # the partial text must never be saved over the file
+        self.new_file()
+
+        # prevents other default methods bound to the esc key from being executed
+        return "break"
+
     def save_file(self, event=None):
         """Save the file in the stored path"""
 
+        # a half loaded file can't be saved, neither can a read-only large file
+        if self.loading or self.large_file or self.saving:
+            return "break"
+
         # if there's a path for the file, saves in it
         if self.actual_file:
-            with open(self.actual_file, "w") as file:
-                file.write(self.text_editor.get("1.0", "end-1c"))
-            # set as saved this new text
-            self.last_saved_text = self.text_editor.get("1.0", "end-1c")
-            self.text_changed()
+            # take a snapshot of the document (no copy of the text), the rest is done on a worker thread
+            file_path = self.actual_file
+            pieces = self.document.snapshot()
+            compression = self.compression
+            seq, chars = self.edit_seq, self.stats.chars
+            self.save_started = time.perf_counter()
+            self.saving = BackgroundTask(
+                self, lambda task: self.write_file(file_path, pieces, compression, task),
+                on_done=lambda known, error: self.file_saved(seq, chars, known, error)
+            )
+            self.status_updates.request("title")
         # if there's no path, grabs it in the save as file function
         else:
             self.save_as_file()
 
+        # prevents other default methods bound to the ctrl+s shortcut from being executed
+        return "break"
+
+    @staticmethod
+    def write_file(file_path, pieces, compression=None, task=None):
+        """Atomically replace the file with a document snapshot, return what the watcher knows of it (worker thread)
+
+        A compressed file is written compressed (same format and level), a chunk at a time.
+        """
+
+        # write through symlinks instead of replacing them
+        file_path = os.path.realpath(file_path)
+        directory = os.path.dirname(file_path)
+        # the temporary file must be in the same directory (same file system) for os.replace
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix=".tmp")
+
+        offset, tail = 0, b""
+        total = max(sum(end - start for _, start, end in pieces), 1)
+        written = 0
+
+        def counted(pieces):
+            # the encoder takes the pieces one by one (and a long one by parts), the progress follows it
+            nonlocal written
+            for piece in pieces:
+                yield piece
+                written += piece[2] - piece[1]
+
+        try:
+            with os.fdopen(fd, "wb") as file:
+                stream = open_writer(*compression, file, os.path.basename(file_path)) if compression else file
+                # same encoding and newlines as a file opened in text mode
+                for data in encode_pieces(counted(pieces), locale.getpreferredencoding(False), os.linesep):
+                    stream.write(data)
+                    offset += len(data)
+                    tail = (tail + data[-FileWatcher.TAIL_SIZE:])[-FileWatcher.TAIL_SIZE:]
+                    if task:
+                        task.progress = written / total
+                if compression:
+                    # writes the end of the compressed stream (the file stays open)
+                    stream.close()
+                    offset, tail = 0, b""
+                file.flush()
+                os.fsync(file.fileno())
+            # keep the permissions of the file being replaced
+            try:
+                os.chmod(temp_path, os.stat(file_path).st_mode & 0o7777)
+            except FileNotFoundError:
+                os.chmod(temp_path, 0o644)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+        # make the rename itself durable (not possible on every system)
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+
+        return file_signature(file_path), offset, tail, MainApp.pieces_hasher(pieces)
+
+    def file_saved(self, seq, chars, known, error):
+        """Called once the worker finished writing the file"""
+
+        self.saving = None
+        if self.metrics:
+            self.metrics.record("save (whole file)", time.perf_counter() - self.save_started)
+
+        if error:
+            self.create_popup("Error: Unable to save the file.", True)
+        else:
+            # set as saved the text as it was when save was pressed
+            self.mark_saved(known[3].digest(), seq, chars)
+            self.watch_file(known)
+            # the file may have a new path
+            self.settings_changed()
+            # the journal starts over from the saved file, keeping what was typed during the save
+            self.start_journal()
+            if self.journal and self.edit_seq != seq:
+                self.journal.compact(self.document.snapshot())
+
+        self.status_updates.request("title")
+
     def save_as_file(self, event=None):
         """Opens a file dialog to grab a path to save the file"""
 
+        # same as save_file, these can't be saved
+        if self.loading or self.large_file or self.saving:
+            return "break"
+
         # grab file name and path to save
-        file_path = filedialog.asksaveasfilename(title="Save File", defaultextension=".*", filetypes=(("Text Files", "*.txt"), ("All Files", "*.*")))
+        file_path = filedialog.asksaveasfilename(title="Save File", defaultextension=".*", filetypes=(("Text Files", "*.txt"), ("All Files", "*.*"), ("Compressed Files", "*.gz *.bz2 *.xz")))
 
         if file_path:
-            # stores the new path
+            # stores the new path, whose extension decides the compression
             self.actual_file = file_path
+            self.compression = format_for_path(file_path, self.compression)
             self.save_file()
 
+    # OPEN DOCUMENTS (BUFFERS)
+
+    def buffer_of(self, file_path):
+        """Return the index of the buffer of a file, None if it isn't open"""
+
+        if not file_path:
+            return None
+
+        path = os.path.abspath(file_path)
+        for index, buffer in enumerate(self.buffers):
+            other = self.actual_file if index == self.buffer_index else buffer.file_path
+            if other and os.path.abspath(other) == path:
+                return index
+        return None
+
+    def is_blank(self):
+        """Return whether the actual document is an untouched untitled one"""
+
+        return not self.actual_file and not self.large_file and not self.stats.chars
+
+    def new_buffer(self, event=None):
+        """Open a new untitled document after the actual one"""
+
+        if self.loading or self.saving:
+            return "break"
+
+        self.hibernate()
+        self.buffer_index += 1
+        self.buffers.insert(self.buffer_index, Buffer())
+        self.new_file()
+
+        # prevents other default methods bound to the ctrl+n shortcut from being executed
+        return "break"
+
+    def next_buffer(self, event=None):
+        return self.switch_buffer(1)
+
+    def previous_buffer(self, event=None):
+        return self.switch_buffer(-1)
+
+    def switch_buffer(self, step):
+        """Hibernate the actual document and put the one `step` buffers away in the editor"""
+
+        # a file being loaded or saved belongs to the actual buffer
+        if self.loading or self.saving or len(self.buffers) == 1:
+            return "break"
+
+        self.hibernate()
+        self.buffer_index = (self.buffer_index + step) % len(self.buffers)
+        self.wake()
+        self.settings_changed()
+
+        # prevents other default methods bound to the ctrl+tab shortcuts (focus traversal) from being executed
+        return "break"
+
+    def close_buffer(self, event=None):
+        """Close the actual document, asking first if it has unsaved changes"""
+
+        if self.loading or self.saving:
+            return "break"
+
+        if self.is_dirty():
+            name = os.path.basename(self.actual_file) if self.actual_file else "Untitled"
+            self.create_popup(f"Close {name} without saving?", False, on_confirm=self.discard_buffer)
+        else:
+            self.discard_buffer()
+
+        # prevents other default methods bound to the ctrl+w shortcut from being executed
+        return "break"
+
+    def discard_buffer(self):
+        """Forget the actual document and show the next one (or an empty one if it was the last)"""
+
+        if self.loading or self.saving:
+            return
+
+        del self.buffers[self.buffer_index]
+        if not self.buffers:
+            self.buffers.append(Buffer())
+            self.new_file()
+            self.history.reset()
+            self.settings_changed()
+            return
+
+        # empty the editor, nothing of it is kept
+        self.close_large_file()
+        self.stop_journal()
+        self.unwatch_file()
+        self.document = PieceTable()
+        self.history = UndoHistory(CONFIG["undo_memory_limit"])
+        self.text_editor.delete("1.0", END)
+        self.history.reset()
+
+        self.buffer_index = min(self.buffer_index, len(self.buffers) - 1)
+        self.wake()
+        self.settings_changed()
+
+    def hibernate(self):
+        """Take the actual document out of the editor, keeping it (and its state) in its buffer"""
+
+        buffer = self.buffers[self.buffer_index]
+        buffer.file_path = self.actual_file
+        buffer.compression = self.compression
+        if self.find_bar and self.find_bar.winfo_ismapped():
+            self.find_bar.hide()
+
+        # a hibernated file isn't watched, what's known of it is kept for when it's woken up
+        if self.reloading:
+            self.reloading.cancel()
+            self.reloading = None
+        if self.watcher:
+            self.watcher.pause()
+        buffer.watcher, self.watcher = self.watcher, None
+
+        # a large file is only opened again on wake, at the line that was at the top
+        if self.large_file:
+            buffer.large_file_line = self.large_file.first + self.line_of(self.text_editor.index("@0,0")) - 1
+            self.close_large_file()
+            return
+
+        buffer.cursor = self.offset_of("insert")
+        buffer.view = self.text_editor.yview()[0]
+        buffer.dirty = self.is_dirty()
+        buffer.saved_digest, buffer.saved_chars = self.saved_digest, self.saved_chars
+        if self.journal:
+            self.journal.flush()
+        buffer.history, buffer.journal = self.history, self.journal
+        buffer.hibernate(self.document)
+
+        # empty the editor without the deletion reaching the kept document, history or journal
+        self.journal = None
+        self.history = UndoHistory(CONFIG["undo_memory_limit"])
+        self.document = PieceTable()
+        self.text_editor.delete("1.0", END)
+        self.history.reset()
+
+        # a document holding a lot of text of its own is compressed in the background
+        if buffer.needs_compression():
+            pieces = buffer.document.snapshot()
+            buffer.compressing = BackgroundTask(
+                self, lambda task: Buffer.compress(pieces, task),
+                on_done=lambda segments, error: self.buffer_compressed(buffer, segments, error)
+            )
+
+    def buffer_compressed(self, buffer, segments, error):
+        """Called once a hibernated document was compressed (it stays as it is if that failed)"""
+
+        buffer.compressing = None
+        if segments is not None and not error and buffer.document is not None:
+            buffer.compressed(segments)
+
+    def wake(self):
+        """Put the document of the active buffer back in the editor, streaming it like a file being loaded"""
+
+        buffer = self.buffers[self.buffer_index]
+        if buffer.compressing:
+            buffer.compressing.cancel()
+            buffer.compressing = None
+
+        # a file of the last session, read for the first time
+        if buffer.unloaded:
+            buffer.unloaded = False
+            self.actual_file = None
+            self.load_file(buffer.file_path, (buffer.cursor, buffer.view, buffer.large_file_line or 0))
+            buffer.large_file_line = buffer.watcher = None
+            # the file can't be read anymore
+            if not self.actual_file:
+                self.new_file()
+            self.status_updates.request("title")
+            return
+
+        if buffer.large_file_line is not None:
+            line = buffer.large_file_line
+            buffer.forget()
+            buffer.watcher = None
+            self.actual_file = None
+            self.open_large_file(buffer.file_path, line)
+            # the file is gone (or can't be read anymore)
+            if not self.large_file:
+                self.new_file()
+            self.status_updates.request("title")
+            return
+
+        self.actual_file = buffer.file_path
+        self.compression = buffer.compression
+        source = buffer.source()
+        self.load_seq = self.edit_seq
+        self.load_chunks = 0
+        self.load_chars = 0
+        self.load_size = buffer.chars
+        self.waking = buffer
+        self.loading = BackgroundTask(
+            self, lambda task: Buffer.wake_chunks(task, source, CONFIG["load_chunk_size"]),
+            self.insert_chunk, self.buffer_woken
+        )
+        self.status_updates.request("title")
+
+    def buffer_woken(self, document, error):
+        """Called once the whole document of the active buffer is back in the editor"""
+
+        buffer, self.waking = self.waking, None
+        self.loading = None
+
+        if error:
+            # its journal is left on disk, the next start offers to recover it
+            buffer.forget()
+            buffer.journal = None
+            self.new_file()
+            self.create_popup("Error: Unable to restore the document.", True)
+            return
+
+        # text typed while the document came back isn't part of its history
+        typed = self.edit_seq - self.load_seq != self.load_chunks
+        if typed:
+            document = PieceTable(self.text_editor.get("1.0", "end-1c"))
+            buffer.history.reset()
+
+        self.document = document
+        self.history = buffer.history
+        self.journal = buffer.journal
+        self.watcher = buffer.watcher
+        if self.watcher:
+            self.watcher.resume()
+        if buffer.dirty or typed:
+            # no edit number matches the saved text anymore, only its digest (after an undo/redo) does
+            self.mark_saved(buffer.saved_digest, -1, buffer.saved_chars)
+            self.text_editor.edit_modified(True)
+        else:
+            self.mark_saved(buffer.saved_digest)
+
+        # hibernated before the recovery question was answered, it has no journal yet
+        if not self.journal and self.journal_enabled:
+            self.start_journal()
+            if self.journal and (buffer.dirty or typed):
+                self.journal.compact(self.document.snapshot())
+
+        # back where it was left
+        self.text_editor.mark_set("insert", self.index_of(min(buffer.cursor, self.stats.chars)))
+        self.text_editor.yview_moveto(buffer.view)
+        buffer.forget()
+        buffer.history = buffer.journal = buffer.watcher = None
+
+        self.text_changed()
+
+    # SETTINGS AND SESSION
+
+    def settings_changed(self, *args):
+        """Write the settings once they stop changing for CONFIG["settings_write_delay"] ms"""
+
+        if self.settings_job:
+            self.after_cancel(self.settings_job)
+        self.settings_job = self.after(CONFIG["settings_write_delay"], self.save_settings)
+
+    def save_settings(self):
+        """Atomically write CONFIG, PREFERENCES (what differs from their defaults) and the open files"""
+
+        if self.settings_job:
+            self.after_cancel(self.settings_job)
+            self.settings_job = None
+
+        config = changed_settings(CONFIG, DEFAULTS["config"])
+        # what the command line changed keeps its saved value
+        for key in OVERRIDDEN:
+            config.pop(key, None)
+            if key in SETTINGS.get("config", {}):
+                config[key] = SETTINGS["config"][key]
+
+        documents, active = self.session()
+        settings = {
+            "config": config,
+            "preferences": changed_settings(PREFERENCES, DEFAULTS["preferences"]),
+            "session": {"documents": documents, "active": active}
+        }
+
+        try:
+            write_settings(settings)
+        except OSError:
+            pass
+
+    def session(self):
+        """Return the open files, where each one was left, and which one is active (untitled ones have journals)"""
+
+        documents = []
+        active = 0
+
+        for index, buffer in enumerate(self.buffers):
+            # the active document is in the editor, unless it's still being woken up
+            if index == self.buffer_index and not self.waking:
+                if not self.actual_file:
+                    continue
+                if self.large_file:
+                    line = self.large_file.first + self.line_of(self.text_editor.index("@0,0")) - 1
+                    document = {"file": self.actual_file, "line": line}
+                else:
+                    document = {"file": self.actual_file, "cursor": self.offset_of("insert"), "view": self.text_editor.yview()[0]}
+            elif buffer.file_path:
+                document = {"file": buffer.file_path, "cursor": buffer.cursor, "view": buffer.view, "line": buffer.large_file_line}
+            else:
+                continue
+
+            if index == self.buffer_index:
+                active = len(documents)
+            documents.append(document)
+
+        return documents, active
+
+    def restore_session(self):
+        """Reopen the files of the last session: the active one now, the others only once they're shown"""
+
+        session = SETTINGS.get("session")
+        if not isinstance(session, dict) or not isinstance(session.get("documents"), list):
+            return
+        # something was already opened (or typed) before the deferred startup got here
+        if not self.is_blank() or self.loading or len(self.buffers) > 1:
+            return
+
+        buffers = []
+        for document in session["documents"]:
+            if not isinstance(document, dict) or not isinstance(document.get("file"), str) or not os.path.isfile(document["file"]):
+                continue
+            buffer = Buffer(document["file"])
+            buffer.unloaded = True
+            buffer.cursor = document.get("cursor") if isinstance(document.get("cursor"), int) else 0
+            buffer.view = float(document["view"]) if isinstance(document.get("view"), (int, float)) else 0.0
+            buffer.large_file_line = document.get("line") if isinstance(document.get("line"), int) else None
+            buffers.append(buffer)
+
+        if not buffers:
+            return
+
+        active = session.get("active")
+        self.buffers = buffers
+        self.buffer_index = min(active, len(buffers) - 1) if isinstance(active, int) and active >= 0 else 0
+        self.wake()
+
+    # EXTERNAL CHANGES
+
+    def watch_file(self, known):
+        """Watch the actual file for changes made by other programs (known: what the document holds of it)"""
+
+        self.unwatch_file()
+        if self.actual_file:
+            self.watcher = FileWatcher(self.actual_file, known)
+
+    def unwatch_file(self):
+        if self.reloading:
+            self.reloading.cancel()
+            self.reloading = None
+        if self.watcher:
+            self.watcher.pause()
+            self.watcher = None
+
+    def check_file(self):
+        """Look for changes made to the actual file by other programs (runs every CONFIG["watch_interval"] ms)"""
+
+        # a large file still being indexed is looked at once it's done, only what was appended is indexed then
+        busy = self.loading or self.saving or self.reloading or self.active_popup or (self.large_file and self.large_file.indexing)
+        if self.watcher and not busy and self.watcher.changed():
+            if file_signature(self.actual_file) is None:
+                # deleted (or moved away): the document stays as it is, saving writes it again
+                self.watcher.ignore()
+            elif self.large_file:
+                self.reopen_large_file()
+            elif self.is_dirty():
+                # unsaved edits are never replaced without asking
+                self.create_popup(
+                    f"{os.path.basename(self.actual_file)} was changed by another program. Reload it, losing your changes?", False,
+                    on_confirm=self.reload_file, on_cancel=self.watcher.ignore
+                )
+            else:
+                self.reload_file()
+
+        self.after(CONFIG["watch_interval"], self.check_file)
+
+    def reload_file(self):
+        """Bring the document to the file on disk, reading and replacing as little as possible (in the background)"""
+
+        if not self.watcher or self.loading or self.saving or self.reloading or self.large_file:
+            return
+
+        file_path, known = self.actual_file, self.watcher.known
+        pieces, seq = self.document.snapshot(), self.edit_seq
+        # only the tail of a file that grew is read, when the document is still the known file
+        clean = not self.is_dirty()
+        encoding = locale.getpreferredencoding(False)
+        unpack = (lambda data, name=self.compression[0]: decompress(name, data)) if self.compression else None
+        self.reloading = BackgroundTask(
+            self, lambda task: read_changes(file_path, known, pieces, clean, encoding, self.new_digest, unpack),
+            on_done=lambda result, error: self.file_reloaded(seq, result, error)
+        )
+
+    def file_reloaded(self, seq, result, error):
+        """Replace the range of the document that differs from the file on disk"""
+
+        self.reloading = None
+        if error:
+            # unreadable for now, wait for the next change
+            self.watcher.ignore()
+            return
+        # edited in the meantime, the next check reads the file again
+        if self.edit_seq != seq:
+            return
+
+        (start, end, text), known = result
+        if end > start or text:
+            first, last = self.index_of(start), self.index_of(end)
+            # a single undo step
+            self.history.separator()
+            if end > start:
+                self.text_editor.delete(first, last)
+            if text:
+                self.text_editor.insert(first, text)
+            self.history.separator()
+
+        self.watcher.known = known
+        self.mark_saved(known[3].digest())
+        # the journal starts over from the file as it is now
+        self.start_journal()
+
+        if self.following:
+            self.text_editor.mark_set("insert", "end-1c")
+            self.text_editor.see("end")
+        self.text_changed()
+
+    def reopen_large_file(self):
+        """Index what was appended to a large file, or open it again at the same line (or its end when following it)"""
+
+        # taken before looking at the file, a later change is seen by the next check
+        signature = file_signature(self.actual_file)
+        if self.large_file.extend():
+            self.watcher.known = (signature,) + self.watcher.known[1:]
+            self.status_updates.request("mode")
+            return
+
+        top = self.large_file.first + self.line_of(self.text_editor.index("@0,0")) - 1
+        file_path = self.actual_file
+        self.close_large_file()
+        # the line is clamped to the last one
+        self.open_large_file(file_path, sys.maxsize if self.following else top)
+        if not self.large_file:
+            self.new_file()
+
+    def toggle_follow(self, event=None):
+        """Follow the actual file as it grows (like tail -f): the view stays at its end"""
+
+        self.following = not self.following
+        if self.following:
+            if self.large_file:
+                self.large_file.goto_line(self.large_file.file.line_count)
+            else:
+                self.text_editor.mark_set("insert", "end-1c")
+                self.text_editor.see("end")
+        self.status_updates.request("mode", "position")
+
+        # prevents other default methods bound to the ctrl+l shortcut from being executed
+        return "break"
+
+    # CRASH RECOVERY
+
+    def start_journal(self):
+        """Start journaling the edits of the actual document"""
+
+        self.stop_journal()
+        if not self.journal_enabled:
+            return
+
+        try:
+            key = None if self.actual_file else f"untitled-{os.getpid()}-{self.buffers[self.buffer_index].number}"
+            self.journal = EditJournal(cache_directory(), self.actual_file, key)
+        # no writable cache directory, go without a journal
+        except OSError:
+            self.journal_enabled = False
+            return
+        self.journal.start()
+
+    def stop_journal(self):
+        """Stop journaling, forgetting the journal of the actual document"""
+
+        if self.journal:
+            self.journal.discard()
+            self.journal = None
+
+    def flush_journal(self):
+        """Write the journaled edits in a batch (runs every CONFIG["journal_flush_interval"] ms)"""
+
+        if self.journal:
+            if self.journal.needs_compaction(CONFIG["journal_compact_size"]):
+                self.journal.compact(self.document.snapshot())
+            else:
+                self.journal.flush()
+
+        self.after(CONFIG["journal_flush_interval"], self.flush_journal)
+
+    def offer_recovery(self):
+        """If previous sessions crashed with unsaved work, offer to restore it"""
+
+        try:
+            journals = EditJournal.recoverable(cache_directory())
+        except OSError:
+            journals = []
+
+        self.offer_journals(journals)
+
+    def offer_journals(self, journals, failed=False):
+        """Offer the crashed journals one after another (each one restored in a buffer of its own), then start journaling"""
+
+        if not journals:
+            self.enable_journal()
+            if failed:
+                self.create_popup("Error: Unable to restore the unsaved changes.", True)
+            return
+
+        journal, rest = journals[0], journals[1:]
+        name = os.path.basename(journal.file_path) if journal.file_path else "Untitled"
+        self.create_popup(
+            f"Unsaved changes to {name} were found. Restore them?", False,
+            on_confirm=lambda: self.restore_journal(journal, lambda restored: self.offer_journals(rest, failed or not restored)),
+            on_cancel=lambda: (journal.discard(), self.offer_journals(rest, failed))
+        )
+
+    def enable_journal(self):
+        self.journal_enabled = True
+        # a restored document keeps its journal
+        if not self.journal:
+            self.start_journal()
+
+    def restore_journal(self, journal, then):
+        """Replay a crashed session's journal, in the background, then call `then` with whether it worked"""
+
+        def restored(loaded, error):
+            # wait for the document being loaded (or woken up) to be in the editor
+            if self.loading or self.saving:
+                self.after(100, restored, loaded, error)
+                return
+
+            if error or loaded is None:
+                journal.discard()
+                then(False)
+                return
+
+            # the recovered document replaces the buffer of its file, or gets a new one
+            index = self.buffer_of(journal.file_path)
+            if index is not None and index != self.buffer_index:
+                self.switch_buffer(index - self.buffer_index)
+                self.after(100, restored, loaded, error)
+                return
+            if index is None and not self.is_blank():
+                self.new_buffer()
+
+            base, edits = loaded
+            self.actual_file = journal.file_path
+            # saving writes it back in its own format
+            self.compression = compression
+            self.text_editor.delete("1.0", END)
+            self.text_editor.insert(END, base)
+            self.text_editor.edit_reset()
+            for operation, *args in edits:
+                self.tk.call((self.text_editor._textbox._w, operation) + tuple(args))
+
+            # the saved state is the file on disk, which no edit number matches: the restored text is unsaved
+            # (even from a snapshot alone, without edits to replay), unless it's the same as the file
+            if self.stats.chars == file_chars and self.pieces_digest(self.document.snapshot()) == file_digest:
+                self.mark_saved(file_digest)
+            else:
+                self.mark_saved(file_digest, -1, file_chars)
+                self.text_editor.edit_modified(True)
+
+            # keep appending to the same journal, now under this editor's pid
+            self.journal = journal
+            journal.compact(self.document.snapshot())
+            self.text_changed()
+            then(True)
+
+        def load(task):
+            nonlocal file_digest, file_chars, compression
+            loaded = journal.load()
+            # a file that's gone keeps the format its extension asks for
+            compression = detect(journal.file_path) if journal.file_path else None
+            if loaded and journal.file_path and os.path.exists(journal.file_path):
+                with open_text(journal.file_path) as file:
+                    text = file.read()
+                file_digest, file_chars = self.text_digest(text), len(text)
+            return loaded
+
+        file_digest, file_chars = self.text_digest(""), 0
+        compression = None
+        BackgroundTask(self, load, on_done=restored)
+
+    def close_app(self):
+        """Close the window, the journals aren't needed anymore"""
+
+        self.save_settings()
+        self.stop_listening()
+        self.stop_journal()
+        self.unwatch_file()
+        for buffer in self.buffers:
+            if buffer.journal:
+                buffer.journal.discard()
+        EditJournal.wait()
+        if self.metrics:
+            try:
+                self.metrics.dump(os.path.join(os.path.dirname(cache_directory()), "timings.json"))
+            except OSError:
+                pass
+        self.destroy()
+
+    # SINGLE INSTANCE
+
+    def listen_for_launches(self):
+        """Open the files of the later launches of the editor, they hand them over a socket and exit (see instance.py)"""
+
+        if not hasattr(self.tk, "createfilehandler"):
+            return
+        self.instance = InstanceServer.start()
+        if self.instance:
+            # called by the Tk loop as soon as a launch connects, no polling
+            self.tk.createfilehandler(self.instance.socket, READABLE, lambda *args: self.launched())
+
+    def stop_listening(self):
+        if self.instance:
+            self.tk.deletefilehandler(self.instance.socket)
+            self.instance.close()
+            self.instance = None
+
+    def launched(self):
+        """A later launch connected: show the window and open its files"""
+
+        file_paths = self.instance.accept()
+        if file_paths is None:
+            return
+
+        self.deiconify()
+        self.lift()
+        self.focus_force()
+        if file_paths:
+            self.open_paths(file_paths)
+
+    # INSTRUMENTATION
+
+    def toggle_performance_overlay(self, event=None):
+        """Show / hide the slowest timed handlers in the bottom bar"""
+
+        if not self.metrics or not self.status_ready:
+            return
+
+        if self.is_shown(self.performance_label):
+            self.performance_label.grid_remove()
+        else:
+            self.performance_label.grid()
+            self.refresh_performance_overlay()
+
+    def refresh_performance_overlay(self):
+        """Write the p50 / p99 of the slowest handlers, every second while shown"""
+
+        if not self.is_shown(self.performance_label):
+            return
+
+        parts = []
+        for name in self.metrics.slowest():
+            count, p50, p99, _ = self.metrics.stats(name)
+            parts.append(f"{name} {p50:.1f}/{p99:.1f}ms")
+        self.performance_label.configure(text="  ".join(parts) or "no timings yet")
+        self.after(1000, self.refresh_performance_overlay)
+
     # PREFERENCES
     
     def increase_font(self, event=None):
         """Increase font size"""
 
         CONFIG["font_size"] += 2
-        self.text_editor.configure(font=(CONFIG["font"], CONFIG["font_size"]))
-
-        try:
-            if self.font_size_label:
-                self.font_size_label.configure(text=f"FS: {CONFIG["font_size"]}")
-        except:
-            pass
+        self.view_updates.request("font")
+        self.status_updates.request("font_size")
+        self.settings_changed()
     
     def decrease_font(self, event=None):
         """Decrease font size"""
 
         if CONFIG["font_size"] > 10:
             CONFIG["font_size"] -= 2
-            self.text_editor.configure(font=(CONFIG["font"], CONFIG["font_size"]))
-            try:
-                if self.font_size_label:
-                    self.font_size_label.configure(text=f"FS: {CONFIG["font_size"]}")
-            except:
-                pass
+            self.view_updates.request("font")
+            self.status_updates.request("font_size")
+            self.settings_changed()
         
     def next_font(self, event=None):
         """Switch to next font"""
         
-        # fonts avaible
-        fonts = ["Consolas", "Inconsolata", "Garamond", "Arial", "Times"]
         # gets the ACTUAL font index and adds 1 to ti (and, if the new index is BIGGER than the actual number of fonts, sets it to 0)
-        index = (fonts.index(CONFIG["font"]) + 1) % len(fonts)
+        index = (FONTS.index(CONFIG["font"]) + 1) % len(FONTS) if CONFIG["font"] in FONTS else 0
         # set the font with the new index as the actual font
-        CONFIG["font"] = fonts[index]
-        # update the text editor
-        self.text_editor.configure(font=(CONFIG["font"], CONFIG["font_size"]))
+        CONFIG["font"] = FONTS[index]
+        # update the text editor (once the key stops repeating)
+        self.view_updates.request("font")
         # update the label 
-        try:
-            if self.actual_font_label:
-                self.actual_font_label.configure(text=CONFIG["font"])
-        except:
-            pass
+        self.status_updates.request("font")
+        self.settings_changed()
         
     def toggle_theme(self, event=None):
-        """Toggle the actual app theme"""
+        """Switch to the next theme of THEMES"""
 
         global COLOR_CONFIG
 
-        CONFIG["theme"] = "dark" if CONFIG["theme"] == "light" else "light"
-        
-        if CONFIG["theme"] == "light":
-            COLOR_CONFIG = {
-            "main_color": "white",
-            "text_color": "black",
-            "secondary_text_color": "gray",
-            "button_color": "#d1d1d1",
-            "button_hover": "#e3e2e1",
-            "button_text": "#424242" 
-            }
-        else:
-            COLOR_CONFIG = {
-            "main_color": "black",
-            "text_color": "#bdbdbd",
-            "secondary_text_color": "gray",
-            "button_color": "gray",
-            "button_hover": "light gray",
-            "button_text": "black" 
-            }   
+        names = list(THEMES)
+        previous = THEMES[CONFIG["theme"]]
+        CONFIG["theme"] = names[(names.index(CONFIG["theme"]) + 1) % len(names)]
+        theme = THEMES[CONFIG["theme"]]
 
-        set_appearance_mode(CONFIG["theme"])
+        # widgets created from now on read the new palette
+        COLOR_CONFIG = dict(theme["colors"])
+
+        # changing the appearance mode redraws every customtkinter widget, only do it when needed
+        if theme["appearance"] != previous["appearance"]:
+            set_appearance_mode(theme["appearance"])
         self.update_widgets_color()
+        self.settings_changed()
 
         # prevents other default methods bound to the ctrl+d shortcut from being executed
         return "break"
     
     def update_widgets_color(self):
-        """Update the colors of the displayed widgets"""
+        """Update the colors of the registered widgets that use a changed palette key"""
 
-        self.configure(fg_color=COLOR_CONFIG["main_color"])
-        self.text_frame.configure(fg_color=COLOR_CONFIG["main_color"])
+        return self.theme.apply(COLOR_CONFIG)
 
-        self.text_editor.configure(fg_color=COLOR_CONFIG["main_color"], text_color=COLOR_CONFIG["text_color"], scrollbar_button_color=COLOR_CONFIG["button_color"])
+    def increase_margin(self, event=None):
+        """Increase the lateral margin"""
 
-        self.bottom_frame.configure(fg_color=COLOR_CONFIG["main_color"])
+        CONFIG["margin"] += 10
+        self.view_updates.request("margin")
+        self.status_updates.request("margin")
+        self.settings_changed()
+    
+    def decrease_margin(self, event=None):
+        """Decrease the lateral margin"""
 
-        # if there's an active popup, update its colors too
-        if self.active_popup:
-            # update the main frame of the popup
-            self.active_popup.configure(fg_color=COLOR_CONFIG["main_color"])
-            # update the colors of the label
-            self.active_popup.label.configure(bg_color=COLOR_CONFIG["main_color"], text_color=COLOR_CONFIG["text_color"])
-            # update the button colors
-            self.active_popup.button.configure(
-                bg_color=COLOR_CONFIG["main_color"], 
-                fg_color=COLOR_CONFIG["button_color"], 
-                hover_color=COLOR_CONFIG["button_hover"], 
-                text_color=COLOR_CONFIG["button_text"]
-                )
-        
-        if self.preferences_window:
-            
-            self.preferences_window.configure(fg_color=COLOR_CONFIG["main_color"])
+        if CONFIG["margin"] > 10:
+            CONFIG["margin"] -= 10
+            self.view_updates.request("margin")
+            self.settings_changed()
+        self.status_updates.request("margin")
+    
+    def apply_view(self, parts):
+        """Apply the font and margin to the text editor (called by the view scheduler, once they settle)"""
+
+        if "font" in parts:
+            self.text_editor.configure(font=self.font_for(CONFIG["font"], CONFIG["font_size"]))
+            # the next sizes and fonts are likely to be asked for
+            self.after_idle(self.preload_fonts)
+        if "margin" in parts:
+            self.text_editor.configure(padx=CONFIG["margin"])
 
-            self.preferences_window.main_frame.configure(fg_color=COLOR_CONFIG["main_color"])
-            self.preferences_window.side_frame.configure(fg_color=COLOR_CONFIG["main_color"])
+    def font_for(self, family, size):
+        """Return the font of a (family, size), created and resolved only once"""
 
-            self.preferences_window.page_selector.configure(fg_color=COLOR_CONFIG["main_color"])
-            self.preferences_window.page_selector.tab_title.configure(fg_color=COLOR_CONFIG["main_color"], bg_color=COLOR_CONFIG["main_color"], text_color=COLOR_CONFIG["secondary_text_color"])
-            self.preferences_window.page_selector.settings_button.configure(fg_color=COLOR_CONFIG["main_color"], bg_color=COLOR_CONFIG["main_color"], text_color=COLOR_CONFIG["secondary_text_color"], text_color_disabled=COLOR_CONFIG["text_color"])
-            self.preferences_window.page_selector.shortcuts_button.configure(fg_color=COLOR_CONFIG["main_color"], bg_color=COLOR_CONFIG["main_color"], text_color=COLOR_CONFIG["secondary_text_color"], text_color_disabled=COLOR_CONFIG["text_color"])
-            
-            if self.preferences_window.actual_page.__class__ == self.preferences_window.SettingsPage:
-                
-                self.preferences_window.actual_page.configure(fg_color=COLOR_CONFIG["main_color"])
+        key = (family, size)
+        if key not in self.fonts:
+            font = CTkFont(family=family, size=size)
+            # loads the font and its metrics now
+            font.metrics("linespace")
+            self.fonts[key] = font
+        return self.fonts[key]
 
-                self.preferences_window.actual_page.title_label.configure(fg_color=COLOR_CONFIG["main_color"], text_color=COLOR_CONFIG["text_color"], bg_color=COLOR_CONFIG["main_color"])
-                self.preferences_window.actual_page.separator.configure(fg_color=COLOR_CONFIG["main_color"], text_color=COLOR_CONFIG["secondary_text_color"], bg_color=COLOR_CONFIG["main_color"])
-                self.preferences_window.actual_page.options_frame.configure(bg_color=COLOR_CONFIG["main_color"], fg_color=COLOR_CONFIG["main_color"])
+    def preload_fonts(self, keys=None):
+        """Resolve the fonts next_font and the size shortcuts lead to, one per idle moment"""
 
-                for button in self.preferences_window.actual_page.buttons_dictionary:
-                    button.configure(fg_color=COLOR_CONFIG["text_color"], text_color=COLOR_CONFIG["text_color"], bg_color=COLOR_CONFIG["main_color"], checkmark_color=COLOR_CONFIG["main_color"], hover_color=COLOR_CONFIG["secondary_text_color"], border_color=COLOR_CONFIG["secondary_text_color"])
-                
-                self.preferences_window.actual_page.close_button.configure(fg_color=COLOR_CONFIG["button_color"], bg_color=COLOR_CONFIG["main_color"], hover_color=COLOR_CONFIG["button_hover"], text_color=COLOR_CONFIG["button_text"])
+        if keys is None:
+            size = CONFIG["font_size"]
+            keys = [(family, size) for family in FONTS] + [(CONFIG["font"], size + 2), (CONFIG["font"], size - 2)]
+            keys = [key for key in keys if key not in self.fonts and key[1] >= 10]
 
-            if self.preferences_window.actual_page.__class__ == self.preferences_window.ShortcutsPage:
-                
-                self.preferences_window.actual_page.configure(fg_color=COLOR_CONFIG["main_color"])
+        if keys:
+            self.font_for(*keys[0])
+            self.after_idle(self.preload_fonts, keys[1:])
+
+    def update_preferences(self):
+        """Apply every preference, at startup (later changes are applied one by one by preference_changed)"""
 
-                self.preferences_window.actual_page.title_label.configure(fg_color=COLOR_CONFIG["main_color"], text_color=COLOR_CONFIG["text_color"], bg_color=COLOR_CONFIG["main_color"])
-                self.preferences_window.actual_page.separator.configure(fg_color=COLOR_CONFIG["main_color"], text_color=COLOR_CONFIG["secondary_text_color"], bg_color=COLOR_CONFIG["main_color"])
+        for key, value in PREFERENCES.items():
+            self.preference_changed(key, value)
 
-                self.preferences_window.actual_page.shortcuts_frame.configure(fg_color=COLOR_CONFIG["main_color"])
+    def preference_changed(self, key, value):
+        """Apply a preference that changed"""
 
-                for (key, desc) in self.preferences_window.actual_page.labels_dictionary:
-                    key.configure(bg_color=COLOR_CONFIG["main_color"], fg_color=COLOR_CONFIG["main_color"], text_color=COLOR_CONFIG["text_color"])
-                    desc.configure(bg_color=COLOR_CONFIG["main_color"], fg_color=COLOR_CONFIG["main_color"], text_color=COLOR_CONFIG["secondary_text_color"])
+        if key == "wrap text":
+            self.apply_wrap()
 
-                self.preferences_window.actual_page.close_button.configure(fg_color=COLOR_CONFIG["button_color"], bg_color=COLOR_CONFIG["main_color"], hover_color=COLOR_CONFIG["button_hover"], text_color=COLOR_CONFIG["button_text"])
+        # bottom bar labels are only shown / hidden, their text is refreshed once visible
+        # (before they're built, they'll read PREFERENCES themselves)
+        elif key in STATUS_LABELS and self.status_ready:
+            attribute, part = STATUS_LABELS[key]
+            label = getattr(self, attribute)
+            if value:
+                label.grid()
+                self.status_updates.request(part)
+            else:
+                label.grid_remove()
 
-    def increase_margin(self, event=None):
-        """Increase the lateral margin"""
+    # NAVIGATION
 
-        CONFIG["margin"] += 10
-        self.text_editor.configure(padx=CONFIG["margin"])
+    def undo(self):
+        """Undo the last step of the history"""
+
+        step = self.history.undo()
+        if step:
+            offset, removed, inserted = step
+            self.apply_step(offset, len(inserted), text_of(removed))
+
+    def redo(self):
+        """Redo the last undone step"""
+
+        step = self.history.redo()
+        if step:
+            offset, removed, inserted = step
+            self.apply_step(offset, removed_length(removed), inserted)
+
+    def apply_step(self, offset, length, text):
+        """Replace `length` characters at `offset` by `text`, without recording it in the history"""
+
+        start, end = self.index_of(offset), self.index_of(offset + length)
+        self.applying_history = True
         try:
-            if self.margin_label:
-                self.margin_label.configure(text=f"M: {CONFIG["margin"]}")
-        except:
-            pass
-    
-    def decrease_margin(self, event=None):
-        """Decrease the lateral margin"""
+            if length:
+                self.text_editor.delete(start, end)
+            if text:
+                self.text_editor.insert(start, text)
+        finally:
+            self.applying_history = False
+
+        # put the cursor after the restored text, like Tk does
+        cursor = self.index_of(offset + len(text))
+        self.text_editor.mark_set("insert", cursor)
+        self.text_editor.see(cursor)
+
+    def undo_memory(self):
+        """Return the memory held by the undo history, as a readable text"""
+
+        used, limit = self.history.memory / 2**20, CONFIG["undo_memory_limit"] / 2**20
+        return f"undo history: {used:.1f} MB of {limit:.0f} MB"
+
+    def go_to_line(self, event=None):
+        """Ask for a "line" or "line:column" and move the cursor there"""
+
+        dialog = CTkInputDialog(
+            title=" ",
+            text="Go to line (line or line:column)",
+            font=(CONFIG["default_font"], 14),
+            fg_color=COLOR_CONFIG["main_color"],
+            text_color=COLOR_CONFIG["text_color"],
+            button_fg_color=COLOR_CONFIG["button_color"],
+            button_hover_color=COLOR_CONFIG["button_hover"],
+            button_text_color=COLOR_CONFIG["button_text"],
+            entry_fg_color=COLOR_CONFIG["main_color"],
+            entry_text_color=COLOR_CONFIG["text_color"],
+        )
+        answer = dialog.get_input()
 
-        if CONFIG["margin"] > 10:
-            CONFIG["margin"] -= 10
-            self.text_editor.configure(padx=CONFIG["margin"])
         try:
-            if self.margin_label:
-                self.margin_label.configure(text=f"M: {CONFIG["margin"]}")
-        except:
-            pass
-    
-    def update_preferences(self):
-        
-        ### REFACTOR THIS (URGENT!!!) ###
+            line, _, column = (answer or "").strip().partition(":")
+            line, column = int(line), int(column or 1)
+        except ValueError:
+            return "break"
 
-        # wrap text
-        if PREFERENCES["wrap text"]:
-            self.text_editor.configure(wrap="word")    
+        if self.large_file:
+            self.large_file.goto_line(max(1, min(line, self.large_file.file.line_count)))
         else:
-            self.text_editor.configure(wrap="none")
-        
-        # actual font
-        if self.actual_font_label and not PREFERENCES["display actual font"]:
-            self.actual_font_label.destroy()
-            self.actual_font_label = None
-        elif not self.actual_font_label and PREFERENCES["display actual font"]:
-            self.create_bottom_bar("actual_font")
-        
-        # actual file
-        if self.title_label and not PREFERENCES["display actual file"]:
-            self.title_label.destroy()
-            self.title_label = None
-        elif not self.title_label and PREFERENCES["display actual file"]:
-            self.create_bottom_bar("title")
-        
-        # char count
-        if self.chars_label and not PREFERENCES["show character count"]:
-            self.chars_label.destroy()
-            self.chars_label = None
-        elif not self.chars_label and PREFERENCES["show character count"]:
-            self.create_bottom_bar("chars")
-        
-        # word count
-        if self.word_count_label and not PREFERENCES["show word count"]:
-            self.word_count_label.destroy()
-            self.word_count_label = None
-            self.bottom_frame.columnconfigure(4, weight=0)
-        elif not self.word_count_label and PREFERENCES["show word count"]:
-            self.create_bottom_bar("word_count")
-        
-        # font size
-        try:
-            if self.font_size_label and not PREFERENCES["view font size"]:
-                self.font_size_label.destroy()
-                self.font_size_label = None
-            elif not self.font_size_label and PREFERENCES["view font size"]:
-                self.create_bottom_bar("font_size")
-        except:
-            self.create_bottom_bar("font_size")
-            
-        # margin size
-        try:
-            if self.margin_label and not PREFERENCES["view margin size"]:
-                self.margin_label.destroy()
-                self.margin_label = None
-            elif not self.margin_label and PREFERENCES["view margin size"]:
-                self.create_bottom_bar("margin")
-        except:
-            self.create_bottom_bar("margin")
+            # clamp the position to the text, using the line index
+            line = max(1, min(line, self.line_index.line_count))
+            self.text_editor.mark_set("insert", f"{line}.{max(column, 1) - 1}")
+            self.text_editor.see("insert")
+
+        self.text_editor.focus_set()
+        self.status_updates.request("position")
+
+        # prevents other default methods bound to the ctrl+g shortcut from being executed
+        return "break"
 
     # POPUPS AND WINDOWS MANAGEMENT
 
-    def show_preferences(self, event=None):
+    def show_find_bar(self, event=None):
+        """Show the find / replace bar, searching the selected text if there's one"""
+
+        if not self.find_bar:
+            self.find_bar = FindBar(self)
+        self.find_bar.show(self.text_editor.get("sel.first", "sel.last") if self.text_editor.tag_ranges("sel") else None)
+
+        # prevents other default methods bound to the ctrl+f shortcut from being executed
+        return "break"
+
+    def build_preferences(self):
+        """Build the (hidden) preferences window, once"""
 
         if not self.preferences_window:
             self.preferences_window = Preferences()
 
-    def create_popup(self, message, only_ok_button):
-        """Create popups"""
+    def show_preferences(self, event=None):
+
+        # time from the key press to the window being mapped
+        self.preferences_requested = time.perf_counter()
+        self.build_preferences()
+        self.preferences_window.show()
+
+    def preferences_shown(self):
+        """Called once the preferences window is on screen"""
+
+        if self.preferences_requested is not None:
+            self.preferences_open_time = (time.perf_counter() - self.preferences_requested) * 1000
+            self.preferences_requested = None
+            if self.metrics:
+                self.metrics.record("preferences open", self.preferences_open_time / 1000)
+
+    def create_popup(self, message, only_ok_button, on_confirm=None, on_cancel=None):
+        """Create popups (with yes / no buttons when on_confirm is given)"""
 
         if self.active_popup:
             self.destroy_popup()
         
-        self.active_popup = Popup(message, only_ok_button)
+        self.active_popup = Popup(message, only_ok_button, on_confirm, on_cancel)
 
     def destroy_popup(self):
         """Destroy popups when its exit buttons are pressed"""
@@ -482,6 +2393,9 @@ class Preferences(CTkToplevel):
         self.spawn_x = int((self.winfo_screenwidth() - 600)/2)
         self.spawn_y = int((self.winfo_screenheight() - 500)/2)
         self.geometry(f"600x500+{self.spawn_x}+{self.spawn_y}")
+        app.theme.register(self, fg_color="main_color")
+        # built hidden, shown on demand
+        self.withdraw()
         
         self.actual_page = None
     
@@ -491,6 +2405,15 @@ class Preferences(CTkToplevel):
         self.protocol("WM_DELETE_WINDOW", self.close_preferences)
         self.bind("<Escape>", lambda event: self.close_preferences())
         self.bind("<Control-d>", lambda event: self.master.toggle_theme())
+        self.bind("<Map>", lambda event: self.master.preferences_shown() if event.widget is self else None)
+
+    def show(self):
+        """Show the window (it's never destroyed, only hidden)"""
+
+        self.deiconify()
+        self.lift()
+        self.focus_set()
+
     def create_widgets(self):
         """Create the window's widgets"""
 
@@ -505,26 +2428,27 @@ class Preferences(CTkToplevel):
         # setup the side (left) frame
         self.side_frame = CTkFrame(self, fg_color=COLOR_CONFIG["main_color"], width=0, corner_radius=0)
         self.side_frame.grid(row=0, column=0, sticky="NWES")
+        for frame in (self.main_frame, self.side_frame):
+            app.theme.register(frame, fg_color="main_color")
 
+        # both pages are built once, switching pages only packs / unpacks them
+        self.pages = {
+            "settings": self.SettingsPage(self.main_frame),
+            "shortcuts": self.ShortcutsPage(self.main_frame)
+        }
         self.page_selector = self.PageSelector(self.side_frame)
         
     def toggle_page(self, page):
 
-        if page == "settings":
-            if self.actual_page:
-                self.actual_page.destroy()
-            self.actual_page = self.SettingsPage(self.main_frame)
-            self.actual_page.pack(fill="both", expand=True, pady=5, padx=20)
-    
-        elif page == "shortcuts":
-            if self.actual_page:
-                self.actual_page.destroy()
-            self.actual_page = self.ShortcutsPage(self.main_frame)
-            self.actual_page.pack(fill="both", expand=True, pady=5, padx=20)
+        if self.actual_page is self.pages[page]:
+            return
+        if self.actual_page:
+            self.actual_page.pack_forget()
+        self.actual_page = self.pages[page]
+        self.actual_page.pack(fill="both", expand=True, pady=5, padx=20)
     
     def close_preferences(self):
-        self.destroy()
-        self.master.preferences_window = None
+        self.withdraw()
 
     class PageSelector(CTkFrame):
         """Create the buttons for selecting the pages"""
@@ -548,6 +2472,8 @@ class Preferences(CTkToplevel):
                 anchor="w"
             )
             self.tab_title.pack(fill="x", ipady=20)
+            app.theme.register(self, fg_color="main_color")
+            app.theme.register(self.tab_title, fg_color="main_color", bg_color="main_color", text_color="secondary_text_color")
 
             # create settings page button
             self.settings_button = CTkButton(self, text="> Settings", command=self.settings_page_pressed)
@@ -570,6 +2496,7 @@ class Preferences(CTkToplevel):
             )
                 # pack every button
                 button.pack(fill="x", pady=2)
+                app.theme.register(button, fg_color="main_color", bg_color="main_color", text_color="secondary_text_color", text_color_disabled="text_color")
 
             # bind the buttons to make the hover effect
             self.bind_hover()
@@ -657,10 +2584,14 @@ class Preferences(CTkToplevel):
                 anchor="w"
             )
             self.separator.pack(fill="x")
+            app.theme.register(self, fg_color="main_color")
+            app.theme.register(self.title_label, fg_color="main_color", text_color="text_color", bg_color="main_color")
+            app.theme.register(self.separator, fg_color="main_color", text_color="secondary_text_color", bg_color="main_color")
 
             # content frame
             self.options_frame = CTkFrame(self, bg_color=COLOR_CONFIG["main_color"], fg_color=COLOR_CONFIG["main_color"])
             self.options_frame.pack(fill="both", expand=True)
+            app.theme.register(self.options_frame, bg_color="main_color", fg_color="main_color")
             
             # store the created buttons for reference
             self.buttons_dictionary = []
@@ -685,14 +2616,32 @@ class Preferences(CTkToplevel):
                     checkbox_width=15,
                     hover_color=COLOR_CONFIG["secondary_text_color"],
                     border_color=COLOR_CONFIG["secondary_text_color"],
-                    command= lambda: self.option_clicked()
+                    command=lambda option=text: self.option_clicked(option)
                 )
                 button.pack(fill="x", anchor="w", pady=10, padx=10)
+                app.theme.register(
+                    button, fg_color="text_color", text_color="text_color", bg_color="main_color",
+                    checkmark_color="main_color", hover_color="secondary_text_color", border_color="secondary_text_color"
+                )
                 # if the option is true in the preferences, check the box
                 if value:
                     button.select()
                 # append the last button to the dictionary
                 self.buttons_dictionary.append(button)
+
+            # memory held by the undo history, kept up to date while the page is shown
+            self.undo_label = CTkLabel(
+                self,
+                text=app.undo_memory(),
+                font=(CONFIG["default_font"], 13),
+                fg_color=COLOR_CONFIG["main_color"],
+                text_color=COLOR_CONFIG["secondary_text_color"],
+                bg_color=COLOR_CONFIG["main_color"],
+                anchor="w"
+            )
+            self.undo_label.pack(fill="x", padx=10)
+            app.theme.register(self.undo_label, fg_color="main_color", text_color="secondary_text_color", bg_color="main_color")
+            self.after(1000, self.update_undo_memory)
                 
             # creating close button
             self.close_button = CTkButton(
@@ -708,20 +2657,20 @@ class Preferences(CTkToplevel):
                 command= lambda: self.master.master.close_preferences()
             )
             self.close_button.pack(anchor="e", pady=10)
+            app.theme.register(self.close_button, fg_color="button_color", bg_color="main_color", hover_color="button_hover", text_color="button_text")
     
 
-        def option_clicked(self, event=None):
-            """Update the PREFERENCES each time a checkbox is clicked"""
-
-            for button in self.buttons_dictionary:
-                # grab the text of the button
-                clicked_option = button.cget("text")
-                # grab the value of te button (0 or 1)
-                option_value = button.get()
-                # update the global dictionary
-                PREFERENCES[clicked_option] = bool(option_value)
-                # make the changes a true thing
-                app.update_preferences()
+        def update_undo_memory(self):
+            # only while the page is on screen
+            if self.winfo_viewable():
+                self.undo_label.configure(text=app.undo_memory())
+            self.after(1000, self.update_undo_memory)
+
+        def option_clicked(self, option):
+            """Update the clicked preference (only it is applied)"""
+
+            button = self.buttons_dictionary[list(PREFERENCES).index(option)]
+            app.preferences.set(option, bool(button.get()))
     
     class ShortcutsPage(CTkFrame):
         """Create the shortcuts page for the preferences window"""
@@ -754,10 +2703,14 @@ class Preferences(CTkToplevel):
                 anchor="w"
             )
             self.separator.pack(fill="x")
+            app.theme.register(self, fg_color="main_color")
+            app.theme.register(self.title_label, fg_color="main_color", text_color="text_color", bg_color="main_color")
+            app.theme.register(self.separator, fg_color="main_color", text_color="secondary_text_color", bg_color="main_color")
 
             # configure the shortcuts frame
             self.shortcuts_frame = CTkScrollableFrame(self, fg_color=COLOR_CONFIG["main_color"])
             self.shortcuts_frame.pack(expand=True, fill="both")
+            app.theme.register(self.shortcuts_frame, fg_color="main_color")
             # shortcut column
             self.shortcuts_frame.grid_columnconfigure(0, weight=1)
             # description column
@@ -765,7 +2718,10 @@ class Preferences(CTkToplevel):
 
             # dictionary of shortcuts
             shortcuts = {
-                "ctrl n": "New file",
+                "ctrl n": "New document",
+                "ctrl w": "Close document",
+                "ctrl tab": "Next document",
+                "ctrl shift tab": "Previous document",
                 "ctrl o": "Open file",
                 "ctrl s": "Save file",
                 "ctrl shift s": "Save as file",
@@ -773,8 +2729,13 @@ class Preferences(CTkToplevel):
                 "ctrl -": "Decrease margin",
                 "ctrl .": "Increase font size",
                 "ctrl ,": "Decrease font size",
+                "ctrl shift f": "Next font",
                 "ctrl d": "Toggle theme",
-                "F1": "Show preferences"
+                "ctrl f": "Find / replace",
+                "ctrl g": "Go to line",
+                "ctrl l": "Follow the file as it grows",
+                "F1": "Show preferences",
+                "F12": "Performance overlay (--instrument)"
             }
             
             # store the labels for personalization needs
@@ -812,6 +2773,8 @@ class Preferences(CTkToplevel):
                     )
 
                 description_label.grid(row=row_index, column=1, sticky="we", pady=5)
+                app.theme.register(key_label, bg_color="main_color", fg_color="main_color", text_color="text_color")
+                app.theme.register(description_label, bg_color="main_color", fg_color="main_color", text_color="secondary_text_color")
 
                 # add both labels to the dictionary
                 self.labels_dictionary.append((key_label, description_label))
@@ -831,11 +2794,12 @@ class Preferences(CTkToplevel):
             )
 
             self.close_button.pack(anchor="e", pady=10)
+            app.theme.register(self.close_button, fg_color="button_color", bg_color="main_color", hover_color="button_hover", text_color="button_text")
 
 class Popup(CTkToplevel):
     """Simple popups class"""
 
-    def __init__(self, message, only_ok_button):
+    def __init__(self, message, only_ok_button, on_confirm=None, on_cancel=None):
         super().__init__(master=app)
 
         # initial attributes
@@ -845,7 +2809,8 @@ class Popup(CTkToplevel):
         self.attributes("-topmost", True)
         self.spawn_x = int((self.winfo_screenwidth() - 300)/2)
         self.spawn_y = int((self.winfo_screenheight() - 100)/2)
-        self.geometry(f"300x100+{self.spawn_x}+{self.spawn_y}")
+        self.geometry(f"300x{120 if on_confirm else 100}+{self.spawn_x}+{self.spawn_y}")
+        app.theme.register(self, fg_color="main_color")
 
         # label widget
         self.label = CTkLabel(
@@ -857,6 +2822,7 @@ class Popup(CTkToplevel):
             wraplength=320
         )
         self.label.pack(padx=10, pady=15)
+        app.theme.register(self.label, bg_color="main_color", text_color="text_color")
         
         # confirmation button
         if only_ok_button:
@@ -874,12 +2840,427 @@ class Popup(CTkToplevel):
             )
 
             self.button.pack(anchor=CENTER)
+            app.theme.register(self.button, bg_color="main_color", fg_color="button_color", hover_color="button_hover", text_color="button_text")
 
-# RUN APP
+        # yes / no buttons
+        elif on_confirm:
+            self.button = CTkButton(self, text="Yes", command=lambda: self.answer(on_confirm))
+            self.cancel_button = CTkButton(self, text="No", command=lambda: self.answer(on_cancel))
 
+            for button, padx in ((self.button, (60, 10)), (self.cancel_button, (10, 60))):
+                button.configure(
+                    font=(CONFIG["font"], 14), 
+                    fg_color=COLOR_CONFIG["button_color"],
+                    hover_color=COLOR_CONFIG["button_hover"], 
+                    bg_color=COLOR_CONFIG["main_color"],
+                    text_color=COLOR_CONFIG["button_text"], 
+                    corner_radius=5,
+                    width=80
+                )
+                button.pack(side="left", padx=padx)
+                app.theme.register(button, bg_color="main_color", fg_color="button_color", hover_color="button_hover", text_color="button_text")
+
+            # closing the window means "no"
+            self.protocol("WM_DELETE_WINDOW", lambda: self.answer(on_cancel))
+
+    def answer(self, callback):
+        """Close the popup and run the callback of the pressed button"""
+
+        app.destroy_popup()
+        if callback:
+            callback()
+
+class FindBar(CTkFrame):
+    """Find / replace bar, searching on a worker thread and highlighting only the visible matches"""
+
+    def __init__(self, app):
+        super().__init__(master=app, height=40, corner_radius=0, fg_color=COLOR_CONFIG["main_color"])
+
+        self.app = app
+        # (line, column, length) of every match found so far, in order, and the selected one
+        self.matches = []
+        self.current = None
+        self.search_task = None
+        self.refresh_task = None
+        self.replace_task = None
+        # the lines edited since the matches were found: (first, last before the edits, last now), 1-based, or "all"
+        self.changed = None
+        # top visible position, to notice scrolling
+        self.last_view = None
+        # the search started by the user selects the first match after the cursor, the one after an edit doesn't
+        self.jump = False
+        # searching again while typing (in the bar: "search", in the editor: "refresh") waits for a short pause
+        self.search_updates = UpdateScheduler(self, self.update_matches, 150)
+
+        self.find_entry = CTkEntry(self, placeholder_text="Find")
+        self.replace_entry = CTkEntry(self, placeholder_text="Replace")
+        self.regex_box = CTkCheckBox(self, text="regex", command=self.search, corner_radius=0, border_width=2, checkbox_height=15, checkbox_width=15)
+        self.count_label = CTkLabel(self, text="")
+        self.replace_button = CTkButton(self, text="Replace all", width=90, corner_radius=5, command=self.replace_matches)
+
+        self.find_entry.pack(side="left", fill="x", expand=True, pady=5)
+        self.replace_entry.pack(side="left", fill="x", expand=True, padx=10, pady=5)
+        self.regex_box.pack(side="left")
+        self.count_label.pack(side="left", padx=10)
+        self.replace_button.pack(side="left")
+        self.style()
+
+        self.find_entry.bind("<KeyRelease>", self.find_typed)
+        self.find_entry.bind("<Return>", self.next_match)
+        self.find_entry.bind("<Shift-Return>", self.previous_match)
+        self.replace_entry.bind("<Return>", lambda event: self.replace_matches())
+        for widget in (self.find_entry, self.replace_entry):
+            widget.bind("<Escape>", self.hide)
+
+    def style(self):
+        """Apply the actual COLOR_CONFIG to the bar, and follow the theme switches"""
+
+        theme = self.app.theme
+        theme.register(self, fg_color="main_color")
+        for entry in (self.find_entry, self.replace_entry):
+            entry.configure(font=(CONFIG["default_font"], 13), fg_color=COLOR_CONFIG["main_color"], bg_color=COLOR_CONFIG["main_color"], text_color=COLOR_CONFIG["text_color"], border_color=COLOR_CONFIG["secondary_text_color"])
+            theme.register(entry, fg_color="main_color", bg_color="main_color", text_color="text_color", border_color="secondary_text_color")
+        self.regex_box.configure(font=(CONFIG["default_font"], 13), fg_color=COLOR_CONFIG["text_color"], text_color=COLOR_CONFIG["secondary_text_color"], bg_color=COLOR_CONFIG["main_color"], checkmark_color=COLOR_CONFIG["main_color"], hover_color=COLOR_CONFIG["secondary_text_color"], border_color=COLOR_CONFIG["secondary_text_color"])
+        theme.register(self.regex_box, fg_color="text_color", text_color="secondary_text_color", bg_color="main_color", checkmark_color="main_color", hover_color="secondary_text_color", border_color="secondary_text_color")
+        self.count_label.configure(font=(CONFIG["default_font"], 13), text_color=COLOR_CONFIG["secondary_text_color"], bg_color=COLOR_CONFIG["main_color"])
+        theme.register(self.count_label, text_color="secondary_text_color", bg_color="main_color")
+        self.replace_button.configure(font=(CONFIG["default_font"], 13), fg_color=COLOR_CONFIG["button_color"], hover_color=COLOR_CONFIG["button_hover"], bg_color=COLOR_CONFIG["main_color"], text_color=COLOR_CONFIG["button_text"])
+        theme.register(self.replace_button, fg_color="button_color", hover_color="button_hover", bg_color="main_color", text_color="button_text")
+
+        self.update_tags(COLOR_CONFIG, COLOR_CONFIG.keys())
+        theme.on_change(self.update_tags)
+
+    def update_tags(self, palette, changed):
+        """Color the match highlights (text tags aren't widget options)"""
+
+        if "highlight_color" in changed:
+            self.app.text_editor.tag_config("match", background=palette["highlight_color"])
+        if "secondary_text_color" in changed:
+            self.app.text_editor.tag_config("current_match", background=palette["secondary_text_color"])
+
+    def show(self, text=None):
+        """Show the bar above the bottom bar and focus the find entry"""
+
+        if not self.winfo_ismapped():
+            self.pack(fill="x", padx=20, before=self.app.bottom_frame)
+            self.watch_view()
+        if text and "\n" not in text:
+            self.find_entry.delete(0, END)
+            self.find_entry.insert(0, text)
+        self.find_entry.focus_set()
+        self.find_entry.select_range(0, END)
+        self.search()
+
+    def hide(self, event=None):
+        """Hide the bar and its highlights, back to the text editor"""
+
+        self.stop_search()
+        self.matches = []
+        self.current = None
+        self.clear_highlights()
+        self.pack_forget()
+        self.app.text_editor.focus_set()
+        return "break"
+
+    def find_typed(self, event=None):
+        # enter and escape have their own bindings
+        if event and event.keysym in ("Return", "Escape"):
+            return
+        self.search_updates.request("search")
+
+    # SEARCHING
+
+    def stop_search(self):
+        for task in (self.search_task, self.refresh_task):
+            if task:
+                task.cancel()
+        self.search_task = self.refresh_task = None
+        self.changed = None
+
+    def update_matches(self, parts):
+        """Search again: the whole document when the pattern changed, only the edited lines after edits"""
+
+        if "search" in parts or not self.refresh():
+            self.search(jump="search" in parts)
+
+    def search(self, jump=True):
+        """Start searching (again) the whole document on a worker thread, then select the match after the cursor if jump"""
+
+        self.stop_search()
+        self.matches = []
+        self.current = None
+        self.jump = jump
+        self.clear_highlights()
+
+        pattern = self.find_entry.get()
+        if not pattern or not self.winfo_ismapped():
+            self.count_label.configure(text="")
+            return
+
+        use_regex = bool(self.regex_box.get())
+        if self.app.large_file:
+            # the file is read through a handle of the search's own, the view may close or grow meanwhile
+            file_path = self.app.large_file.file.path
+
+            def work(task):
+                with open(file_path, "rb") as file:
+                    return find_matches(file, pattern, use_regex, task)
+        else:
+            # search a snapshot of the text, only joined on the worker thread
+            pieces = self.app.document.snapshot()
+            work = lambda task: find_matches(text_of(pieces), pattern, use_regex, task)
+
+        self.search_task = BackgroundTask(self, work, self.add_matches, self.search_done)
+        self.count_label.configure(text="searching...")
+
+    def lines_changed(self, first, count, new_count):
+        """Remember that `count` lines from the 1-based `first` were edited into `new_count` lines (None: unknown edit)"""
+
+        if first is None or self.changed == "all":
+            self.changed = "all"
+            return
+
+        last = first + count - 1
+        if self.changed is None:
+            self.changed = (first, last, first + new_count - 1)
+            return
+
+        # merge with the lines already changed, the edit's lines are in today's numbering
+        changed_first, old_last, new_last = self.changed
+        end = max(new_last, last)
+        self.changed = (min(changed_first, first), old_last + end - new_last, end + new_count - count)
+
+    def refresh(self):
+        """Search again only the lines edited since the last search, moving the matches after them (False if it can't)"""
+
+        if self.search_task or self.changed == "all" or not self.find_entry.get():
+            return False
+        # a refresh is running, this one waits for it
+        if self.refresh_task:
+            self.search_updates.request("refresh")
+            return True
+        if self.changed is None:
+            return True
+
+        (first, old_last, new_last), self.changed = self.changed, None
+        # the matches of the edited lines go, the ones after them move with their lines
+        before = bisect_right(self.matches, (first,))
+        after = bisect_right(self.matches, (old_last + 1,))
+        moved = [(line + new_last - old_last, column, length) for line, column, length in self.matches[after:]]
+        self.matches = self.matches[:before] + moved
+        self.current = None
+
+        line_index = self.app.line_index
+        start = line_index.offset(first - 1)
+        end = line_index.offset(new_last) - 1 if new_last < line_index.line_count else len(self.app.document)
+        pieces = self.app.document.pieces(start, end)
+        pattern, use_regex = self.find_entry.get(), bool(self.regex_box.get())
+
+        def refreshed(found, error):
+            self.refresh_task = None
+            if error:
+                self.count_label.configure(text="invalid pattern" if isinstance(error, re.error) else "error")
+                return
+            self.matches[before:before] = found
+            self.highlight()
+            self.update_count()
+
+        work = lambda task: list(iter_matches(text_of(pieces), pattern, use_regex, task.cancelled, first))
+        self.refresh_task = BackgroundTask(self, work, on_done=refreshed)
+        return True
+
+    def add_matches(self, batch):
+        """Receive a batch of matches from the worker"""
+
+        self.matches.extend(batch)
+        # the match after the cursor is known once a match past the cursor is
+        if self.jump and self.matches[-1][:2] > self.cursor():
+            self.jump = False
+            self.next_match()
+        else:
+            self.highlight()
+        self.count_label.configure(text=f"{len(self.matches)}+")
+
+    def search_done(self, found, error):
+        self.search_task = None
+        # none after the cursor: back to the first one
+        if self.jump and self.matches:
+            self.next_match()
+        self.jump = False
+        if error:
+            self.count_label.configure(text="invalid pattern" if isinstance(error, re.error) else "error")
+        else:
+            self.update_count()
+
+    def update_count(self):
+        if not self.matches:
+            self.count_label.configure(text="no matches")
+        elif self.current is None:
+            self.count_label.configure(text=f"{len(self.matches)}")
+        else:
+            self.count_label.configure(text=f"{self.current + 1} / {len(self.matches)}")
+
+    # HIGHLIGHTING (only what's visible)
+
+    def line_offset(self):
+        """Number of document lines before the first line held by the text editor"""
+
+        return self.app.large_file.first if self.app.large_file else 0
+
+    def clear_highlights(self):
+        self.app.text_editor.tag_remove("match", "1.0", END)
+        self.app.text_editor.tag_remove("current_match", "1.0", END)
+
+    def highlight(self):
+        """Tag the matches in the visible lines"""
+
+        textbox = self.app.text_editor
+        offset = self.line_offset()
+        first = MainApp.line_of(textbox.index("@0,0")) + offset
+        last = MainApp.line_of(textbox.index(f"@0,{textbox._textbox.winfo_height()}")) + offset
+        self.last_view = (textbox.index("@0,0"), offset)
+
+        textbox.tag_remove("match", "1.0", END)
+        index = bisect_right(self.matches, (first,))
+        for line, column, length in self.matches[index:]:
+            if line > last:
+                break
+            start = f"{line - offset}.{self.app.tk_column(line - offset, column)}"
+            textbox.tag_add("match", start, self.app.tk_end(start, length))
+
+    def watch_view(self):
+        """Highlight again when the view moves (while the bar is shown)"""
+
+        if not self.winfo_exists() or not self.winfo_ismapped():
+            return
+        view = (self.app.text_editor.index("@0,0"), self.line_offset())
+        if self.matches and view != self.last_view:
+            self.highlight()
+        self.after(150, self.watch_view)
+
+    # MOVING BETWEEN MATCHES
+
+    def next_match(self, event=None):
+        """Select the first match after the cursor"""
+
+        if self.matches:
+            line, column = self.cursor()
+            index = bisect_right(self.matches, (line, column), key=lambda match: match[:2])
+            self.select(index % len(self.matches))
+        return "break"
+
+    def previous_match(self, event=None):
+        """Select the last match before the actual one"""
+
+        if self.matches:
+            index = (self.current if self.current is not None else 0) - 1
+            self.select(index % len(self.matches))
+        return "break"
+
+    def cursor(self):
+        """Return the cursor (line, column - 1) in the document, in characters (the selected match if there's one)"""
+
+        if self.current is not None:
+            return self.matches[self.current][:2]
+        line, column = map(int, self.app.text_editor.index("insert").split("."))
+        return line + self.line_offset(), self.app.char_column(line, column) - 1
+
+    def select(self, index):
+        """Show and select the match at this index"""
+
+        self.current = index
+        line, column, length = self.matches[index]
+
+        # in large file mode the line may not be held by the editor yet
+        large_file = self.app.large_file
+        if large_file and not large_file.first < line <= large_file.first + large_file.count:
+            large_file.show(line - 1)
+
+        textbox = self.app.text_editor
+        start = f"{line - self.line_offset()}.{self.app.tk_column(line - self.line_offset(), column)}"
+        end = self.app.tk_end(start, length)
+        textbox.tag_remove("current_match", "1.0", END)
+        textbox.tag_add("current_match", start, end)
+        textbox.mark_set("insert", end)
+        textbox.see(start)
+
+        self.highlight()
+        self.update_count()
+
+    # REPLACING
+
+    def replace_matches(self):
+        """Replace every match, as a single edit (computed on a worker thread)"""
+
+        pattern = self.find_entry.get()
+        if not pattern or self.app.large_file or self.app.loading or self.replace_task:
+            return
+
+        pieces = self.app.document.snapshot()
+        replacement = self.replace_entry.get()
+        use_regex = bool(self.regex_box.get())
+        seq = self.app.edit_seq
+
+        def replaced(result, error):
+            self.replace_task = None
+            if error:
+                self.count_label.configure(text="invalid pattern")
+                return
+            new_text, count = result
+            # the text changed in the meantime, the result is outdated
+            if self.app.edit_seq != seq or not count:
+                self.search(jump=False)
+                return
+
+            textbox = self.app.text_editor
+            insert, view = textbox.index("insert"), textbox.yview()[0]
+            # one Tk command, so it's one step in the undo stack
+            textbox.edit_separator()
+            textbox._textbox.replace("1.0", "end-1c", new_text)
+            textbox.edit_separator()
+            textbox.mark_set("insert", insert)
+            textbox.yview_moveto(view)
+
+        self.replace_task = BackgroundTask(self, lambda task: replace_all(text_of(pieces), pattern, replacement, use_regex), on_done=replaced)
+        self.count_label.configure(text="replacing...")
+
+# RUN APP
 
-app = MainApp()
-app.text_changed()
-print()
-#app.text_editor.focus_set()
-app.mainloop()
+def profile_startup():
+    """Print how long every startup step took, once the deferred ones are done, and quit"""
+
+    if STARTUP_TIMES[-1][0] != "deferred startup":
+        app.after(50, profile_startup)
+        return
+
+    print("startup profile (ms):")
+    for (_, previous), (step, moment) in zip(STARTUP_TIMES, STARTUP_TIMES[1:]):
+        print(f"  {step:<24}{(moment - previous) * 1000:8.1f}")
+    print(f"  {'total':<24}{(STARTUP_TIMES[-1][1] - STARTUP_TIMES[0][1]) * 1000:8.1f}")
+    app.close_app()
+
+def first_paint(event=None):
+    """The text editor was drawn for the first time, keys are handled from the next idle moment"""
+
+    if "first paint" in dict(STARTUP_TIMES):
+        return
+    STARTUP_TIMES.append(("first paint", time.perf_counter()))
+    app.after_idle(lambda: STARTUP_TIMES.append(("first keystroke ready", time.perf_counter())))
+
+
+# importing this module (the benchmarks do) doesn't start the editor, they create `app` themselves
+if __name__ == "__main__":
+    if "--instrument" in sys.argv:
+        CONFIG["instrumentation"] = True
+        OVERRIDDEN.add("instrumentation")
+    app = MainApp()
+    if PATHS:
+        app.open_paths(PATHS)
+    app.listen_for_launches()
+    STARTUP_TIMES.append(("build the window", time.perf_counter()))
+    app.text_editor._textbox.bind("<Expose>", first_paint, add="+")
+    if "--profile-startup" in sys.argv:
+        app.after_idle(profile_startup)
+    print()
+    #app.text_editor.focus_set()
+    app.mainloop()
@@ -0,0 +1,313 @@
+import codecs
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+
+from line_index import Fenwick
+
+class MappedChunk:
+    """A run of a memory mapped UTF-8 file, used as a piece of a document without copying it"""
+
+    __slots__ = ("map", "byte_start", "byte_end", "length")
+
+    def __init__(self, file_map, byte_start, byte_end, length):
+        self.map = file_map
+        self.byte_start = byte_start
+        self.byte_end = byte_end
+        self.length = length
+
+    def bytes(self):
+        return self.map[self.byte_start:self.byte_end]
+
+    def text(self):
+        return self.bytes().decode("utf-8")
+
+# a piece is a (source, start, end) tuple: a slice of a str, or a whole MappedChunk (start 0, end its length)
+
+def piece_text(piece):
+    """Return the text of a piece"""
+
+    source, start, end = piece
+    if isinstance(source, MappedChunk):
+        return source.text()
+    return source if start == 0 and end == len(source) else source[start:end]
+
+def split_piece(piece, at):
+    """Split a piece in two, `at` characters from its start"""
+
+    source, start, end = piece
+    # a mapped chunk is decoded (it's small) once it has to be cut
+    if isinstance(source, MappedChunk):
+        source, start, end = source.text(), 0, source.length
+    return (source, start, start + at), (source, start + at, end)
+
+def private_copy(file, directory=None):
+    """Return a temporary copy of an open binary file, deleted once closed (and unmapped), that no other program can change
+
+    The directory should be on disk: a copy in a memory backed temporary directory would cost as much memory as the text.
+    """
+
+    copy = tempfile.TemporaryFile(dir=directory)
+    try:
+        size = os.fstat(file.fileno()).st_size
+        copied = 0
+        # in the kernel (and without copying the data at all on file systems that share extents)
+        while copied < size:
+            done = os.copy_file_range(file.fileno(), copy.fileno(), size - copied, copied, copied)
+            if not done:
+                break
+            copied += done
+    except (AttributeError, OSError):
+        file.seek(0)
+        copy.seek(0)
+        copy.truncate()
+        shutil.copyfileobj(file, copy, 1 << 20)
+    copy.seek(0)
+    return copy
+
+def text_of(pieces):
+    """Join the text of a snapshot of pieces (meant for worker threads)"""
+
+    return "".join(map(piece_text, pieces))
+
+# a long text piece (a whole compressed or converted file) is encoded by parts of this many characters,
+# so saving it never copies it whole
+ENCODE_SIZE = 1 << 20
+
+def encode_pieces(pieces, encoding="utf-8", newline="\n", errors="strict"):
+    """Yield the bytes of a snapshot of pieces, as written to a file, mapped chunks untouched when possible"""
+
+    raw = encoding.lower().replace("-", "").replace("_", "") == "utf8" and newline == "\n"
+    # a single encoder for the whole text (a BOM is written once)
+    encoder = codecs.getincrementalencoder(encoding)(errors)
+
+    for piece in pieces:
+        source, start, end = piece
+        if isinstance(source, MappedChunk):
+            if raw:
+                yield source.bytes()
+                continue
+            source = piece_text(piece)
+            start, end = 0, len(source)
+
+        for part in range(start, end, ENCODE_SIZE):
+            text = source[part:min(part + ENCODE_SIZE, end)]
+            if newline != "\n":
+                text = text.replace("\n", newline)
+            yield encoder.encode(text)
+
+    final = encoder.encode("", True)
+    if final:
+        yield final
+
+class PieceTable:
+    """Document model mirroring the text editor: pieces of the original file and of the inserted texts"""
+
+    # pieces are grouped in blocks, a block is split once it gets twice this size
+    BLOCK_SIZE = 128
+    # a mapped file is cut into chunks of about this many bytes
+    CHUNK_SIZE = 1 << 16
+    # typed text is appended to the previous piece while it's shorter than this
+    MERGE_LIMIT = 4096
+
+    def __init__(self, text=""):
+        self.reset(text)
+
+    def reset(self, text=""):
+        """Make the document a plain text"""
+
+        self.set_pieces([(text, 0, len(text))] if text else [])
+
+    @classmethod
+    def from_file(cls, file):
+        """Return a document sharing an open binary file, mapped, as its original text, None if it can't be mapped
+
+        The file must be a private copy (see private_copy), never the user's file: another program truncating a mapped
+        file crashes the editor (SIGBUS) on the next read, and rewriting it changes the document under the editor.
+        """
+
+        # a mapped file can't be deleted on Windows, and CR LF / non UTF-8 files don't match the editor's text
+        if sys.platform == "win32":
+            return None
+
+        try:
+            # the mapping keeps the file alive once it's closed
+            file_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        # empty files can't be mapped
+        except ValueError:
+            return cls()
+
+        if file_map.find(b"\r") != -1:
+            return None
+
+        pieces = []
+        start = 0
+        while start < len(file_map):
+            end = min(start + cls.CHUNK_SIZE, len(file_map))
+            # never cut a multi-byte character in two
+            while end < len(file_map) and file_map[end] & 0xC0 == 0x80:
+                end += 1
+            data = file_map[start:end]
+            try:
+                length = len(data) if data.isascii() else len(data.decode("utf-8"))
+            except UnicodeDecodeError:
+                return None
+            pieces.append((MappedChunk(file_map, start, end, length), 0, length))
+            start = end
+
+        table = cls()
+        table.set_pieces(pieces)
+        return table
+
+    def set_pieces(self, pieces):
+        self.blocks = [pieces[i:i + self.BLOCK_SIZE] for i in range(0, len(pieces), self.BLOCK_SIZE)] or [[]]
+        self.rebuild()
+
+    def rebuild(self):
+        """Recompute the block lengths after blocks were added or removed"""
+
+        self.lengths = Fenwick([sum(end - start for _, start, end in block) for block in self.blocks])
+
+    def __len__(self):
+        return self.lengths.prefix(self.lengths.size)
+
+    def locate(self, offset):
+        """Return the (block, piece, offset in the piece) of a character offset"""
+
+        index, rest = self.lengths.search(offset)
+        # at the very end of the document
+        if index == len(self.blocks):
+            return index - 1, len(self.blocks[-1]), 0
+
+        for position, (_, start, end) in enumerate(self.blocks[index]):
+            if rest < end - start:
+                return index, position, rest
+            rest -= end - start
+
+    def split_at(self, offset):
+        """Make sure a piece starts at this offset, return its (block, piece)"""
+
+        index, position, inside = self.locate(offset)
+        if inside:
+            block = self.blocks[index]
+            block[position:position + 1] = split_piece(block[position], inside)
+            position += 1
+            if len(block) > 2 * self.BLOCK_SIZE:
+                self.split_block(index)
+                return self.locate(offset)[:2]
+
+        return index, position
+
+    def split_block(self, index):
+        block = self.blocks[index]
+        self.blocks[index:index + 1] = [block[i:i + self.BLOCK_SIZE] for i in range(0, len(block), self.BLOCK_SIZE)]
+        self.rebuild()
+
+    def insert(self, offset, text):
+        """Insert a text at a character offset"""
+
+        if not text:
+            return
+
+        index, position = self.split_at(offset)
+        block = self.blocks[index]
+
+        # typing: grow the piece inserted just before instead of adding one per key
+        if position and type(block[position - 1][0]) is str:
+            source, start, end = block[position - 1]
+            if end - start < self.MERGE_LIMIT:
+                merged = source[start:end] + text
+                block[position - 1] = (merged, 0, len(merged))
+                self.lengths.add(index, len(text))
+                return
+
+        block.insert(position, (text, 0, len(text)))
+        self.lengths.add(index, len(text))
+        if len(block) > 2 * self.BLOCK_SIZE:
+            self.split_block(index)
+
+    def delete(self, offset, length):
+        """Delete `length` characters from a character offset"""
+
+        length = min(length, len(self) - offset)
+        if length <= 0:
+            return
+
+        # cut the pieces at both ends, so whole pieces are removed
+        self.split_at(offset + length)
+        index, position = self.split_at(offset)
+
+        structure_changed = False
+        while length > 0:
+            block = self.blocks[index]
+            removed = 0
+            while position < len(block) and removed < length:
+                _, start, end = block.pop(position)
+                removed += end - start
+            self.lengths.add(index, -removed)
+            length -= removed
+
+            if not block and len(self.blocks) > 1:
+                del self.blocks[index]
+                structure_changed = True
+            else:
+                index += 1
+            position = 0
+
+        if structure_changed:
+            self.rebuild()
+
+    def snapshot(self):
+        """Return the pieces of the document, which never change (so workers can read them)"""
+
+        return tuple(piece for block in self.blocks for piece in block)
+
+    def text(self, start=0, end=None):
+        """Return the text between two offsets (the whole text by default)"""
+
+        end = len(self) if end is None else end
+        if start >= end:
+            return ""
+
+        index, position, inside = self.locate(start)
+        parts = []
+        remaining = end - start
+        for block in self.blocks[index:]:
+            for piece in block[position:]:
+                text = piece_text(piece)[inside:inside + remaining]
+                parts.append(text)
+                remaining -= len(text)
+                inside = 0
+                if not remaining:
+                    return "".join(parts)
+            position = 0
+
+        return "".join(parts)
+
+    def pieces(self, start, end):
+        """Return the pieces of the text between two offsets, without changing the document"""
+
+        if start >= end:
+            return ()
+
+        index, position, inside = self.locate(start)
+        result = []
+        remaining = end - start
+        for block in self.blocks[index:]:
+            for piece in block[position:]:
+                if inside:
+                    piece = split_piece(piece, inside)[1]
+                    inside = 0
+                length = piece[2] - piece[1]
+                if remaining < length:
+                    piece = split_piece(piece, remaining)[0]
+                    length = remaining
+                result.append(piece)
+                remaining -= length
+                if not remaining:
+                    return tuple(result)
+            position = 0
+
+        return tuple(result)
@@ -0,0 +1,23 @@
+class PreferenceStore:
+    """The PREFERENCES values, telling its listeners about the keys that actually change"""
+
+    def __init__(self, values):
+        # the dict is shared, not copied (the rest of the app reads it directly)
+        self.values = values
+        self.listeners = []
+
+    def subscribe(self, listener):
+        """Call listener(key, value) every time a preference changes"""
+
+        self.listeners.append(listener)
+
+    def set(self, key, value):
+        """Change a preference, return whether it actually changed"""
+
+        if self.values.get(key) == value:
+            return False
+
+        self.values[key] = value
+        for listener in self.listeners:
+            listener(key, value)
+        return True
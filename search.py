@@ -0,0 +1,123 @@
+import re
+
+def compile_pattern(pattern, use_regex, binary=False):
+    """Compile the searched pattern (literal text unless use_regex), for str or bytes sources"""
+
+    if not use_regex:
+        pattern = re.escape(pattern)
+    if binary:
+        pattern = pattern.encode("utf-8")
+
+    return re.compile(pattern, re.MULTILINE)
+
+# the source is scanned by windows of about this many characters (bytes for a file): a single regex call
+# holds the GIL until it finds a match, between windows the UI thread runs and a cancellation is noticed
+WINDOW_SIZE = 1 << 20
+
+def windows(source, size=WINDOW_SIZE):
+    """Yield (buffer, start, end) windows covering the source, cut after a newline when the window holds one"""
+
+    # a match can't span two windows: only a line longer than the window may lose one
+
+    if isinstance(source, str):
+        pos = 0
+        while pos < len(source):
+            end = min(pos + size, len(source))
+            if end < len(source):
+                newline = source.rfind("\n", pos, end)
+                if newline != -1:
+                    end = newline + 1
+            yield source, pos, end
+            pos = end
+        return
+
+    # a binary file, read as it's scanned
+    rest = b""
+    while True:
+        block = source.read(size)
+        data = rest + block
+        if not data:
+            return
+        cut = data.rfind(b"\n") + 1 if block else len(data)
+        if not cut:
+            # a line longer than the window, cut before a character (never inside its UTF-8 bytes)
+            cut = len(data) - 1
+            while cut > 0 and data[cut] & 0xC0 == 0x80:
+                cut -= 1
+        rest = data[cut:]
+        yield data, 0, cut
+
+def iter_matches(source, pattern, use_regex, cancelled, first_line=1):
+    """Yield the (line, column, length) of every match, stopping early once `cancelled` is set (worker thread)"""
+
+    # source is the text, or a binary file object of a UTF-8 file
+    binary = not isinstance(source, str)
+    regex = compile_pattern(pattern, use_regex, binary)
+    newline = b"\n" if binary else "\n"
+    chars = (lambda buffer, start, end: len(buffer[start:end].decode("utf-8", "replace"))) if binary else (lambda buffer, start, end: end - start)
+
+    # the line at the start of the window, and its characters before the window (when a long line was cut)
+    line, carried = first_line, 0
+
+    for buffer, start, end in windows(source):
+        if cancelled.is_set():
+            return
+        line_start = pos = start
+
+        for match in regex.finditer(buffer, start, end):
+            if cancelled.is_set():
+                return
+
+            match_start, match_end = match.span()
+            # empty matches can't be highlighted
+            if match_start == match_end:
+                continue
+
+            # move the line count up to the match
+            newlines = buffer.count(newline, pos, match_start)
+            if newlines:
+                line += newlines
+                line_start = buffer.rfind(newline, pos, match_start) + 1
+                carried = 0
+            pos = match_start
+
+            yield line, carried + chars(buffer, line_start, match_start), chars(buffer, match_start, match_end)
+
+        # and up to the end of the window
+        newlines = buffer.count(newline, pos, end)
+        if newlines:
+            line += newlines
+            line_start = buffer.rfind(newline, pos, end) + 1
+            carried = 0
+        carried += chars(buffer, line_start, end)
+
+def find_matches(source, pattern, use_regex, task, batch_size=1000):
+    """Send the (line, column, length) of every match to the task, in batches (worker thread)"""
+
+    found = 0
+    # the first match is sent alone so it shows up right away
+    batch, limit = [], 1
+
+    for match in iter_matches(source, pattern, use_regex, task.cancelled):
+        batch.append(match)
+        found += 1
+        if len(batch) >= limit:
+            task.send(batch)
+            batch, limit = [], batch_size
+
+    if task.cancelled.is_set():
+        return None
+    if batch:
+        task.send(batch)
+
+    return found
+
+def replace_all(text, pattern, replacement, use_regex):
+    """Return the text with every match replaced, and the number of replacements"""
+
+    regex = compile_pattern(pattern, use_regex)
+    # a literal replacement must not be read as a template ("\1", "\g<name>")
+    if not use_regex:
+        return regex.subn(lambda match: replacement, text)
+
+    return regex.subn(replacement, text)
@@ -0,0 +1,62 @@
+import json
+import os
+import sys
+import tempfile
+
+def settings_path():
+    """Return the path of the settings file (its directory is created when it's written)"""
+
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config")
+
+    return os.path.join(base, "txt", "settings.json")
+
+def load_settings(path=None):
+    """Return the saved settings, {} if there are none (or they can't be read)"""
+
+    try:
+        with open(path or settings_path(), encoding="utf-8") as file:
+            settings = json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+    return settings if isinstance(settings, dict) else {}
+
+def apply_settings(values, saved):
+    """Update a dict with the saved values of its keys, ignoring those of another type"""
+
+    if not isinstance(saved, dict):
+        return
+
+    for key, value in saved.items():
+        if key in values and type(value) is type(values[key]):
+            values[key] = value
+
+def changed_settings(values, defaults):
+    """Return the values that differ from the defaults (only those are saved)"""
+
+    return {key: value for key, value in values.items() if defaults.get(key) != value}
+
+def write_settings(settings, path=None):
+    """Atomically replace the settings file"""
+
+    path = path or settings_path()
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # the temporary file must be in the same directory (same file system) for os.replace
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".settings.", suffix=".tmp")
+
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(settings, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,91 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tkinter
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class EditorTest(unittest.TestCase):
+    """Edits made through the text widget, against the document, the undo history and the saved file (needs a display)"""
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            tkinter.Tk().destroy()
+        except tkinter.TclError:
+            raise unittest.SkipTest("no display")
+
+        # the journals and the settings of the tests must not mix with the user's
+        cls.directory = tempfile.mkdtemp(prefix="txt-test-")
+        os.environ["XDG_CACHE_HOME"] = os.path.join(cls.directory, "cache")
+        os.environ["XDG_CONFIG_HOME"] = os.path.join(cls.directory, "config")
+
+        import main
+        cls.main = main
+        cls.app = main.app = main.MainApp()
+        cls.settle()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.close_app()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    @classmethod
+    def settle(cls, done=lambda: True, timeout=10):
+        deadline = time.perf_counter() + timeout
+        cls.app.update()
+        while not done() and time.perf_counter() < deadline:
+            cls.app.update()
+            time.sleep(0.001)
+
+    def setUp(self):
+        self.textbox = self.app.text_editor
+        self.textbox.delete("1.0", "end")
+        self.app.history.reset()
+
+    def widget_text(self):
+        return self.textbox.get("1.0", "end-1c")
+
+    def assert_mirrored(self):
+        self.assertEqual(self.app.document.text(), self.widget_text())
+
+    def test_edits_after_an_emoji(self):
+        self.textbox.insert("1.0", "a\U0001F600b\nsecond \U0001F600 line\nthird")
+        # after the emoji: the column is past it, in the widget's units
+        self.textbox.insert("1.end", "!")
+        self.textbox.insert(self.textbox.index("2.end-5c"), "X")
+        self.textbox.delete("1.0", "1.1")
+        self.textbox.delete(self.textbox.index("2.end-1c"), "3.1")
+        self.assert_mirrored()
+
+        # the undo history replays the same text
+        text = self.widget_text()
+        self.textbox.edit_separator()
+        self.textbox.insert("3.0", "\U0001F600\U0001F600 end")
+        self.app.undo()
+        self.assertEqual(self.widget_text(), text)
+        self.assert_mirrored()
+
+        # the cursor offsets go both ways
+        for offset in range(len(text) + 1):
+            self.assertEqual(self.app.offset_of(self.app.index_of(offset)), offset)
+
+    def test_saved_text_after_an_emoji(self):
+        path = os.path.join(self.directory, "saved.txt")
+        self.textbox.insert("1.0", "\U0001F600 one\ntwo \U0001F600\U0001F600 three")
+        self.textbox.insert("2.end", " four")
+        self.textbox.delete("1.end-3c", "1.end")
+
+        self.app.actual_file = path
+        self.app.save_file()
+        self.settle(lambda: not self.app.saving)
+
+        with open(path, newline="") as file:
+            saved = file.read()
+        self.assertEqual(saved.replace(os.linesep, "\n"), self.widget_text())
+
+if __name__ == "__main__":
+    unittest.main()
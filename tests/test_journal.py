@@ -0,0 +1,83 @@
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal import EditJournal, process_alive
+
+def dead_pid():
+    """The pid of a process that already exited"""
+
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+def write_journal(directory, key, pid, edits=1):
+    """Write a journal as an editor with this pid would have left it"""
+
+    with open(os.path.join(directory, key + ".journal"), "w", encoding="utf-8") as file:
+        file.write(json.dumps({"file": None, "snapshot": False, "size": None, "mtime": None, "pid": pid}) + "\n")
+        for _ in range(edits):
+            file.write(json.dumps(["insert", "1.0", "x"]) + "\n")
+
+class RecoverableTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix="txt-journal-")
+
+    def tearDown(self):
+        EditJournal.wait()
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+        os.rmdir(self.directory)
+
+    def keys(self):
+        return sorted(os.path.basename(journal.journal_path) for journal in EditJournal.recoverable(self.directory))
+
+    def test_process_alive(self):
+        self.assertTrue(process_alive(os.getppid()))
+        self.assertFalse(process_alive(dead_pid()))
+        # this editor's own journals, or journals written before the pid was recorded
+        self.assertFalse(process_alive(os.getpid()))
+        self.assertFalse(process_alive(None))
+
+    def test_every_crashed_journal_is_offered(self):
+        pid = dead_pid()
+        for key in ("one", "two", "three"):
+            write_journal(self.directory, key, pid)
+        self.assertEqual(self.keys(), ["one.journal", "three.journal", "two.journal"])
+
+    def test_running_editors_keep_their_journals(self):
+        write_journal(self.directory, "crashed", dead_pid())
+        # a running editor, even one with nothing to recover yet
+        write_journal(self.directory, "running", os.getppid())
+        write_journal(self.directory, "running-empty", os.getppid(), edits=0)
+
+        self.assertEqual(self.keys(), ["crashed.journal"])
+        EditJournal.wait()
+        self.assertEqual(sorted(os.listdir(self.directory)), ["crashed.journal", "running-empty.journal", "running.journal"])
+
+    def test_empty_crashed_journals_are_cleaned(self):
+        write_journal(self.directory, "empty", dead_pid(), edits=0)
+        self.assertEqual(self.keys(), [])
+        EditJournal.wait()
+        self.assertEqual(os.listdir(self.directory), [])
+
+class LoadTest(unittest.TestCase):
+    def test_compressed_base_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "notes.txt.gz")
+            with gzip.open(path, "wt") as file:
+                file.write("first\nsecond\n")
+
+            journal = EditJournal(directory, path)
+            journal.write_header(snapshot=False)
+            journal.append([json.dumps(["insert", "1.0", "x"]) + "\n"])
+            self.assertEqual(journal.load(), ("first\nsecond\n", [["insert", "1.0", "x"]]))
+
+if __name__ == "__main__":
+    unittest.main()
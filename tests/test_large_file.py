@@ -0,0 +1,97 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from large_file import LargeFile
+from text_stats import count_chunks
+
+class LargeFileTest(unittest.TestCase):
+    def setUp(self):
+        # small blocks and steps, so a few KB go through every path
+        self.sizes = LargeFile.INDEX_STEP, LargeFile.BLOCK_SIZE, LargeFile.TAIL_SIZE
+        LargeFile.INDEX_STEP, LargeFile.BLOCK_SIZE, LargeFile.TAIL_SIZE = 4, 64, 16
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "log.txt")
+        self.rng = random.Random(5)
+        self.text = self.random_text(3000)
+        self.write("w", self.text)
+        self.file = LargeFile(self.path)
+        self.file.build_index()
+
+    def tearDown(self):
+        self.file.close()
+        self.directory.cleanup()
+        LargeFile.INDEX_STEP, LargeFile.BLOCK_SIZE, LargeFile.TAIL_SIZE = self.sizes
+
+    def random_text(self, length):
+        return "".join(self.rng.choice(["a", "b", " ", "\n", "\r\n", "\U0001F600", "é"]) for _ in range(length))
+
+    def write(self, mode, text):
+        with open(self.path, mode + "b") as file:
+            file.write(text.encode("utf-8"))
+
+    def assert_indexed(self, text):
+        text = text.replace("\r\n", "\n")
+        lines = text.split("\n")
+        self.assertTrue(self.file.indexed)
+        self.assertEqual(self.file.line_count, len(lines))
+        for first in range(0, len(lines), 7):
+            self.assertEqual(self.file.lines(first, 3), "\n".join(lines[first:first + 3]))
+        self.assertEqual(count_chunks(self.file.text_chunks()), (len(text), len(text.split())))
+
+    def test_text_chunks(self):
+        self.assert_indexed(self.text)
+        # a "\r\n" cut by a block boundary
+        self.write("w", "x" * 63 + "\r\n" + "y")
+        file = LargeFile(self.path)
+        self.addCleanup(file.close)
+        self.assertEqual("".join(file.text_chunks()), "x" * 63 + "\ny")
+
+    def test_extend_after_appends(self):
+        for _ in range(5):
+            appended = self.random_text(self.rng.randint(1, 500))
+            self.write("a", appended)
+            self.text += appended
+            self.assertTrue(self.file.extend())
+            self.file.build_index()
+            self.assert_indexed(self.text)
+
+    def test_rewritten_files_are_not_extended(self):
+        size = self.file.size
+
+        # same size
+        self.write("w", "z" * size)
+        self.assertFalse(self.file.extend())
+        # longer, but the indexed text changed
+        self.write("w", "z" * (size + 10))
+        self.assertFalse(self.file.extend())
+        # shorter
+        self.write("w", "z")
+        self.assertFalse(self.file.extend())
+        self.assertEqual(self.file.size, size)
+
+        # replaced by another file with the same start
+        os.remove(self.path)
+        self.write("w", self.text + "more")
+        self.assertFalse(self.file.extend())
+
+    def test_cut_while_open(self):
+        # another program empties the file (a log rotation): reads come back short, the editor goes on
+        self.write("w", "")
+        self.assertEqual(self.file.lines(0, 10), "")
+        self.assertEqual(self.file.lines(100, 10), "")
+        self.assertFalse(self.file.extend())
+
+    def test_char_before(self):
+        self.write("w", "a\U0001F600b")
+        file = LargeFile(self.path)
+        self.addCleanup(file.close)
+        self.assertEqual([file.char_before(offset) for offset in (0, 1, 5, 6)], ["", "a", "\U0001F600", "b"])
+
+if __name__ == "__main__":
+    unittest.main()
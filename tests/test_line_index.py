@@ -0,0 +1,98 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from line_index import Fenwick, LineIndex
+
+def line_starts(text):
+    """The start offset of every line, computed the slow way"""
+
+    starts = [0]
+    for position, char in enumerate(text):
+        if char == "\n":
+            starts.append(position + 1)
+    return starts
+
+def replace(index, text, start, end, inserted):
+    """Replace text[start:end] and update the index like the edit hook does, return the new text"""
+
+    first = text.count("\n", 0, start)
+    count = text.count("\n", start, end) + 1
+    text = text[:start] + inserted + text[end:]
+    lines = text.split("\n")
+    new_count = inserted.count("\n") + 1
+    index.replace_lines(first, count, lines[first:first + new_count])
+    return text
+
+class FenwickTest(unittest.TestCase):
+    def test_prefix_and_search(self):
+        rng = random.Random(0)
+        values = [rng.randint(0, 9) for _ in range(300)]
+        tree = Fenwick(values)
+        for _ in range(300):
+            position = rng.randrange(len(values))
+            delta = rng.randint(0, 5)
+            values[position] += delta
+            tree.add(position, delta)
+
+        for index in range(len(values) + 1):
+            self.assertEqual(tree.prefix(index), sum(values[:index]))
+        for target in range(sum(values)):
+            index, rest = tree.search(target)
+            # the value where the running sum passes target
+            self.assertLessEqual(sum(values[:index]), target)
+            self.assertLess(target, sum(values[:index + 1]))
+            self.assertEqual(rest, target - sum(values[:index]))
+
+class LineIndexTest(unittest.TestCase):
+    def assert_index(self, index, text):
+        starts = line_starts(text)
+        self.assertEqual(index.line_count, len(starts))
+        for line, start in enumerate(starts):
+            self.assertEqual(index.offset(line), start)
+            length = (starts[line + 1] - 1 if line + 1 < len(starts) else len(text)) - start
+            self.assertEqual(index.line_length(line), length)
+        # every offset, and back
+        for offset in range(len(text) + 1):
+            line, column = index.position(offset)
+            self.assertEqual(index.offset(line, column), offset)
+        self.assertEqual(index.long_lines, sum(length > index.long_line for length in map(len, text.split("\n"))))
+
+    def test_reset(self):
+        for text in ("", "\n", "one", "one\ntwo\n", "\n\n\nx"):
+            self.assert_index(LineIndex(text), text)
+
+    def test_past_the_end(self):
+        index = LineIndex("ab\ncd")
+        self.assertEqual(index.position(100), (1, 2))
+
+    def test_random_edits(self):
+        # small blocks, so the edits split and merge them
+        LineIndex.BLOCK_SIZE, block_size = 4, LineIndex.BLOCK_SIZE
+        try:
+            rng = random.Random(3)
+            text = "".join(rng.choice("ab\n") for _ in range(200))
+            index = LineIndex(text, long_line=6)
+            for step in range(1500):
+                start = rng.randint(0, len(text))
+                end = min(start + rng.choice((0, 0, 1, 3, 20)), len(text))
+                inserted = "".join(rng.choice("abcdefgh\n") for _ in range(rng.choice((0, 1, 1, 5, 30))))
+                text = replace(index, text, start, end, inserted)
+                if step % 50 == 0:
+                    self.assert_index(index, text)
+            self.assert_index(index, text)
+        finally:
+            LineIndex.BLOCK_SIZE = block_size
+
+    def test_resize_line(self):
+        text = "short\n" + "x" * 8 + "\nend"
+        index = LineIndex(text, long_line=6)
+        for delta, text in ((3, "short\n" + "x" * 11 + "\nend"), (-7, "short\n" + "x" * 4 + "\nend"), (1, "short\n" + "x" * 5 + "\nend")):
+            index.resize_line(1, delta)
+            self.assert_index(index, text)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import piece_table
+from piece_table import PieceTable, encode_pieces, private_copy, text_of
+
+class PieceTableTest(unittest.TestCase):
+    def assert_text(self, table, text):
+        self.assertEqual(table.text(), text)
+        self.assertEqual(len(table), len(text))
+        self.assertEqual(text_of(table.snapshot()), text)
+
+    def test_insert_and_delete(self):
+        table = PieceTable("hello world")
+        table.insert(5, ",")
+        table.insert(len(table), "!")
+        table.insert(0, ">> ")
+        self.assert_text(table, ">> hello, world!")
+        table.delete(0, 3)
+        table.delete(5, 100)
+        self.assert_text(table, "hello")
+        table.delete(0, len(table))
+        self.assert_text(table, "")
+
+    def test_ranges(self):
+        table = PieceTable("abcdef")
+        table.insert(3, "XYZ")
+        text = "abcXYZdef"
+        for start in range(len(text) + 1):
+            for end in range(start, len(text) + 1):
+                self.assertEqual(table.text(start, end), text[start:end])
+                self.assertEqual(text_of(table.pieces(start, end)), text[start:end])
+
+    def test_random_edits(self):
+        # small blocks and merges, so the edits split blocks and pieces often
+        sizes = PieceTable.BLOCK_SIZE, PieceTable.MERGE_LIMIT
+        PieceTable.BLOCK_SIZE, PieceTable.MERGE_LIMIT = 4, 8
+        try:
+            rng = random.Random(4)
+            text = "".join(rng.choice("abc \n\U0001F600") for _ in range(300))
+            table = PieceTable(text)
+            for step in range(3000):
+                offset = rng.randint(0, len(text))
+                if rng.random() < 0.6:
+                    inserted = "".join(rng.choice("xyz\n\U0001F600") for _ in range(rng.choice((1, 1, 3, 20))))
+                    table.insert(offset, inserted)
+                    text = text[:offset] + inserted + text[offset:]
+                else:
+                    length = rng.choice((1, 2, 10, 50))
+                    table.delete(offset, length)
+                    text = text[:offset] + text[offset + length:]
+                if step % 100 == 0:
+                    self.assert_text(table, text)
+            self.assert_text(table, text)
+        finally:
+            PieceTable.BLOCK_SIZE, PieceTable.MERGE_LIMIT = sizes
+
+    def test_snapshots_never_change(self):
+        table = PieceTable("one two three")
+        snapshot = table.snapshot()
+        table.insert(3, " and a half")
+        table.delete(0, 4)
+        self.assertEqual(text_of(snapshot), "one two three")
+
+    def test_from_file(self):
+        text = "first line\nsecond é line\n\U0001F600 third\n" * 5000
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "text.txt")
+            with open(path, "wb") as file:
+                file.write(text.encode("utf-8"))
+
+            with open(path, "rb") as file, private_copy(file, directory) as copy:
+                table = PieceTable.from_file(copy)
+            if table is None:
+                self.skipTest("files aren't mapped on this platform")
+            self.assert_text(table, text)
+
+            # the document maps a copy: truncating or rewriting the file doesn't touch it
+            with open(path, "wb") as file:
+                file.write(b"x")
+            self.assert_text(table, text)
+
+            table.insert(5, "!")
+            table.delete(len(table) - 10, 4)
+            text = text[:5] + "!" + text[5:len(text) - 10] + text[len(text) - 6:]
+            self.assert_text(table, text)
+            self.assertEqual(b"".join(encode_pieces(table.snapshot())), text.encode("utf-8"))
+
+    def test_encode_newlines(self):
+        table = PieceTable("a\nb\n")
+        self.assertEqual(b"".join(encode_pieces(table.snapshot(), "utf-8", "\r\n")), b"a\r\nb\r\n")
+
+    def test_encode_by_parts(self):
+        # a whole converted file in one piece: encoded by parts, the BOM of UTF-16 written once
+        sizes = piece_table.ENCODE_SIZE
+        piece_table.ENCODE_SIZE = 7
+        try:
+            text = "ab\n\U0001F600é\n" * 10
+            table = PieceTable(text)
+            table.insert(5, "x\n")
+            text = text[:5] + "x\n" + text[5:]
+            parts = list(encode_pieces(table.snapshot(), "utf-16", "\r\n"))
+            self.assertGreater(len(parts), 5)
+            self.assertEqual(b"".join(parts), text.replace("\n", "\r\n").encode("utf-16"))
+        finally:
+            piece_table.ENCODE_SIZE = sizes
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import io
+import os
+import random
+import re
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import search
+from search import iter_matches, replace_all
+
+def expected(text, pattern):
+    """The (line, column, length) of every match, found in one pass over the whole text"""
+
+    matches = []
+    for match in re.finditer(pattern, text, re.MULTILINE):
+        start, end = match.span()
+        if start < end:
+            line_start = text.rfind("\n", 0, start) + 1
+            matches.append((text.count("\n", 0, start) + 1, start - line_start, end - start))
+    return matches
+
+class FindMatchesTest(unittest.TestCase):
+    def setUp(self):
+        # small windows, so a few KB are cut in many places
+        self.window_size = search.WINDOW_SIZE
+        search.WINDOW_SIZE = 64
+        self.addCleanup(setattr, search, "WINDOW_SIZE", self.window_size)
+
+    def find(self, source, pattern, use_regex=True, cancelled=None):
+        return list(iter_matches(source, pattern, use_regex, cancelled or threading.Event()))
+
+    def test_windows_match_a_single_pass(self):
+        rng = random.Random(6)
+        for _ in range(20):
+            lines = ["".join(rng.choice("ab é\U0001F600") for _ in range(rng.choice((0, 5, 30, 300)))) for _ in range(40)]
+            text = "\n".join(lines)
+            for pattern in ("a", "ab+", "\U0001F600 ?é", "^b", "a$"):
+                self.assertEqual(self.find(text, pattern), expected(text, pattern), pattern)
+                # the same file, read as bytes
+                binary = io.BytesIO(text.encode("utf-8"))
+                self.assertEqual(self.find(binary, pattern), expected(text, pattern), pattern)
+
+    def test_long_line_columns(self):
+        # no newline for many windows, with multi-byte characters on the cuts
+        text = "é\U0001F600" * 200 + "x" + "é" * 100 + "\nx"
+        self.assertEqual(self.find(io.BytesIO(text.encode("utf-8")), "x", False), expected(text, "x"))
+        self.assertEqual(self.find(text, "x", False), expected(text, "x"))
+
+    def test_first_line(self):
+        self.assertEqual(list(iter_matches("a\nba", "a", False, threading.Event(), first_line=10)), [(10, 0, 1), (11, 1, 1)])
+
+    def test_cancelled(self):
+        cancelled = threading.Event()
+        cancelled.set()
+        self.assertEqual(self.find("a\n" * 1000, "a", cancelled=cancelled), [])
+
+    def test_literal_replacement(self):
+        self.assertEqual(replace_all("a.b a.b", "a.b", r"\1", False), (r"\1 \1", 2))
+
+if __name__ == "__main__":
+    unittest.main()
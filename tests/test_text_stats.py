@@ -0,0 +1,135 @@
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_stats import TextStats, count_chunks
+
+# words, spaces, newlines and characters outside the BMP (counted as one character, like Python does)
+ALPHABET = "ab \n\t\U0001F600é"
+
+def random_text(rng, length):
+    return "".join(rng.choice(ALPHABET) for _ in range(length))
+
+def line_of(text, offset):
+    """Return the 0-based line of a character offset"""
+
+    return text.count("\n", 0, offset)
+
+def apply_edit(stats, text, ranges, inserted=""):
+    """Delete the (start, end) ranges and insert a text at the first one, updating the stats like the edit hook does"""
+
+    # the lines touched, read before the edit
+    first = line_of(text, ranges[0][0])
+    last = line_of(text, ranges[-1][1])
+    count = last - first + 1
+
+    for start, end in reversed(ranges):
+        text = text[:start] + text[end:]
+    start = ranges[0][0]
+    text = text[:start] + inserted + text[start:]
+
+    # the edited lines, read back after it
+    lines = text.split("\n")
+    new_count = count + len(lines) - stats.line_count
+    stats.replace_lines(first, count, lines[first:first + new_count])
+    return text
+
+def recount(text):
+    """The counts of the full text, what the incremental ones must match"""
+
+    return len(text), len(text.split())
+
+class TextStatsTest(unittest.TestCase):
+    def assert_counts(self, stats, text):
+        self.assertEqual((stats.chars, stats.words), recount(text))
+        self.assertEqual(stats.line_count, text.count("\n") + 1)
+
+    def test_reset(self):
+        for text in ("", "\n", "one", "one two\nthree\n", " \U0001F600 x\n\ny "):
+            self.assert_counts(TextStats(text), text)
+
+    def test_edits_at_line_boundaries(self):
+        text = "one two\nthree\n\nfour five six"
+        stats = TextStats(text)
+
+        # joining two lines merges the words on both sides
+        text = apply_edit(stats, text, [(7, 8)])
+        self.assert_counts(stats, text)
+        # splitting a word in two
+        text = apply_edit(stats, text, [(9, 9)], "\n")
+        self.assert_counts(stats, text)
+        # at the very start and the very end
+        text = apply_edit(stats, text, [(0, 0)], "zero\n")
+        self.assert_counts(stats, text)
+        text = apply_edit(stats, text, [(len(text), len(text))], "\nseven")
+        self.assert_counts(stats, text)
+        # deleting whole lines, newline included
+        start = text.index("\n") + 1
+        text = apply_edit(stats, text, [(start, text.index("\n", start) + 1)])
+        self.assert_counts(stats, text)
+        # everything
+        text = apply_edit(stats, text, [(0, len(text))])
+        self.assert_counts(stats, text)
+
+    def test_multi_range_delete(self):
+        text = "alpha beta\ngamma\ndelta epsilon\nzeta eta\ntheta"
+        stats = TextStats(text)
+        text = apply_edit(stats, text, [(2, 8), (12, 20), (30, 33)])
+        self.assert_counts(stats, text)
+
+    def test_astral_characters(self):
+        text = "\U0001F600\U0001F600 a\n\U0001F600"
+        stats = TextStats(text)
+        text = apply_edit(stats, text, [(1, 2)], "b \U0001F600")
+        self.assert_counts(stats, text)
+        self.assertEqual(stats.chars, len(text))
+
+    def test_random_edits(self):
+        rng = random.Random(1)
+        text = random_text(rng, 500)
+        stats = TextStats(text)
+
+        for _ in range(2000):
+            # one to three ranges, in order and not overlapping
+            points = sorted(rng.randint(0, len(text)) for _ in range(2 * rng.randint(1, 3)))
+            ranges = list(zip(points[::2], points[1::2]))
+            # mostly small edits, like typing
+            if rng.random() < 0.7:
+                start = rng.randint(0, len(text))
+                ranges = [(start, min(start + rng.randint(0, 2), len(text)))]
+            text = apply_edit(stats, text, ranges, random_text(rng, rng.randint(0, 12)))
+            self.assert_counts(stats, text)
+
+    def test_edits_inside_a_long_line(self):
+        rng = random.Random(3)
+        text = random_text(rng, 50) + "\n" + "".join(rng.choice("ab \t\U0001F600") for _ in range(3000)) + "\n" + random_text(rng, 50)
+        stats = TextStats(text)
+        line = 1
+
+        for _ in range(1000):
+            line_start = text.index("\n") + 1
+            line_end = text.index("\n", line_start)
+            start = rng.randint(line_start, line_end)
+            end = min(start + rng.choice((0, 1, 5)), line_end)
+            inserted = "".join(rng.choice("ab \U0001F600") for _ in range(rng.choice((0, 1, 3))))
+            # only the edit and the characters around it are given
+            stats.edit_line(line, text[max(start - 1, 0):start], text[start:end], inserted, text[end:end + 1])
+            text = text[:start] + inserted + text[end:]
+            self.assert_counts(stats, text)
+        self.assertEqual(stats.line_chars[line], len(text.split("\n")[line]))
+        self.assertEqual(stats.line_words[line], len(text.split("\n")[line].split()))
+
+class CountChunksTest(unittest.TestCase):
+    def test_words_cut_by_chunks(self):
+        rng = random.Random(2)
+        for _ in range(200):
+            text = random_text(rng, rng.randint(0, 200))
+            cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(0, 6)))
+            chunks = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+            self.assertEqual(count_chunks(chunks), recount(text))
+
+if __name__ == "__main__":
+    unittest.main()
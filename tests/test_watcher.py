@@ -0,0 +1,108 @@
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from piece_table import PieceTable
+from watcher import FileWatcher, common_prefix, file_signature, read_changes
+
+def new_digest():
+    return hashlib.blake2b(digest_size=16)
+
+def digest_of(text):
+    hasher = new_digest()
+    hasher.update(text.encode("utf-8"))
+    return hasher.digest()
+
+class CommonPrefixTest(unittest.TestCase):
+    def test_against_a_character_walk(self):
+        rng = random.Random(7)
+        for _ in range(500):
+            a = "".join(rng.choice("ab") for _ in range(rng.randint(0, 40)))
+            b = a[:rng.randint(0, len(a))] + "".join(rng.choice("ab") for _ in range(rng.randint(0, 10)))
+            expected = 0
+            while expected < min(len(a), len(b)) and a[expected] == b[expected]:
+                expected += 1
+            self.assertEqual(common_prefix(a, b, block=4), expected, (a, b))
+
+class ReadChangesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "log.txt")
+        self.text = "first line\nsecond é line\n" * 300
+        self.write("wb", self.text.encode("utf-8"))
+        # what the document knows after loading the file (see MainApp.read_chunks)
+        data = self.text.encode("utf-8")
+        hasher = new_digest()
+        hasher.update(data)
+        self.known = (file_signature(self.path), len(data), data[-FileWatcher.TAIL_SIZE:], hasher)
+
+    def write(self, mode, data):
+        with open(self.path, mode) as file:
+            file.write(data)
+        # a different mtime, whatever the file system's resolution
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def changes(self):
+        """Bring the document to the file like file_reloaded does, return the replaced range"""
+
+        (start, end, text), self.known = read_changes(self.path, self.known, PieceTable(self.text).snapshot(), True, "utf-8", new_digest)
+        self.text = self.text[:start] + text + self.text[end:]
+        self.assertEqual(self.known[0], file_signature(self.path))
+        self.assertEqual(self.known[3].digest(), digest_of(self.text))
+        return start, end, text
+
+    def file_text(self):
+        with open(self.path, encoding="utf-8", newline=None) as file:
+            return file.read()
+
+    def test_append(self):
+        length = len(self.text)
+        self.write("ab", "third line\n".encode("utf-8"))
+        self.assertEqual(self.changes(), (length, length, "third line\n"))
+        self.assertEqual(self.known[1], os.path.getsize(self.path))
+
+    def test_character_cut_by_a_read(self):
+        length = len(self.text)
+        # the writer is in the middle of "é" (and of a "\r\n"): only what's complete is taken
+        self.write("ab", b"ab\xc3")
+        self.assertEqual(self.changes(), (length, length, "ab"))
+        self.write("ab", b"\xa9cd\r")
+        self.assertEqual(self.changes()[2], "écd")
+        self.write("ab", b"\nend")
+        self.assertEqual(self.changes()[2], "\nend")
+        self.assertEqual(self.text, self.file_text())
+
+    def test_in_place_change(self):
+        # the last line is rewritten, the bytes known at the end aren't there anymore
+        data = self.text.encode("utf-8")
+        self.write("r+b", data[:-5] + b"LINE\n")
+        start, end, text = self.changes()
+        # only the differing range is replaced, the common "\n" at the end stays
+        self.assertEqual((end - start, text), (4, "LINE"))
+        self.assertEqual(self.text, self.file_text())
+
+    def test_truncation(self):
+        length = len(self.text)
+        self.write("wb", b"first line\n")
+        self.assertEqual(self.changes(), (len("first line\n"), length, ""))
+        self.assertEqual(self.text, "first line\n")
+
+    def test_replaced_file(self):
+        # a new file (another inode) with the same end and more: read whole, not taken as an append
+        new_path = self.path + ".new"
+        with open(new_path, "wb") as file:
+            file.write(("X" + self.text[1:] + "more\n").encode("utf-8"))
+        os.replace(new_path, self.path)
+        start, end, text = self.changes()
+        self.assertEqual(start, 0)
+        self.assertEqual(self.text, self.file_text())
+
+if __name__ == "__main__":
+    unittest.main()
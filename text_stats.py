@@ -0,0 +1,76 @@
+class TextStats:
+    """Character and word counts of a text, kept per line and updated incrementally"""
+
+    def __init__(self, text=""):
+        self.reset(text)
+
+    def reset(self, text):
+        """Recount everything from a full text"""
+
+        lines = text.split("\n")
+        # per-line counts (the "\n" characters are not part of any line)
+        self.line_chars = [len(line) for line in lines]
+        self.line_words = [len(line.split()) for line in lines]
+        # totals, the newlines between the lines are characters too
+        self.chars = sum(self.line_chars) + len(lines) - 1
+        self.words = sum(self.line_words)
+
+    @property
+    def line_count(self):
+        return len(self.line_chars)
+
+    def replace_lines(self, first, count, new_lines):
+        """Replace `count` lines starting at the 0-based line `first` with `new_lines`"""
+
+        last = first + count
+        new_chars = [len(line) for line in new_lines]
+        # a "\n" can never be inside a word, so words never cross lines and
+        # the per-line split() gives the same total as a split() of the whole text
+        new_words = [len(line.split()) for line in new_lines]
+
+        self.chars += sum(new_chars) - sum(self.line_chars[first:last]) + len(new_lines) - count
+        self.words += sum(new_words) - sum(self.line_words[first:last])
+
+        self.line_chars[first:last] = new_chars
+        self.line_words[first:last] = new_words
+
+    def edit_line(self, line, before, removed, inserted, after):
+        """Replace `removed` by `inserted` inside a 0-based line, given the characters just before and after the edit"""
+
+        # only the edit is counted, not the line (it may be megabytes long): a word cut by the edit is
+        # counted with its neighbouring character on both sides, so it cancels out (like in count_chunks)
+        chars = len(inserted) - len(removed)
+        words = len((before + inserted + after).split()) - len((before + removed + after).split())
+
+        self.chars += chars
+        self.words += words
+        self.line_chars[line] += chars
+        self.line_words[line] += words
+
+def count_chunks(chunks):
+    """Return the (characters, words) of a text given as consecutive chunks"""
+
+    chars = words = 0
+    # whether the previous chunk ended in the middle of a word
+    inside_word = False
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        chars += len(chunk)
+        words += len(chunk.split())
+        # a word cut in two by the chunk boundary was counted twice
+        if inside_word and not chunk[0].isspace():
+            words -= 1
+        inside_word = not chunk[-1].isspace()
+
+    return chars, words
+
+def read_chunks(file, chunk_size=1 << 20, cancelled=None):
+    """Yield the text of an open file by chunks, stopping early if `cancelled` is set"""
+
+    while not (cancelled and cancelled.is_set()):
+        chunk = file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,42 @@
+class ThemeRegistry:
+    """Widgets and the palette keys their color options use, so a theme switch only recolors what changed"""
+
+    def __init__(self, palette):
+        self.palette = dict(palette)
+        # widget -> {option: palette key}
+        self.widgets = {}
+        # functions called with (palette, changed keys) for colors that aren't widget options (text tags...)
+        self.callbacks = []
+
+    def register(self, widget, **options):
+        """Remember which palette key each color option of a widget follows, return the widget"""
+
+        self.widgets.setdefault(widget, {}).update(options)
+        return widget
+
+    def on_change(self, callback):
+        self.callbacks.append(callback)
+
+    def apply(self, palette):
+        """Switch to a palette, with one configure call per widget using a changed color (returns how many)"""
+
+        changed = {key for key, value in palette.items() if self.palette.get(key) != value}
+        self.palette = dict(palette)
+        if not changed:
+            return 0
+
+        calls = 0
+        for widget, options in list(self.widgets.items()):
+            # forget the widgets destroyed since the last switch
+            if not widget.winfo_exists():
+                del self.widgets[widget]
+                continue
+            values = {option: palette[key] for option, key in options.items() if key in changed}
+            if values:
+                widget.configure(**values)
+                calls += 1
+
+        for callback in self.callbacks:
+            callback(palette, changed)
+
+        return calls
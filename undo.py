@@ -0,0 +1,119 @@
+import sys
+from collections import deque
+
+from piece_table import MappedChunk
+
+def own_piece(piece):
+    """Return a piece that doesn't keep a much bigger text alive"""
+
+    source, start, end = piece
+    if isinstance(source, str) and end - start < len(source) // 2:
+        text = source[start:end]
+        return text, 0, len(text)
+    return piece
+
+def piece_size(piece):
+    """Bytes kept alive by a piece (a mapped chunk is only a reference into the file)"""
+
+    source = piece[0]
+    return UndoHistory.OVERHEAD if isinstance(source, MappedChunk) else UndoHistory.OVERHEAD + sys.getsizeof(source)
+
+def removed_length(removed):
+    return sum(end - start for _, start, end in removed)
+
+class UndoHistory:
+    """Undo / redo steps of the document, merging typed characters and bounded in bytes"""
+
+    # a step is an (offset, removed, inserted) edit: `removed` are the document pieces that were at
+    # the offset before the edit (so deleting mapped text only keeps references into the file),
+    # `inserted` is the text put in their place
+
+    # bytes counted for every step and piece, on top of the text they hold
+    OVERHEAD = 64
+    # typing stops being merged into the same step past this many characters
+    MERGE_LIMIT = 4096
+
+    def __init__(self, limit):
+        # max bytes held by the history, the oldest steps are dropped past it
+        self.limit = limit
+        self.reset()
+
+    def reset(self):
+        """Forget every step"""
+
+        self.undo_steps = deque()
+        self.redo_steps = []
+        self.memory = 0
+        # set when the next edit must not be merged with the last step
+        self.closed = True
+
+    def separator(self):
+        """Make the next edit a new step"""
+
+        self.closed = True
+
+    @staticmethod
+    def step_size(step):
+        _, removed, inserted = step
+        return UndoHistory.OVERHEAD + sys.getsizeof(inserted) + sum(map(piece_size, removed))
+
+    def record(self, offset, removed, inserted):
+        """Remember an edit: the pieces `removed` at `offset` were replaced by the text `inserted`"""
+
+        removed = tuple(map(own_piece, removed))
+
+        # a new edit makes the undone steps unreachable
+        self.memory -= sum(map(self.step_size, self.redo_steps))
+        self.redo_steps = []
+
+        step = self.merged(offset, removed, inserted) if not self.closed and self.undo_steps else None
+        if step:
+            self.memory -= self.step_size(self.undo_steps.pop())
+        else:
+            step = (offset, removed, inserted)
+        self.undo_steps.append(step)
+        self.memory += self.step_size(step)
+        self.closed = False
+
+        # drop the oldest steps, the last one is always kept
+        while self.memory > self.limit and len(self.undo_steps) > 1:
+            self.memory -= self.step_size(self.undo_steps.popleft())
+
+    def merged(self, offset, removed, inserted):
+        """Return the last step extended with this edit, None if they are separate steps"""
+
+        last_offset, last_removed, last_inserted = self.undo_steps[-1]
+
+        # typing (or typing over a deleted selection)
+        if not removed and offset == last_offset + len(last_inserted) and len(last_inserted) < self.MERGE_LIMIT:
+            if len(inserted) == 1 or not last_inserted:
+                return last_offset, last_removed, last_inserted + inserted
+
+        # backspace and delete, one character at a time
+        if not inserted and not last_inserted and removed_length(removed) == 1 and removed_length(last_removed) < self.MERGE_LIMIT:
+            if offset + 1 == last_offset:
+                return offset, removed + last_removed, ""
+            if offset == last_offset:
+                return offset, last_removed + removed, ""
+
+        return None
+
+    def undo(self):
+        """Return the step to undo (None if there's none), it becomes redoable"""
+
+        if not self.undo_steps:
+            return None
+        step = self.undo_steps.pop()
+        self.redo_steps.append(step)
+        self.closed = True
+        return step
+
+    def redo(self):
+        """Return the step to redo (None if there's none)"""
+
+        if not self.redo_steps:
+            return None
+        step = self.redo_steps.pop()
+        self.undo_steps.append(step)
+        self.closed = True
+        return step
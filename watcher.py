@@ -0,0 +1,185 @@
+import codecs
+import ctypes
+import os
+import sys
+
+from piece_table import text_of
+
+# inotify events on the file's directory that may mean the file changed (or was replaced)
+IN_MODIFY = 0x002
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCHED_EVENTS = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+def file_signature(path):
+    """Return the (mtime, size, inode) of a file, None if it can't be read"""
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+def inotify_open(directory):
+    """Return a non-blocking inotify descriptor watching a directory, None where inotify isn't available"""
+
+    if not sys.platform.startswith("linux"):
+        return None
+
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+
+    if libc.inotify_add_watch(fd, os.fsencode(directory or "."), WATCHED_EVENTS) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+class FileWatcher:
+    """Tell when another program changes a file, and what the document already holds of it"""
+
+    # bytes kept from the end of the known content, to recognize a file that was only appended to
+    TAIL_SIZE = 4096
+
+    def __init__(self, file_path, known):
+        self.path = file_path
+        # the file as the document matches it: (signature, bytes, last bytes, hash object of its text)
+        self.known = known
+        # inotify saves a stat per check while nothing happens, polling is the fallback
+        self.fd = None
+        self.resume()
+
+    @property
+    def signature(self):
+        return self.known[0]
+
+    def resume(self):
+        """Start watching (again)"""
+
+        if self.fd is None:
+            self.fd = inotify_open(os.path.dirname(os.path.abspath(self.path)))
+        # it may have changed while it wasn't watched
+        self.pending = True
+
+    def pause(self):
+        """Stop watching, keeping what's known of the file"""
+
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def drain(self):
+        """Read the pending inotify events, return whether there were any"""
+
+        seen = False
+        while True:
+            try:
+                data = os.read(self.fd, 1 << 16)
+            except BlockingIOError:
+                return seen
+            except OSError:
+                # the descriptor broke, poll from now on
+                self.pause()
+                return True
+            if not data:
+                return seen
+            seen = True
+
+    def changed(self):
+        """Return whether the file changed since it was last known (a stat, only after inotify events if possible)"""
+
+        if self.fd is not None and not self.drain() and not self.pending:
+            return False
+        self.pending = False
+        return file_signature(self.path) != self.signature
+
+    def ignore(self):
+        """Take the file's actual signature as known, without reading it (the change was refused)"""
+
+        self.known = (file_signature(self.path),) + self.known[1:]
+
+def decode_text(data, encoding, final=True):
+    """Decode bytes like a file opened in text mode (universal newlines), return (text, bytes used)"""
+
+    decoder = codecs.getincrementaldecoder(encoding)()
+    text = decoder.decode(data, final)
+    used = len(data) - len(decoder.getstate()[0])
+    # a "\r" at the end may be the first half of a "\r\n"
+    if not final and text.endswith("\r"):
+        text, used = text[:-1], used - 1
+    return text.replace("\r\n", "\n").replace("\r", "\n"), used
+
+def common_prefix(a, b, block=1 << 16):
+    """Return the length of the common prefix of two strings, comparing them by blocks"""
+
+    size = min(len(a), len(b))
+    start = 0
+    while start < size and a[start:start + block] == b[start:start + block]:
+        start += block
+    if start >= size:
+        return size
+
+    # the first difference is in [low, high]
+    low, high = start, min(start + block, size)
+    while high - low > 1:
+        middle = (low + high) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle
+    return low if a[low] != b[low] else high
+
+def read_changes(file_path, known, pieces, clean, encoding, new_digest, decompress=None):
+    """Return how to bring the document to the file: (start, end, text) to replace, and the new known state
+
+    When the document matches the known file and the file was only appended to, only the tail is read.
+    Otherwise the whole file is read (and decompressed) and only the range that differs from the document is replaced.
+    (worker thread)
+    """
+
+    signature, offset, tail, hasher = known
+
+    with open(file_path, "rb") as file:
+        stat = os.fstat(file.fileno())
+        new_signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        length = sum(end - start for _, start, end in pieces)
+
+        # appended to: same file, not shorter, same bytes at the end of the known part
+        if clean and not decompress and hasher and signature and stat.st_ino == signature[2] and stat.st_size >= offset:
+            file.seek(offset - len(tail))
+            if file.read(len(tail)) == tail:
+                data = file.read()
+                try:
+                    text, used = decode_text(data, encoding, final=False)
+                except UnicodeDecodeError:
+                    pass
+                else:
+                    hasher = hasher.copy()
+                    hasher.update(text.encode("utf-8", "surrogatepass"))
+                    new_tail = (tail + data[:used])[-FileWatcher.TAIL_SIZE:]
+                    return (length, length, text), (new_signature, offset + used, new_tail, hasher)
+
+        # anything else: compare the whole text with the document
+        file.seek(0)
+        data = file.read()
+        if decompress:
+            data = decompress(data)
+
+    new_text, used = decode_text(data, encoding)
+    hasher = new_digest()
+    hasher.update(new_text.encode("utf-8", "surrogatepass"))
+    known = (new_signature, used, data[max(used - FileWatcher.TAIL_SIZE, 0):used], hasher)
+
+    old_text = text_of(pieces)
+    prefix = common_prefix(old_text, new_text)
+    # the common suffix, not overlapping the prefix
+    suffix = common_prefix(old_text[prefix:][::-1], new_text[prefix:][::-1])
+    return (prefix, len(old_text) - suffix, new_text[prefix:len(new_text) - suffix]), known